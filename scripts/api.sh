@@ -53,7 +53,12 @@ start_api() {
     source env/bin/activate
     
     # Start server in background
-    nohup python -m services.search.search_api > "$LOG_FILE" 2>&1 &
+    # SERVER_MODE=production runs the pre-fork gunicorn server (model shared across workers)
+    if [ "${SERVER_MODE:-dev}" = "production" ]; then
+        nohup gunicorn -c services/search/gunicorn_conf.py services.search.search_api:app > "$LOG_FILE" 2>&1 &
+    else
+        nohup python -m services.search.search_api > "$LOG_FILE" 2>&1 &
+    fi
     local pid=$!
     
     # Save PID
@@ -113,6 +118,18 @@ restart_api() {
     start_api
 }
 
+# Function to gracefully reload workers (production mode only)
+reload_api() {
+    if is_running; then
+        local pid=$(cat "$PID_FILE")
+        echo "Gracefully reloading API workers (PID: $pid)..."
+        kill -HUP "$pid"
+        echo "✅ Reload signal sent"
+    else
+        echo "API is not running"
+    fi
+}
+
 # Function to show API status
 status_api() {
     if is_running; then
@@ -150,18 +167,20 @@ logs_api() {
 show_help() {
     echo "La Plata County Search API Management Script"
     echo ""
-    echo "Usage: $0 {start|stop|restart|status|logs|help}"
+    echo "Usage: $0 {start|stop|restart|reload|status|logs|help}"
     echo ""
     echo "Commands:"
     echo "  start    - Start the API server"
     echo "  stop     - Stop the API server"
     echo "  restart  - Restart the API server"
+    echo "  reload   - Gracefully reload workers (SERVER_MODE=production only)"
     echo "  status   - Show API status and test connectivity"
     echo "  logs     - Show recent API logs"
     echo "  help     - Show this help message"
     echo ""
     echo "Examples:"
     echo "  $0 start                              # Start the API"
+    echo "  SERVER_MODE=production $0 start       # Start pre-fork gunicorn server"
     echo "  $0 status                             # Check if running"
     echo "  curl \"http://localhost:8000/health\"   # Test API"
 }
@@ -177,6 +196,9 @@ case "${1:-help}" in
     restart)
         restart_api
         ;;
+    reload)
+        reload_api
+        ;;
     status)
         status_api
         ;;
@@ -52,7 +52,14 @@ start_api() {
 
   echo "Starting RAG API on port $API_PORT..."
   echo "Environment: $env_type"
-  nohup python -m services.rag.rag_api > "$LOG_FILE" 2>&1 &
+  # SERVER_MODE=production runs the pre-fork gunicorn server, SERVER_MODE=asgi the async runtime
+  if [ "${SERVER_MODE:-dev}" = "production" ]; then
+    nohup gunicorn -c services/rag/gunicorn_conf.py services.rag.rag_api:app > "$LOG_FILE" 2>&1 &
+  elif [ "${SERVER_MODE:-dev}" = "asgi" ]; then
+    nohup uvicorn services.rag.asgi_app:app --host 0.0.0.0 --port "$API_PORT" --workers "${SERVER_WORKERS:-1}" > "$LOG_FILE" 2>&1 &
+  else
+    nohup python -m services.rag.rag_api > "$LOG_FILE" 2>&1 &
+  fi
   local pid=$!
   echo "$pid" > "$PID_FILE"
   sleep 2
@@ -91,6 +98,16 @@ restart_api() {
   start_api
 }
 
+reload_api() {
+  if is_running; then
+    local pid=$(cat "$PID_FILE")
+    echo "Gracefully reloading RAG API workers (PID: $pid)..."
+    kill -HUP "$pid"
+  else
+    echo "RAG API is not running"
+  fi
+}
+
 status_api() {
   if is_running; then
     local pid=$(cat "$PID_FILE")
@@ -121,11 +138,17 @@ case "${1:-help}" in
   start) start_api ;;
   stop) stop_api ;;
   restart) restart_api ;;
+  reload) reload_api ;;
   status) status_api ;;
   logs) logs_api ;;
   help|--help|-h)
     echo "RAG API management"
-    echo "Usage: $0 {start|stop|restart|status|logs|help}"
+    echo "Usage: $0 {start|stop|restart|reload|status|logs|help}"
+    echo ""
+    echo "Server Mode:"
+    echo "  SERVER_MODE=production ./scripts/run_rag.sh start  # Pre-fork gunicorn server"
+    echo "  SERVER_MODE=asgi ./scripts/run_rag.sh start        # Async runtime (uvicorn)"
+    echo "  ./scripts/run_rag.sh reload                        # Graceful worker reload (production mode)"
     echo ""
     echo "Environment Control:"
     echo "  RAG_ENV=local ./scripts/run_rag.sh start      # Use local environment"
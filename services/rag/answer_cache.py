@@ -0,0 +1,191 @@
+"""
+Bounded cache of complete RAG answers.
+
+Answers are generated at low temperature with a fixed seed, so the same
+question against the same index, provider and generation parameters yields the
+same answer; regenerating it costs retrieval plus a multi-second LLM call.
+
+Entries live in an in-memory LRU with a TTL. An optional on-disk tier (one JSON
+file per key) survives restarts and is shared by the workers of a pre-fork
+server. It is pruned as it grows: expired files, then the oldest beyond
+`disk_max_entries`. Keys cover everything the answer depends on: the normalized query,
+collection, `num_results`, generation parameters, provider/model id and the
+search and section index versions.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_DISK_PRUNE_EVERY = 64  # Disk writes between prunes
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation insensitive form of a question."""
+    query = re.sub(r"\s+", " ", (query or "").strip().lower())
+    return query.rstrip(" ?.!")
+
+
+def make_key(**parts: Any) -> str:
+    """Stable hash of the key parts (order independent, JSON-serializable values)."""
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """TTL + LRU cache of answer payloads with an optional disk tier."""
+
+    def __init__(self, max_entries: int = 512, ttl_sec: float = 3600, disk_dir: Optional[str] = None,
+                 disk_max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.disk_dir = disk_dir or None
+        self.disk_max_entries = disk_max_entries
+        self._disk_writes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (stored_at, payload)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self.prune_disk()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached payload, or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl_sec:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, entry)
+        return entry[1]
+
+    def set(self, key: str, payload: Dict[str, Any]) -> None:
+        entry = (time.time(), payload)
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl_sec,
+                "disk_dir": self.disk_dir,
+                "disk_max_entries": self.disk_max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else None,
+            }
+
+    def _store(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # -----------------------------
+    # Disk tier
+    # -----------------------------
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str, now: float) -> Optional[tuple]:
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - data.get("stored_at", 0) >= self.ttl_sec:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return data["stored_at"], data["payload"]
+
+    def _write_disk(self, key: str, entry: tuple) -> None:
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": entry[0], "payload": entry[1]}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write answer cache entry {path}: {e}")
+            return
+        with self._lock:
+            self._disk_writes += 1
+            due = self._disk_writes % _DISK_PRUNE_EVERY == 0
+        if due:
+            self.prune_disk()
+
+    def prune_disk(self) -> int:
+        """Delete expired disk entries, then the oldest beyond disk_max_entries; returns the number deleted.
+
+        A file's mtime is its write time. Workers sharing the directory may
+        prune concurrently; files already gone are skipped.
+        """
+        if not self.disk_dir:
+            return 0
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    files.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    pass
+        files.sort()
+        cutoff = time.time() - self.ttl_sec
+        expired = sum(1 for mtime, _ in files if mtime < cutoff)
+        excess = max(expired, len(files) - self.disk_max_entries)
+        removed = 0
+        for _, path in files[:excess]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
@@ -7,6 +7,7 @@ Creates and configures Flask app instances with proper configuration management
 import os
 from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from .config import config
 from .rag_engine import RAGEngine
@@ -40,6 +41,10 @@ def create_app(config_name=None):
     # Enable CORS
     CORS(app)
     
+    # Resolve the client address from X-Forwarded-For set by trusted proxies
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    
     # Initialize RAG engine
     rag_engine = RAGEngine()
     
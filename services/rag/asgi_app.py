@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+ASGI runtime for the RAG API
+
+The answer endpoints run as async handlers (handlers/async_answer.py): a
+stream waits on the LLM backend without holding a thread, so one process
+serves hundreds of concurrent SSE streams. Every other route is served by the
+Flask app from `create_app`, mounted underneath, so URLs and payloads are the
+same as under the WSGI entry point (rag_api.py).
+
+Usage (from project root):
+    pip install starlette a2wsgi uvicorn
+    uvicorn services.rag.asgi_app:app --host 0.0.0.0 --port 8001
+"""
+
+import contextlib
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Mount, Route
+
+from . import http_client
+from .app_factory import create_app
+from .config import Config
+from .handlers.async_answer import rag_answer, rag_answer_stream
+
+
+def create_asgi_app(config_name=None):
+    """
+    Build the ASGI application around a Flask app from `create_app`
+
+    Args:
+        config_name: Flask configuration name, as for `create_app`
+
+    Returns:
+        Starlette application instance
+    """
+    flask_app = create_app(config_name)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await http_client.aclose_async_clients()  # Pooled search connections of this loop
+
+    # Flask-CORS covers the mounted routes; the async routes need their own
+    cors = [Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])]
+    app = Starlette(routes=[
+        Route('/rag/answer', rag_answer, methods=['POST', 'OPTIONS'], middleware=cors),
+        Route('/rag/answer/stream', rag_answer_stream, methods=['POST', 'GET', 'OPTIONS'], middleware=cors),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=Config.SERVER_THREADS)),
+    ], lifespan=lifespan)
+    app.state.rag_engine = flask_app.config['RAG_ENGINE']
+    app.state.flask_app = flask_app
+    return app
+
+
+app = create_asgi_app()
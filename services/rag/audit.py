@@ -0,0 +1,272 @@
+"""Audit log of the questions asked and the answers given.
+
+The answer endpoints hand each answer to `record()`, which samples it by
+route and puts it on a bounded in-memory queue. The request never waits on
+disk: when the queue is full the record is dropped and counted. A
+background thread writes the queue out in batches to gzip-compressed JSONL
+segments in AUDIT_DIR:
+
+    audit-20261019-142501-8123-0001.jsonl.gz.part   (being written)
+    audit-20261019-132455-8123-0000.jsonl.gz        (complete)
+
+A segment is closed and renamed without `.part` once it reaches
+AUDIT_SEGMENT_MAX_BYTES (compressed) or AUDIT_SEGMENT_MAX_AGE_SEC, and when
+the process exits. Each batch is flushed, so an open segment is readable up
+to its last batch. Complete segments can be shipped or deleted freely.
+
+Records hold the route, time, trace id, question, collection, answer,
+citations and source ids (not source text). Read them back with
+`iter_records()` or:
+
+    python -m services.rag.audit logs/audit --route answer --since 2026-10-01
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import gzip
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from .background_writer import BackgroundWriter, process_singleton
+from .config import Config
+
+_WRITE_BATCH = 500
+_SEGMENT_SUFFIX = ".jsonl.gz"
+_OPEN_SUFFIX = ".part"
+
+
+def parse_rates(value: str) -> Dict[str, float]:
+    """"answer=1,answer_batch=0.1" -> {"answer": 1.0, "answer_batch": 0.1}"""
+    rates = {}
+    for part in value.split(","):
+        if "=" in part:
+            route, rate = part.split("=", 1)
+            rates[route.strip()] = float(rate)
+    return rates
+
+
+class AuditWriter(BackgroundWriter):
+    """Sample audit records and write them to rotating gzip JSONL segments.
+
+    Args:
+        directory: Where segments are written
+        max_bytes: Compressed size at which a segment is closed
+        max_age_sec: Age at which a segment is closed
+        max_queue: Records waiting to be written; more are dropped
+        sample_rate: Share of records kept for routes without their own rate
+        route_rates: Route name -> share of records kept
+        start: Start the writer thread on the first record (see BackgroundWriter)
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, max_age_sec: float = 3600,
+                 max_queue: int = 10000, sample_rate: float = 1.0, route_rates: Optional[Dict[str, float]] = None,
+                 start: bool = True):
+        # Wake at least once a second so idle segments still close on time
+        super().__init__("audit-writer", max_queue, _WRITE_BATCH, idle_interval=1.0, start=start)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+        self.sample_rate = sample_rate
+        self.route_rates = dict(route_rates or {})
+        self.sampled_out = 0
+        self.segments = 0
+        self._write_lock = threading.Lock()
+        self._segment = None  # (path, raw file, gzip file, opened at)
+        self._sequence = 0
+        atexit.register(self.close)
+
+    def submit(self, route: str, record: Dict[str, Any]) -> bool:
+        """Sample and queue a record without blocking; False when sampled out or dropped"""
+        rate = self.route_rates.get(route, self.sample_rate)
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            self.sampled_out += 1
+            return False
+        return self.put({"ts": round(time.time(), 3), "route": route, **record})
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write what is queued and complete the open segment (also run at exit)"""
+        if not self.started():
+            return
+        self.flush(timeout)
+        with self._write_lock:
+            self._close_segment()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "queued": self.queued(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "errors": self.errors,
+            "segments": self.segments,
+        }
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(record, default=str) + "\n" for record in records).encode("utf-8")
+        with self._write_lock:
+            self._rotate_if_due()
+            if self._segment is None:
+                self._open_segment()
+            _, raw, gz, _ = self._segment
+            gz.write(data)
+            gz.flush()  # Sync flush: the open segment is readable up to here
+
+    def on_idle(self) -> None:
+        with self._write_lock:
+            self._rotate_if_due()  # Close idle segments on time
+
+    def after_fork(self) -> None:
+        # The parent's open segment stays with the parent
+        self._detach_segment()
+        self._write_lock = threading.Lock()
+
+    def _rotate_if_due(self) -> None:
+        if self._segment is None:
+            return
+        _, raw, _, opened = self._segment
+        if raw.tell() >= self.max_bytes or time.monotonic() - opened >= self.max_age_sec:
+            self._close_segment()
+
+    def _open_segment(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"audit-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence:04d}{_SEGMENT_SUFFIX}"
+        self._sequence += 1
+        path = os.path.join(self.directory, name + _OPEN_SUFFIX)
+        raw = open(path, "wb")
+        self._segment = (path, raw, gzip.GzipFile(filename=name, mode="wb", fileobj=raw), time.monotonic())
+
+    def _detach_segment(self) -> None:
+        """Forget a segment inherited over fork without finishing the parent's file"""
+        if self._segment is not None:
+            self._segment[2].fileobj = None  # GzipFile.close() then writes no trailer
+            self._segment = None
+
+    def _close_segment(self) -> None:
+        if self._segment is None:
+            return
+        path, raw, gz, _ = self._segment
+        self._segment = None
+        gz.close()
+        raw.close()
+        os.replace(path, path[:-len(_OPEN_SUFFIX)])
+        self.segments += 1
+
+
+@process_singleton
+def get_audit_writer() -> AuditWriter:
+    """Process-wide audit writer configured from Config."""
+    return AuditWriter(
+        Config.AUDIT_DIR,
+        max_bytes=Config.AUDIT_SEGMENT_MAX_BYTES,
+        max_age_sec=Config.AUDIT_SEGMENT_MAX_AGE_SEC,
+        max_queue=Config.AUDIT_QUEUE_SIZE,
+        sample_rate=Config.AUDIT_SAMPLE_RATE,
+        route_rates=parse_rates(Config.AUDIT_ROUTE_SAMPLE_RATES),
+    )
+
+
+def record(route: str, **fields) -> bool:
+    """Audit one answer for `route` ("answer", "answer_stream", "answer_batch").
+
+    `sources` may be the response's source dicts; only their ids are kept.
+    A no-op unless AUDIT_ENABLED.
+    """
+    if not Config.AUDIT_ENABLED:
+        return False
+    if fields.get("sources"):
+        fields["sources"] = [s.get("id") if isinstance(s, dict) else s for s in fields["sources"]]
+    return get_audit_writer().submit(route, fields)
+
+
+def record_answer(route: str, query: str, collection: str, num_results: int, payload: Dict[str, Any],
+                  trace_id: Optional[str] = None, **fields) -> bool:
+    """Audit an answer response payload (its answer, citations, sources and cache outcome)"""
+    if not Config.AUDIT_ENABLED:
+        return False
+    return record(
+        route,
+        trace_id=trace_id,
+        query=query,
+        collection=collection,
+        num_results=num_results,
+        answer=payload.get("answer"),
+        citations=payload.get("citations") or [],
+        sources=payload.get("sources") or [],
+        cached=bool(payload.get("cached")),
+        error=payload.get("error"),
+        **fields,
+    )
+
+
+# -----------------------------
+# Reading
+# -----------------------------
+
+def segment_paths(directory: str, include_open: bool = False) -> List[str]:
+    """Segment files in write order (complete ones only unless `include_open`)"""
+    if not os.path.isdir(directory):
+        return []
+    names = [
+        name for name in os.listdir(directory)
+        if name.startswith("audit-") and (
+            name.endswith(_SEGMENT_SUFFIX) or (include_open and name.endswith(_SEGMENT_SUFFIX + _OPEN_SUFFIX))
+        )
+    ]
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+
+def read_segment(path: str) -> Iterator[Dict[str, Any]]:
+    """Records in one segment; an open or truncated segment is read up to its last complete line"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # Partial last line
+                yield json.loads(line)
+        except (EOFError, OSError):
+            return  # No gzip trailer yet, or cut off by a crash
+
+
+def iter_records(directory: str, route: Optional[str] = None, since: Optional[float] = None,
+                 include_open: bool = False) -> Iterator[Dict[str, Any]]:
+    """Audit records from every segment in `directory`.
+
+    Args:
+        directory: AUDIT_DIR
+        route: Only this route's records
+        since: Only records at or after this Unix time
+        include_open: Also read segments still being written
+    """
+    for path in segment_paths(directory, include_open):
+        for entry in read_segment(path):
+            if route is not None and entry.get("route") != route:
+                continue
+            if since is not None and entry.get("ts", 0) < since:
+                continue
+            yield entry
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Print audit records as JSON lines")
+    parser.add_argument("directory", nargs="?", default=Config.AUDIT_DIR)
+    parser.add_argument("--route", help="Only this route (answer, answer_stream, answer_batch)")
+    parser.add_argument("--since", help="Only records at or after this ISO date or time")
+    parser.add_argument("--include-open", action="store_true", help="Also read segments still being written")
+    args = parser.parse_args(argv)
+
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    for entry in iter_records(args.directory, route=args.route, since=since, include_open=args.include_open):
+        sys.stdout.write(json.dumps(entry) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""Retrieval backend package for the RAG system.
+
+Backends decide how the RAG engine reaches the search service:
+
+- http: `/search/simple` over HTTP (default)
+- batched_http: as http, but multi-query lookups go through `/search/simple/batch`
+- in_process: call `SearchEngine` directly when both services share a process
+
+Public API:
+    RetrievalBackendFactory: Factory for creating retrieval backends
+"""
+
+from .factory import RetrievalBackendFactory
+
+__all__ = [
+    "RetrievalBackendFactory"
+]
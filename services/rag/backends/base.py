@@ -0,0 +1,94 @@
+"""Abstract base class for retrieval backends.
+
+This module defines the interface the RAG engine uses to reach the search
+service, independent of whether that happens over HTTP or in process.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+
+class RetrievalBackend(ABC):
+    """Abstract base class for retrieval backends.
+
+    Every backend returns the same payload as the search service's
+    `/search/simple` endpoint: {"query", "collection", "collection_name", "results"},
+    where each result carries `text`, `relevance`, `collection` and an identifier
+    (`section`, `account` or `id`).
+    """
+
+    # True when search_many costs a single round trip / encoder pass
+    supports_batching = False
+
+    @abstractmethod
+    def search(self, query: str, *, collection: str = "la_plata_county_code", num_results: int = 5) -> Dict[str, Any]:
+        """Run one search.
+
+        Args:
+            query: Search query text
+            collection: Collection to search
+            num_results: Number of results to return (clamped to 1-10)
+
+        Returns:
+            `/search/simple` payload
+
+        Raises:
+            Exception: If the search fails
+        """
+        raise NotImplementedError
+
+    def search_many(self, queries: List[str], *, collection: str = "la_plata_county_code", num_results: int = 5) -> List[Dict[str, Any]]:
+        """Run several searches, returning one payload per query in input order.
+
+        The default implementation issues the searches one after another;
+        backends that can batch should override it.
+        """
+        return [self.search(q, collection=collection, num_results=num_results) for q in queries]
+
+    def get_documents(self, ids: List[str], *, collection: str = "la_plata_county_code") -> List[Dict[str, Any]]:
+        """Fetch documents by id in one bulk lookup.
+
+        Returns results in the `/search/simple` result format, in the order of
+        `ids`; unknown ids are skipped.
+
+        Raises:
+            NotImplementedError: If the backend cannot fetch by id
+        """
+        raise NotImplementedError
+
+    def embed(self, texts: List[str], *, collection: str = "la_plata_county_code") -> List[List[float]]:
+        """Unit-normalized embeddings of `texts` with the collection's model.
+
+        Raises:
+            NotImplementedError: If the backend cannot embed
+        """
+        raise NotImplementedError
+
+    def index_version(self, collection: str = "la_plata_county_code") -> Optional[str]:
+        """Version of the collection's search index, or None when unknown.
+
+        Used to key caches of retrieval-dependent results.
+        """
+        return None
+
+    # -----------------------------
+    # Async variants for the ASGI runtime. The defaults run the blocking
+    # method in a worker thread; HTTP backends override them with httpx.
+    # -----------------------------
+
+    async def asearch(self, query: str, *, collection: str = "la_plata_county_code", num_results: int = 5) -> Dict[str, Any]:
+        """Async `search`"""
+        return await asyncio.to_thread(self.search, query, collection=collection, num_results=num_results)
+
+    async def asearch_many(self, queries: List[str], *, collection: str = "la_plata_county_code", num_results: int = 5) -> List[Dict[str, Any]]:
+        """Async `search_many`"""
+        return await asyncio.to_thread(self.search_many, queries, collection=collection, num_results=num_results)
+
+    async def aget_documents(self, ids: List[str], *, collection: str = "la_plata_county_code") -> List[Dict[str, Any]]:
+        """Async `get_documents`"""
+        return await asyncio.to_thread(self.get_documents, ids, collection=collection)
+
+    async def aembed(self, texts: List[str], *, collection: str = "la_plata_county_code") -> List[List[float]]:
+        """Async `embed`"""
+        return await asyncio.to_thread(self.embed, texts, collection=collection)
@@ -0,0 +1,64 @@
+from typing import Any, Dict, List
+
+from .http_search import HttpRetrievalBackend
+from .. import http_client
+
+
+def _batches(payload: Dict[str, Any], queries: List[str]) -> List[Dict[str, Any]]:
+    """The `batches` of a batch response; callers pair them with `queries` by position"""
+    batches = payload.get("batches", [])
+    if len(batches) != len(queries):
+        raise RuntimeError(f"Batch search returned {len(batches)} payloads for {len(queries)} queries")
+    return batches
+
+
+class BatchedHttpRetrievalBackend(HttpRetrievalBackend):
+    """HTTP retrieval that sends multi-query lookups as one `/search/simple/batch` call.
+
+    Single searches still use `/search/simple`; `search_many` costs one round
+    trip and one encoder pass on the search service instead of one per query.
+    """
+
+    supports_batching = True
+
+    def search_many(self, queries: List[str], *, collection: str = "la_plata_county_code", num_results: int = 5) -> List[Dict[str, Any]]:
+        """POST all queries to `/search/simple/batch` and return payloads in input order"""
+        if not queries:
+            return []
+        if len(queries) == 1:
+            return [self.search(queries[0], collection=collection, num_results=num_results)]
+
+        resp = http_client.request(
+            "POST",
+            f"{self.base_url}/search/simple/batch",
+            idempotent=True,  # Read-only search, safe to retry
+            json={
+                "queries": list(queries),
+                "collection": collection,
+                "num_results": max(1, min(10, int(num_results))),
+            },
+            attempt_timeout=self.timeout_sec,
+        )
+        resp.raise_for_status()
+        return _batches(resp.json(), queries)
+
+    async def asearch_many(self, queries: List[str], *, collection: str = "la_plata_county_code", num_results: int = 5) -> List[Dict[str, Any]]:
+        """Async `search_many`: one `/search/simple/batch` call"""
+        if not queries:
+            return []
+        if len(queries) == 1:
+            return [await self.asearch(queries[0], collection=collection, num_results=num_results)]
+
+        resp = await http_client.arequest(
+            "POST",
+            f"{self.base_url}/search/simple/batch",
+            idempotent=True,
+            json={
+                "queries": list(queries),
+                "collection": collection,
+                "num_results": max(1, min(10, int(num_results))),
+            },
+            attempt_timeout=self.timeout_sec,
+        )
+        resp.raise_for_status()
+        return _batches(resp.json(), queries)
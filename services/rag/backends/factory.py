@@ -0,0 +1,65 @@
+"""Factory for creating retrieval backends based on configuration.
+
+This module implements the Factory pattern to provide the retrieval backend
+selected by RETRIEVAL_BACKEND.
+"""
+
+import logging
+import os
+from typing import Optional
+
+from .base import RetrievalBackend
+from .batched_http import BatchedHttpRetrievalBackend
+from .http_search import HttpRetrievalBackend
+from .in_process import InProcessRetrievalBackend
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalBackendFactory:
+    """Factory for creating retrieval backends.
+
+    Examples:
+        Basic usage:
+        >>> backend = RetrievalBackendFactory.get_backend('http')
+        >>> payload = backend.search("minor subdivision requirements")
+
+        Configured by environment:
+        >>> backend = RetrievalBackendFactory.get_backend()  # Uses RETRIEVAL_BACKEND
+    """
+
+    _SUPPORTED_BACKENDS = ["http", "batched_http", "in_process"]
+
+    @classmethod
+    def get_backend(cls, backend_type: Optional[str] = None, **kwargs) -> RetrievalBackend:
+        """Get retrieval backend by type.
+
+        Args:
+            backend_type: 'http', 'batched_http' or 'in_process'.
+                If None, uses RETRIEVAL_BACKEND or config default.
+            **kwargs: Passed to the backend constructor (e.g. base_url,
+                search_engine)
+
+        Returns:
+            RetrievalBackend: Configured backend instance
+
+        Raises:
+            ValueError: If backend type is not supported
+        """
+        if backend_type is None:
+            backend_type = os.getenv("RETRIEVAL_BACKEND", Config.RETRIEVAL_BACKEND)
+
+        logger.debug(f"Creating retrieval backend of type: {backend_type}")
+
+        if backend_type == "http":
+            return HttpRetrievalBackend(**kwargs)
+        elif backend_type == "batched_http":
+            return BatchedHttpRetrievalBackend(**kwargs)
+        elif backend_type == "in_process":
+            return InProcessRetrievalBackend(**kwargs)
+        else:
+            raise ValueError(
+                f"Unknown retrieval backend '{backend_type}'. "
+                f"Supported: {', '.join(cls._SUPPORTED_BACKENDS)}"
+            )
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .base import RetrievalBackend
+from .. import http_client
+from ..config import Config
+from ..retrieval import fetch_simple_search
+
+
+class HttpRetrievalBackend(RetrievalBackend):
+    """Retrieval through the search service's `/search/simple` HTTP endpoint"""
+
+    def __init__(self, base_url: str = None, timeout_sec: int = None):
+        self.base_url = (base_url or Config.SEARCH_API_URL).rstrip("/")
+        self.timeout_sec = timeout_sec or Config.SEARCH_TIMEOUT
+        self._index_versions: Dict[str, Optional[str]] = {}
+        self._index_versions_at = 0.0
+        self._index_versions_lock = threading.Lock()
+        self._index_versions_refreshing = False
+
+    def search(self, query: str, *, collection: str = "la_plata_county_code", num_results: int = 5) -> Dict[str, Any]:
+        """Call `/search/simple` and return its JSON payload"""
+        return fetch_simple_search(
+            query,
+            collection=collection,
+            num_results=num_results,
+            base_url=self.base_url,
+            timeout_sec=self.timeout_sec,
+        )
+
+    def get_documents(self, ids: List[str], *, collection: str = "la_plata_county_code") -> List[Dict[str, Any]]:
+        """Fetch documents by id through `/search/documents`"""
+        if not ids:
+            return []
+        resp = http_client.request(
+            "GET",
+            f"{self.base_url}/search/documents",
+            params={"ids": ",".join(str(i) for i in ids), "collection": collection},
+            attempt_timeout=self.timeout_sec,
+        )
+        resp.raise_for_status()
+        return resp.json().get("results", [])
+
+    def embed(self, texts: List[str], *, collection: str = "la_plata_county_code") -> List[List[float]]:
+        """Embed texts through the search service's `/embed`"""
+        if not texts:
+            return []
+        resp = http_client.request(
+            "POST",
+            f"{self.base_url}/embed",
+            idempotent=True,  # Pure function of the input, safe to retry
+            json={"texts": list(texts), "collection": collection},
+            attempt_timeout=self.timeout_sec,
+        )
+        resp.raise_for_status()
+        return resp.json().get("embeddings", [])
+
+    async def asearch(self, query: str, *, collection: str = "la_plata_county_code", num_results: int = 5) -> Dict[str, Any]:
+        """Call `/search/simple` without blocking the event loop"""
+        resp = await http_client.arequest(
+            "GET",
+            f"{self.base_url}/search/simple",
+            params={"query": query, "collection": collection, "num_results": max(1, min(10, int(num_results)))},
+            attempt_timeout=self.timeout_sec,
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    async def asearch_many(self, queries: List[str], *, collection: str = "la_plata_county_code", num_results: int = 5) -> List[Dict[str, Any]]:
+        """Run the searches concurrently on the event loop"""
+        return list(await asyncio.gather(
+            *(self.asearch(q, collection=collection, num_results=num_results) for q in queries)
+        ))
+
+    async def aget_documents(self, ids: List[str], *, collection: str = "la_plata_county_code") -> List[Dict[str, Any]]:
+        """Fetch documents by id through `/search/documents` without blocking the event loop"""
+        if not ids:
+            return []
+        resp = await http_client.arequest(
+            "GET",
+            f"{self.base_url}/search/documents",
+            params={"ids": ",".join(str(i) for i in ids), "collection": collection},
+            attempt_timeout=self.timeout_sec,
+        )
+        resp.raise_for_status()
+        return resp.json().get("results", [])
+
+    async def aembed(self, texts: List[str], *, collection: str = "la_plata_county_code") -> List[List[float]]:
+        """Embed texts through `/embed` without blocking the event loop"""
+        if not texts:
+            return []
+        resp = await http_client.arequest(
+            "POST",
+            f"{self.base_url}/embed",
+            idempotent=True,
+            json={"texts": list(texts), "collection": collection},
+            attempt_timeout=self.timeout_sec,
+        )
+        resp.raise_for_status()
+        return resp.json().get("embeddings", [])
+
+    def index_version(self, collection: str = "la_plata_county_code") -> Optional[str]:
+        """Index version from `/collections`, refreshed at most every INDEX_VERSION_TTL seconds.
+
+        One caller fetches while the others keep using the previous versions;
+        the lock only guards publishing them.
+        """
+        with self._index_versions_lock:
+            due = (not self._index_versions_refreshing
+                   and time.monotonic() - self._index_versions_at >= Config.INDEX_VERSION_TTL)
+            if due:
+                self._index_versions_refreshing = True
+        if due:
+            try:
+                resp = http_client.request("GET", f"{self.base_url}/collections", attempt_timeout=self.timeout_sec)
+                resp.raise_for_status()
+                versions = {
+                    name: info.get("index_version")
+                    for name, info in resp.json().get("collections", {}).items()
+                }
+            except Exception:
+                versions = {}
+            with self._index_versions_lock:
+                self._index_versions = versions
+                self._index_versions_at = time.monotonic()
+                self._index_versions_refreshing = False
+        return self._index_versions.get(collection)
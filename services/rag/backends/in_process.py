@@ -0,0 +1,60 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from .base import RetrievalBackend
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessRetrievalBackend(RetrievalBackend):
+    """Retrieval by calling the search service's `SearchEngine` directly.
+
+    For single-node deployments where the RAG and search services share a
+    process: no HTTP hop and no JSON encoding of full section texts. When no
+    engine is passed, one is created and initialized on first use (this loads
+    the embedding model into the RAG process).
+    """
+
+    supports_batching = True
+
+    def __init__(self, search_engine=None):
+        self._engine = search_engine
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    # Imported lazily: pulls in chromadb and sentence-transformers
+                    from services.search.search_engine import SearchEngine
+
+                    engine = SearchEngine()
+                    if not engine.initialize():
+                        raise RuntimeError("In-process search engine failed to initialize")
+                    logger.info("Initialized in-process search engine")
+                    self._engine = engine
+        return self._engine
+
+    def search(self, query: str, *, collection: str = "la_plata_county_code", num_results: int = 5) -> Dict[str, Any]:
+        """Search the local engine and return the `/search/simple` payload"""
+        return self.engine.simple_search(query, collection, max(1, min(10, int(num_results))))
+
+    def search_many(self, queries: List[str], *, collection: str = "la_plata_county_code", num_results: int = 5) -> List[Dict[str, Any]]:
+        """Search several queries with one encoder pass"""
+        if not queries:
+            return []
+        return self.engine.simple_search_batch(list(queries), collection, max(1, min(10, int(num_results))))
+
+    def get_documents(self, ids: List[str], *, collection: str = "la_plata_county_code") -> List[Dict[str, Any]]:
+        """Fetch documents by id from the local engine"""
+        return self.engine.get_documents(list(ids), collection)
+
+    def embed(self, texts: List[str], *, collection: str = "la_plata_county_code") -> List[List[float]]:
+        """Embed texts with the local engine's model"""
+        return self.engine.embed(list(texts), collection)
+
+    def index_version(self, collection: str = "la_plata_county_code") -> Optional[str]:
+        """Index version from the local engine"""
+        return self.engine.index_version(collection)
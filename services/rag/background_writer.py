@@ -0,0 +1,154 @@
+"""Bounded queues written out by a background thread.
+
+Trace export (tracing.py) and the audit log (audit.py) both take records on
+the request path and write them later. Requests never wait on that: records
+go onto a bounded queue with `put_nowait`, and when the queue is full they
+are dropped and counted. One daemon thread per process takes the records off
+in batches and hands each batch to `write_batch`.
+
+The thread starts on the first record. After a fork the child starts its own
+thread with a new queue, because the parent's thread does not exist in the
+child and its queued records stay with the parent.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BackgroundWriter:
+    """Base class: a bounded record queue drained in batches by a background thread.
+
+    Subclasses implement `write_batch`, and may override `on_idle` and
+    `after_fork`.
+
+    Args:
+        name: Thread name, also used in log messages
+        max_queue: Records waiting to be written; more are dropped
+        batch_size: Most records passed to one `write_batch` call
+        idle_interval: Seconds between `on_idle` calls while nothing is
+            queued; None never calls it
+        start: Start the thread on the first record. With False, records stay
+            queued until `start()` is called, so tests can fill the queue.
+    """
+
+    def __init__(self, name: str, max_queue: int, batch_size: int, idle_interval: Optional[float] = None,
+                 start: bool = True):
+        self.name = name
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.idle_interval = idle_interval
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._autostart = start
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def put(self, record: Any) -> bool:
+        """Queue a record without blocking; False when the queue was full"""
+        if self._autostart:
+            self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def start(self) -> None:
+        """Start the thread now (and on later records, if created with start=False)"""
+        self._autostart = True
+        self._ensure_thread()
+
+    def started(self) -> bool:
+        """Whether this process's thread is running"""
+        return self._thread is not None and self._pid == os.getpid()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until queued records are written; False on timeout"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def write_batch(self, records: List[Any]) -> None:
+        raise NotImplementedError
+
+    def on_idle(self) -> None:
+        """Called from the thread every `idle_interval` seconds without records"""
+
+    def after_fork(self) -> None:
+        """Called in a forked child before its thread starts, to drop state held for the parent"""
+
+    def _ensure_thread(self) -> None:
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is None or self._pid != pid:
+                if self._pid is not None:
+                    self._queue = queue.Queue(maxsize=self.max_queue)  # Parent's records stay with the parent
+                    self.after_fork()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._pid = pid
+                self._thread.start()
+
+    def _run(self) -> None:
+        records = self._queue
+        while True:
+            try:
+                batch = [records.get(timeout=self.idle_interval)]
+            except queue.Empty:
+                try:
+                    self.on_idle()
+                except Exception as e:
+                    logger.warning(f"{self.name} idle work failed: {e}")
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(records.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write_batch(batch)
+                self.written += len(batch)
+            except Exception as e:
+                self.errors += len(batch)
+                logger.warning(f"{self.name} write failed: {e}")
+            finally:
+                for _ in batch:
+                    records.task_done()
+
+
+def process_singleton(factory: Callable[[], T]) -> Callable[[], T]:
+    """Decorator: call `factory` once, on first use, and return that instance after"""
+    instance: List[T] = []
+    lock = threading.Lock()
+
+    @functools.wraps(factory)
+    def get() -> T:
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    return get
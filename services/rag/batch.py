@@ -0,0 +1,331 @@
+"""
+Batch RAG answering for bulk evaluation and answer-cache precomputation.
+
+Sending questions to `/rag/answer` one at a time costs the sum of their
+latencies. A batch instead:
+
+- answers duplicate questions (same text up to case and whitespace, same
+  parameters) once
+- serves questions already in the answer cache without retrieval or generation
+- retrieves questions in chunks of BATCH_RETRIEVAL_CHUNK, with the query
+  variations of a whole chunk deduplicated and sent as batched searches
+  (RAGEngine.batch_retrieval_with_normalization)
+- keeps BATCH_CONCURRENCY generations in flight (default
+  INFERENCE_MAX_CONCURRENCY, the provider's capacity) while the next chunk is
+  retrieved. Generations queue in the scheduler as client "batch", so
+  interactive users keep their round-robin turn
+
+Fresh answers are stored in the answer cache, so a nightly batch of
+frequently asked questions also warms the cache.
+
+The same runner backs `POST /rag/answer/batch` (NDJSON results as they
+complete) and this CLI, which writes JSONL incrementally and resumes by
+skipping ids already answered in the output file.
+
+Usage (from project root):
+    python -m services.rag.batch questions.jsonl -o answers.jsonl
+    python -m services.rag.batch questions.txt -o answers.jsonl --concurrency 4 --no-cache
+
+Input lines are either JSON objects ({"id": ..., "query": ..., optional
+"collection", "num_results", "max_tokens", "temperature", "top_p"}) or plain
+question text. Lines without an id get their line number.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .config import Config
+from .inference.scheduler import QueueFullError
+from .retrieval import fallback_prompt
+
+_DEFAULTS = {
+    "collection": "la_plata_county_code",
+    "num_results": 5,
+    "max_tokens": 2500,
+    "temperature": 0.2,
+    "top_p": 0.9,
+}
+
+
+def normalize_items(questions: Iterable[Any], defaults: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Questions (strings or dicts) as complete batch items with ids.
+
+    Raises:
+        ValueError: If a question has no query text
+    """
+    defaults = {**_DEFAULTS, **(defaults or {})}
+    items = []
+    for n, question in enumerate(questions, start=1):
+        if isinstance(question, str):
+            question = {"query": question}
+        query = (question.get("query") or "").strip()
+        if not query:
+            raise ValueError(f"Question {n} has no query")
+        items.append({
+            "id": str(question.get("id", n)),
+            "query": query,
+            "collection": question.get("collection", defaults["collection"]),
+            "num_results": int(question.get("num_results", defaults["num_results"])),
+            "max_tokens": int(question.get("max_tokens", defaults["max_tokens"])),
+            "temperature": float(question.get("temperature", defaults["temperature"])),
+            "top_p": float(question.get("top_p", defaults["top_p"])),
+        })
+    return items
+
+
+def _dedupe_key(item: Dict[str, Any]):
+    return (" ".join(item["query"].lower().split()), item["collection"], item["num_results"],
+            item["max_tokens"], item["temperature"], item["top_p"])
+
+
+class BatchRunner:
+    """Answer a list of batch items with shared retrieval and bounded concurrency.
+
+    Args:
+        rag_engine: Initialized RAGEngine
+        concurrency: Generations in flight; defaults to BATCH_CONCURRENCY or
+            INFERENCE_MAX_CONCURRENCY
+        use_cache: Read answers from (and always write them to) the answer cache
+    """
+
+    def __init__(self, rag_engine, concurrency: Optional[int] = None, use_cache: bool = True):
+        self.rag_engine = rag_engine
+        self.model_mgr = rag_engine.model_mgr
+        self.concurrency = max(1, concurrency or Config.BATCH_CONCURRENCY or Config.INFERENCE_MAX_CONCURRENCY)
+        self.use_cache = use_cache
+        self.stats = {"questions": 0, "unique": 0, "cached": 0, "generated": 0, "errors": 0, "elapsed_sec": 0.0}
+
+    def run(self, items: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield one result per item, in completion order."""
+        started = time.perf_counter()
+        groups: "OrderedDict[Any, List[Dict[str, Any]]]" = OrderedDict()
+        for item in items:
+            groups.setdefault(_dedupe_key(item), []).append(item)
+        self.stats.update(questions=len(items), unique=len(groups))
+
+        if not (self.model_mgr and self.model_mgr.is_available):
+            for members in groups.values():
+                yield from self._fan_out(members, {"error": "Inference not available"}, started)
+            return
+
+        to_generate = []
+        for members in groups.values():
+            item = members[0]
+            # The context is needed to store fresh answers even when not reading the cache
+            cached, cache_context = self.rag_engine.get_cached_answer(
+                item["query"], item["collection"], item["num_results"], **_generation_params(self.rag_engine, item)
+            )
+            if cached and self.use_cache:
+                self.stats["cached"] += 1
+                yield from self._fan_out(members, {**cached, "cached": True}, started)
+            else:
+                to_generate.append((members, cache_context))
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch")
+        futures = {}
+        try:
+            for start in range(0, len(to_generate), max(1, Config.BATCH_RETRIEVAL_CHUNK)):
+                chunk = to_generate[start:start + Config.BATCH_RETRIEVAL_CHUNK]
+                for (members, cache_context), retrieval in zip(chunk, self._retrieve(chunk)):
+                    future = executor.submit(self._answer, members[0], retrieval, cache_context)
+                    futures[future] = members
+                # Hand out what finished while this chunk was retrieved
+                for future in [f for f in futures if f.done()]:
+                    yield from self._fan_out(futures.pop(future), future.result(), started)
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from self._fan_out(futures.pop(future), future.result(), started)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.stats["elapsed_sec"] = round(time.perf_counter() - started, 2)
+
+    # -----------------------------
+    # Internals
+    # -----------------------------
+
+    def _retrieve(self, chunk):
+        """(results, retrieval_info) per chunk entry, one batched retrieval per collection and k"""
+        out = [([], None)] * len(chunk)
+        if not (self.rag_engine.fetch_simple_search and self.rag_engine.build_prompt_with_sources):
+            return out
+        scopes: Dict[Any, List[int]] = OrderedDict()
+        for n, (members, _) in enumerate(chunk):
+            scopes.setdefault((members[0]["collection"], members[0]["num_results"]), []).append(n)
+        for (collection, num_results), indexes in scopes.items():
+            try:
+                retrieved = self.rag_engine.batch_retrieval_with_normalization(
+                    [chunk[n][0][0]["query"] for n in indexes], collection=collection, num_results=num_results
+                )
+            except Exception as e:
+                print(f"Batch retrieval failed for {len(indexes)} questions: {e}")
+                continue
+            for n, (results, used_query, retrieval_info) in zip(indexes, retrieved):
+                out[n] = (results, retrieval_info)
+        return out
+
+    def _answer(self, item: Dict[str, Any], retrieval, cache_context) -> Dict[str, Any]:
+        """Generate one answer; errors are returned in the payload, not raised"""
+        results, retrieval_info = retrieval
+        generation_params = _generation_params(self.rag_engine, item)
+        try:
+            if results:
+                prompt, sources_meta = self.rag_engine.build_prompt(item["query"], results, generation_params["max_tokens"])
+            else:
+                prompt, sources_meta = fallback_prompt(item["query"]), []
+            ticket = self._admit()
+            try:
+                answer_text = self.model_mgr.generate(prompt, ticket=ticket, **generation_params).strip()
+            finally:
+                if ticket is not None:
+                    ticket.release()
+            citations, used_sources = self.rag_engine.extract_citations(answer_text, sources_meta)
+            if not citations and sources_meta:
+                answer_text, citations, used_sources = self.rag_engine.auto_cite_answer(answer_text, sources_meta)
+        except Exception as e:
+            return {"error": str(e), "retrieval": retrieval_info}
+        payload = {
+            "answer": answer_text,
+            "citations": citations,
+            "sources": used_sources,
+            "verification": None,
+            "retrieval": retrieval_info,
+        }
+        if cache_context and answer_text:
+            self.rag_engine.store_answer(cache_context, payload)
+        return {**payload, "cached": False}
+
+    def _admit(self):
+        """Granted scheduler ticket (client "batch"), waiting out a full queue; None without a scheduler"""
+        scheduler = getattr(self.model_mgr, "scheduler", None)
+        if scheduler is None:
+            return None
+        while True:
+            try:
+                ticket = scheduler.enqueue("batch")
+            except QueueFullError as e:
+                time.sleep(min(e.retry_after, 5))
+                continue
+            if ticket.wait(Config.INFERENCE_QUEUE_TIMEOUT):
+                return ticket
+            ticket.release()
+
+    def _fan_out(self, members, payload: Dict[str, Any], started: float) -> Iterator[Dict[str, Any]]:
+        if payload.get("error"):
+            self.stats["errors"] += 1
+        elif not payload.get("cached"):
+            self.stats["generated"] += 1
+        for item in members:
+            yield {
+                "id": item["id"],
+                "query": item["query"],
+                "collection": item["collection"],
+                "num_results": item["num_results"],
+                **payload,
+                "shared_with": members[0]["id"] if item is not members[0] else None,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+
+
+def _generation_params(rag_engine, item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "max_tokens": rag_engine.effective_max_tokens(item["max_tokens"]),
+        "temperature": item["temperature"],
+        "top_p": item["top_p"],
+    }
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def read_questions(path: str) -> List[Any]:
+    """JSONL objects or plain text lines; blank lines are skipped but still count for default ids"""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                question = json.loads(line)
+                question.setdefault("id", n)
+            else:
+                question = {"id": n, "query": line}
+            questions.append(question)
+    return questions
+
+
+def answered_ids(path: str) -> set:
+    """Ids with an answer (no error) in an existing output file"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Partial last line of an interrupted run
+            if record.get("id") is not None and not record.get("error"):
+                done.add(str(record["id"]))
+    return done
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Answer a file of questions through the RAG pipeline")
+    parser.add_argument("questions", help="JSONL (objects with id/query) or text file, one question per line")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results, appended to when resuming")
+    parser.add_argument("--concurrency", type=int, default=None, help="Generations in flight (default: provider capacity)")
+    parser.add_argument("--collection", default=_DEFAULTS["collection"])
+    parser.add_argument("--num-results", type=int, default=_DEFAULTS["num_results"])
+    parser.add_argument("--max-tokens", type=int, default=_DEFAULTS["max_tokens"])
+    parser.add_argument("--temperature", type=float, default=_DEFAULTS["temperature"])
+    parser.add_argument("--top-p", type=float, default=_DEFAULTS["top_p"])
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse cached answers (fresh ones are still stored)")
+    parser.add_argument("--no-resume", action="store_true", help="Answer every question even if already in the output")
+    args = parser.parse_args(argv)
+
+    items = normalize_items(read_questions(args.questions), {
+        "collection": args.collection,
+        "num_results": args.num_results,
+        "max_tokens": args.max_tokens,
+        "temperature": args.temperature,
+        "top_p": args.top_p,
+    })
+    if not args.no_resume:
+        done = answered_ids(args.output)
+        if done:
+            print(f"Resuming: {len(done)} questions already answered in {args.output}")
+        items = [item for item in items if item["id"] not in done]
+    if not items:
+        print("Nothing to do")
+        return
+
+    from .app_factory import create_app
+    app = create_app()
+    with app.app_context():
+        runner = BatchRunner(app.config['RAG_ENGINE'], concurrency=args.concurrency, use_cache=not args.no_cache)
+        print(f"Answering {len(items)} questions with {runner.concurrency} generations in flight → {args.output}")
+        with open(args.output, "a", encoding="utf-8") as out:
+            for n, record in enumerate(runner.run(items), start=1):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                if n % 10 == 0 or n == len(items):
+                    print(f"  {n}/{len(items)} ({record['elapsed_ms'] / 1000:.1f}s)")
+
+    stats = runner.stats
+    rate = stats["questions"] / stats["elapsed_sec"] * 60 if stats["elapsed_sec"] else 0
+    print(f"{stats['questions']} questions ({stats['unique']} unique): {stats['cached']} cached, "
+          f"{stats['generated']} generated, {stats['errors']} errors in {stats['elapsed_sec']:.1f}s ({rate:.1f}/min)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark llama.cpp prompt-prefix (KV cache) reuse.
+
+Sends RAG-shaped prompts (constant system prefix, sources block, question) to
+the llama.cpp server's chat endpoint with `cache_prompt` off and on, and
+reports how many prompt tokens the server had to prefill per request. Each
+"topic" is a fixed set of code sections asked several questions, as happens
+when users follow up on the same retrieved sources.
+
+The server reports `timings.prompt_n` (tokens evaluated) and `timings.cache_n`
+(tokens reused from the slot's cache); `usage.prompt_tokens` is the full
+prompt length.
+
+Usage:
+    python -m services.rag.bench_prefix_cache --topics 3 --questions 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from .config import Config
+from .retrieval import build_prompt_with_sources
+from .section_index import load_code_documents
+
+_QUESTIONS = [
+    "What does this section require?",
+    "Who is responsible for approving this?",
+    "Are there any exceptions or variances allowed?",
+    "What are the deadlines or time limits?",
+    "What happens if the requirement is not met?",
+    "Which other sections are referenced?",
+]
+
+
+def _messages(prompt) -> List[Dict[str, str]]:
+    # Same layout as LocalLlamaCppProvider.to_messages
+    return [
+        {"role": "system", "content": prompt.system},
+        {"role": "user", "content": prompt.sources},
+        {"role": "user", "content": prompt.question},
+    ]
+
+
+def _request(base_url: str, messages: List[Dict[str, str]], cache_prompt: bool,
+             slots: int, max_tokens: int) -> Dict[str, Any]:
+    body: Dict[str, Any] = {
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": 0,
+        "cache_prompt": cache_prompt,
+    }
+    if slots > 0:
+        prefix = "\x00".join(m["content"] for m in messages[:-1])
+        body["id_slot"] = zlib.crc32(prefix.encode("utf-8")) % slots
+    start = time.perf_counter()
+    response = requests.post(f"{base_url}/chat/completions", json=body, timeout=300)
+    response.raise_for_status()
+    data = response.json()
+    timings = data.get("timings", {})
+    prompt_tokens = data.get("usage", {}).get("prompt_tokens") or (
+        timings.get("prompt_n", 0) + timings.get("cache_n", 0)
+    )
+    return {
+        "prompt_tokens": prompt_tokens,
+        "evaluated": timings.get("prompt_n", prompt_tokens),
+        "cached": timings.get("cache_n", 0),
+        "prompt_ms": timings.get("prompt_ms"),
+        "wall_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+def run(base_url: str, documents: Dict[str, str], topics: int, questions: int, sources_per_topic: int,
+        cache_prompt: bool, slots: int, max_tokens: int, max_chunk_chars: int) -> List[Dict[str, Any]]:
+    doc_ids = sorted(documents)[:topics * sources_per_topic]
+    rows = []
+    for t in range(topics):
+        results = [
+            {"collection": "la_plata_code", "id": doc_id, "text": documents[doc_id]}
+            for doc_id in doc_ids[t * sources_per_topic:(t + 1) * sources_per_topic]
+        ]
+        for q in range(questions):
+            prompt, _ = build_prompt_with_sources(
+                _QUESTIONS[q % len(_QUESTIONS)], results, max_chunk_chars=max_chunk_chars
+            )
+            row = _request(base_url, _messages(prompt), cache_prompt, slots, max_tokens)
+            row.update(topic=t, question=q)
+            rows.append(row)
+    return rows
+
+
+def _summary(label: str, rows: List[Dict[str, Any]]) -> Dict[str, float]:
+    evaluated = [r["evaluated"] for r in rows]
+    total = [r["prompt_tokens"] for r in rows]
+    prompt_ms = [r["prompt_ms"] for r in rows if r["prompt_ms"] is not None]
+    summary = {
+        "evaluated": statistics.mean(evaluated),
+        "prompt_tokens": statistics.mean(total),
+        "prompt_ms": statistics.mean(prompt_ms) if prompt_ms else float("nan"),
+    }
+    print(f"{label:>14}: {summary['prompt_tokens']:8.0f} prompt tok/req  "
+          f"{summary['evaluated']:8.0f} prefilled tok/req  {summary['prompt_ms']:8.1f} prefill ms/req")
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure llama.cpp prompt cache reuse for RAG prompts")
+    parser.add_argument("--base-url", default=Config.LLAMA_CPP_BASE_URL, help="OpenAI-compatible llama.cpp URL")
+    parser.add_argument("--code-dir", default=Config.CODE_DIR, help="Directory with full_code.json or section_*.txt")
+    parser.add_argument("--topics", type=int, default=3, help="Distinct source sets")
+    parser.add_argument("--questions", type=int, default=4, help="Questions per source set")
+    parser.add_argument("--sources", type=int, default=3, help="Sources per prompt")
+    parser.add_argument("--max-chunk-chars", type=int, default=1500)
+    parser.add_argument("--max-tokens", type=int, default=8, help="Output tokens per request (kept small)")
+    parser.add_argument("--slots", type=int, default=Config.LLAMA_CPP_SLOTS, help="Server slots for prefix affinity")
+    args = parser.parse_args(argv)
+
+    documents = load_code_documents(args.code_dir)
+    if not documents:
+        parser.error(f"No code documents found in {args.code_dir}")
+
+    common = dict(topics=args.topics, questions=args.questions, sources_per_topic=args.sources,
+                  slots=args.slots, max_tokens=args.max_tokens, max_chunk_chars=args.max_chunk_chars)
+    print(f"{args.topics} topics x {args.questions} questions, {args.sources} sources each → {args.base_url}")
+    off = _summary("cache_prompt=0", run(args.base_url, documents, cache_prompt=False, **common))
+    rows = run(args.base_url, documents, cache_prompt=True, **common)
+    on = _summary("cache_prompt=1", rows)
+
+    saved = off["evaluated"] - on["evaluated"]
+    print(f"Prefill tokens saved per request: {saved:.0f} "
+          f"({saved / off['evaluated'] * 100 if off['evaluated'] else 0:.1f}%)")
+    follow_ups = [r for r in rows if r["question"] > 0]
+    if follow_ups:
+        print(f"Follow-up questions reuse {statistics.mean(r['cached'] for r in follow_ups):.0f} cached tokens "
+              f"and prefill {statistics.mean(r['evaluated'] for r in follow_ups):.0f}")
+
+
+if __name__ == "__main__":
+    main()
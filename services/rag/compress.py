@@ -0,0 +1,167 @@
+"""
+Extractive, query-focused compression of retrieved sources.
+
+Prefill of several multi-thousand-character sources dominates time to first
+token on the local backend. Before the prompt is built, each long source is
+reduced to its spans (sentences or lines) most relevant to the question until
+a target fraction of its text remains. Spans are scored by lexical coverage of
+the question terms (IDF-weighted across the retrieved sources) and, when an
+embedding function is given, by cosine similarity to the question.
+
+Kept spans stay in document order and keep their character offsets into the
+original text, so each `[n]` still maps to the same source and the UI can
+highlight exactly what the model saw.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .retrieval import _tokenize
+
+# Sentence ends followed by whitespace, and line breaks
+_SPAN_END_RE = re.compile(r"[.!?;:](?=\s)|\n+")
+
+# Separator between non-adjacent kept spans
+GAP_MARKER = " … "
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it its may me my of on or "
+    "shall that the their there this to what when where which who will with".split()
+)
+
+
+def split_spans(text: str, min_chars: int = 20) -> List[Tuple[int, int]]:
+    """Split text into (start, end) sentence/line spans; short fragments join the next span."""
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    for m in _SPAN_END_RE.finditer(text):
+        end = m.end()
+        if len(text[start:end].strip()) >= min_chars:
+            spans.append((start, end))
+            start = end
+    if text[start:].strip():
+        spans.append((start, len(text)))
+    # Strip surrounding whitespace from offsets
+    stripped = []
+    for s, e in spans:
+        chunk = text[s:e]
+        s2 = s + (len(chunk) - len(chunk.lstrip()))
+        e2 = e - (len(chunk) - len(chunk.rstrip()))
+        if e2 > s2:
+            stripped.append((s2, e2))
+    return stripped
+
+
+def _terms(text: str) -> List[str]:
+    return [t for t in _tokenize(text) if t not in _STOPWORDS]
+
+
+def compress_results(
+    question: str,
+    results: List[Dict[str, Any]],
+    *,
+    ratio: float = 0.5,
+    min_chars: int = 600,
+    embed_fn: Optional[Callable[[List[str]], Sequence[Sequence[float]]]] = None,
+    embedding_weight: float = 0.4,
+) -> List[Dict[str, Any]]:
+    """Compress each result's text to at most about `ratio` of its length.
+
+    Spans that match the question are kept best first, then the others in
+    document order, until `ratio` of the text is reached. Sources shorter than
+    `min_chars`, or with no span after the first matching the question, are
+    left alone.
+    Returns new result dicts: `text` is the compressed text, `original_text`
+    the full text and `spans` the kept [start, end] offsets into it. The first
+    span (usually the section heading) is always kept.
+
+    Args:
+        question: User question
+        results: Retrieved results in rank order
+        ratio: Target fraction of characters to keep
+        min_chars: Minimum source length to compress
+        embed_fn: Optional function returning unit-normalized embeddings for a
+            list of texts; the question is embedded together with the spans
+        embedding_weight: Weight of embedding similarity vs lexical coverage
+    """
+    if ratio >= 1.0 or not results:
+        return results
+
+    texts = [(r.get("text") or "") for r in results]
+    span_lists = [split_spans(t) if len(t) >= min_chars else [] for t in texts]
+
+    # IDF of terms across all candidate spans
+    all_spans = [texts[i][s:e] for i, spans in enumerate(span_lists) for s, e in spans]
+    if not all_spans:
+        return results
+    span_terms = [set(_terms(s)) for s in all_spans]
+    df: Dict[str, int] = {}
+    for terms in span_terms:
+        for t in terms:
+            df[t] = df.get(t, 0) + 1
+    n = len(all_spans)
+    q_terms = set(_terms(question))
+    idf = {t: math.log(1 + n / (1 + df.get(t, 0))) for t in q_terms}
+    q_weight = sum(idf.values()) or 1.0
+    lexical = [sum(idf[t] for t in q_terms & terms) / q_weight for terms in span_terms]
+
+    semantic: Optional[List[float]] = None
+    if embed_fn is not None:
+        try:
+            vectors = embed_fn([question] + all_spans)
+            q_vec = vectors[0]
+            semantic = [max(0.0, sum(a * b for a, b in zip(q_vec, v))) for v in vectors[1:]]
+        except Exception as e:
+            print(f"Span embedding failed, compressing lexically: {e}")
+
+    compressed: List[Dict[str, Any]] = []
+    k = 0
+    for r, text, spans in zip(results, texts, span_lists):
+        if not spans:
+            compressed.append(r)
+            continue
+        scores = []
+        for j in range(len(spans)):
+            score = lexical[k + j]
+            if semantic is not None:
+                score = (1 - embedding_weight) * score + embedding_weight * semantic[k + j]
+            scores.append(score)
+        k += len(spans)
+
+        matching = sorted((j for j in range(1, len(spans)) if scores[j] > 0), key=lambda j: (-scores[j], j))
+        if not matching:
+            # Nothing to rank by (e.g. a paraphrased question): keep the whole source
+            compressed.append(r)
+            continue
+        target = ratio * len(text)
+        keep = {0}
+        kept_chars = spans[0][1] - spans[0][0]
+        # Matching spans best first, then the rest in document order
+        unmatched = [j for j in range(1, len(spans)) if scores[j] <= 0]
+        for j in matching + unmatched:
+            if kept_chars >= target:
+                break
+            keep.add(j)
+            kept_chars += spans[j][1] - spans[j][0]
+
+        kept = [list(spans[j]) for j in sorted(keep)]
+        # Merge adjacent spans so offsets describe contiguous regions
+        merged: List[List[int]] = []
+        for j in sorted(keep):
+            s, e = spans[j]
+            if merged and j - 1 in keep:
+                merged[-1][1] = e
+            else:
+                merged.append([s, e])
+        parts = [text[s:e] for s, e in merged]
+        compressed.append({
+            **{key: value for key, value in r.items() if key != "terms"},  # Term features describe the original text
+            "text": GAP_MARKER.join(parts),
+            "original_text": text,
+            "spans": merged,
+            "compression": round(sum(e - s for s, e in kept) / max(len(text), 1), 3),
+        })
+    return compressed
@@ -25,10 +25,53 @@ class Config:
     # Inference service settings
     INFERENCE_SERVICE_TIMEOUT = int(os.environ.get('INFERENCE_SERVICE_TIMEOUT', '300'))  # 5 minutes
     MAX_CHUNK_CHARS = int(os.environ.get('MAX_CHUNK_CHARS', '3000'))  # Limit source text length for better performance
+    MODEL_CONTEXT_TOKENS = int(os.environ.get('MODEL_CONTEXT_TOKENS', '4096'))  # llama.cpp context (--ctx-size)
+    BEDROCK_CONTEXT_TOKENS = int(os.environ.get('BEDROCK_CONTEXT_TOKENS', '200000'))
+    MIN_PROMPT_TOKENS = int(os.environ.get('MIN_PROMPT_TOKENS', '1024'))  # max_tokens is lowered to leave this for the prompt
+    SOURCE_TOKEN_BUDGET = int(os.environ.get('SOURCE_TOKEN_BUDGET', '0'))  # Cap on source tokens per prompt, 0 = fill the context
+    
+    # Query-focused source compression (see compress.py)
+    COMPRESSION_RATIO = float(os.environ.get('COMPRESSION_RATIO', '1.0'))  # Fraction of each long source kept, 1.0 disables
+    COMPRESSION_MIN_CHARS = int(os.environ.get('COMPRESSION_MIN_CHARS', '600'))  # Shorter sources are kept whole
+    COMPRESSION_EMBEDDINGS = os.environ.get('COMPRESSION_EMBEDDINGS', 'false').lower() == 'true'  # Also score spans by embedding similarity
+    EMBED_BATCH_SIZE = int(os.environ.get('EMBED_BATCH_SIZE', '16'))  # Texts per /embed call (search MAX_BATCH_QUERIES)
     
     # Retrieval settings
     DEFAULT_COLLECTION = os.environ.get('DEFAULT_COLLECTION') or 'la_plata_county_code'
     COLLECTIONS = ['la_plata_county_code', 'la_plata_assessor']
+    RETRIEVAL_BACKEND = os.environ.get('RETRIEVAL_BACKEND', 'http')  # http, batched_http, in_process
+    SEARCH_API_URL = os.environ.get('SEARCH_API_URL', 'http://localhost:8000')
+    SEARCH_TIMEOUT = int(os.environ.get('SEARCH_TIMEOUT', '20'))  # Seconds per attempt
+    SEARCH_HTTP_TOTAL_DEADLINE = float(os.environ.get('SEARCH_HTTP_TOTAL_DEADLINE', '30'))  # Seconds across retries
+    SEARCH_HTTP_RETRIES = int(os.environ.get('SEARCH_HTTP_RETRIES', '2'))  # Idempotent calls only
+    SEARCH_HTTP_BACKOFF = float(os.environ.get('SEARCH_HTTP_BACKOFF', '0.1'))  # Base for full-jitter backoff
+    SEARCH_HTTP_BACKOFF_MAX = float(os.environ.get('SEARCH_HTTP_BACKOFF_MAX', '1.0'))
+    INDEX_VERSION_TTL = float(os.environ.get('INDEX_VERSION_TTL', '30'))  # Seconds between index version checks
+    
+    # Query variations (retrieved concurrently, see RAGEngine.enhanced_retrieval_with_normalization)
+    VARIATION_WORKERS = int(os.environ.get('VARIATION_WORKERS', '4'))
+    VARIATION_DEADLINE = float(os.environ.get('VARIATION_DEADLINE', '10.0'))
+    VARIATION_ACCEPT_SCORE = float(os.environ.get('VARIATION_ACCEPT_SCORE', '0.8'))  # 0 disables early acceptance
+    BATCH_SEARCH_SIZE = int(os.environ.get('BATCH_SEARCH_SIZE', '16'))  # Queries per search_many call in batch jobs; search service MAX_BATCH_QUERIES
+    
+    # Cross-reference expansion (lookups run concurrently)
+    REFERENCE_EXPANSION_WORKERS = int(os.environ.get('REFERENCE_EXPANSION_WORKERS', '3'))
+    REFERENCE_EXPANSION_DEADLINE = float(os.environ.get('REFERENCE_EXPANSION_DEADLINE', '5.0'))  # Late lookups are dropped
+    CODE_DIR = os.environ.get('CODE_DIR', 'la_plata_code')  # Scraped land use code
+    SECTION_INDEX_PATH = os.environ.get('SECTION_INDEX_PATH', 'la_plata_code/section_index.json')  # Built from CODE_DIR if missing
+    XREF_GRAPH_PATH = os.environ.get('XREF_GRAPH_PATH', 'la_plata_code/xref_graph.json')  # Built from CODE_DIR if missing
+    XREF_MAX_DEPTH = int(os.environ.get('XREF_MAX_DEPTH', '2'))  # Citation hops followed from retrieved sections
+    XREF_MAX_FANOUT = int(os.environ.get('XREF_MAX_FANOUT', '8'))  # Strongest citations followed per section
+    
+    # Answer cache (see answer_cache.py); keyed on query, parameters, provider and index versions
+    ANSWER_CACHE_ENABLED = os.environ.get('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+    ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get('ANSWER_CACHE_MAX_ENTRIES', '512'))
+    ANSWER_CACHE_TTL = float(os.environ.get('ANSWER_CACHE_TTL', '3600'))  # Seconds
+    ANSWER_CACHE_DIR = os.environ.get('ANSWER_CACHE_DIR', '')  # Optional disk tier, shared across workers
+    ANSWER_CACHE_DISK_MAX_ENTRIES = int(os.environ.get('ANSWER_CACHE_DISK_MAX_ENTRIES', '10000'))  # Oldest files pruned beyond this
+    SEMANTIC_CACHE_ENABLED = os.environ.get('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true'  # Paraphrase matching
+    SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', '0.95'))  # Cosine similarity
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get('SEMANTIC_CACHE_MAX_ENTRIES', '1024'))
     
     # LLM Provider Configuration
     DEPLOYMENT_ENV = os.environ.get('DEPLOYMENT_ENV', 'local')
@@ -36,12 +79,28 @@ class Config:
     # Local llama.cpp Configuration
     LLAMA_CPP_BASE_URL = os.environ.get('LLAMA_CPP_BASE_URL', 'http://localhost:8003/v1')
     LLAMA_CPP_HEALTH_URL = os.environ.get('LLAMA_CPP_HEALTH_URL', 'http://localhost:8003/health')
+    LLAMA_CPP_BASE_URLS = [u.strip() for u in os.environ.get('LLAMA_CPP_BASE_URLS', '').split(',') if u.strip()]  # Several servers; overrides LLAMA_CPP_BASE_URL
+    LLAMA_CPP_EJECT_FAILURES = int(os.environ.get('LLAMA_CPP_EJECT_FAILURES', '3'))  # Consecutive failures that eject a server from the pool
+    LLAMA_CPP_EJECT_SEC = float(os.environ.get('LLAMA_CPP_EJECT_SEC', '30'))
+    LLAMA_CPP_AFFINITY_SLACK = int(os.environ.get('LLAMA_CPP_AFFINITY_SLACK', '2'))  # Extra in-flight requests tolerated to keep a prefix on its server
+    LLAMA_CPP_CACHE_PROMPT = os.environ.get('LLAMA_CPP_CACHE_PROMPT', 'true').lower() == 'true'  # Reuse KV cache of the shared prompt prefix
+    LLAMA_CPP_SLOTS = int(os.environ.get('LLAMA_CPP_SLOTS', '0'))  # Server --parallel; >0 pins shared prefixes to a slot
     
     # AWS Bedrock Configuration
     AWS_REGION = os.environ.get('AWS_REGION', 'us-west-2')
     BEDROCK_STAGING_MODEL = os.environ.get('BEDROCK_STAGING_MODEL', 'anthropic.claude-3-haiku-20240307')
     BEDROCK_PRODUCTION_MODEL = os.environ.get('BEDROCK_PRODUCTION_MODEL', 'anthropic.claude-3-sonnet-20240229')
     
+    # Mock LLM provider (DEPLOYMENT_ENV=mock, replay and load tests; see providers/mock.py)
+    MOCK_PROVIDER_ENABLED = os.environ.get('MOCK_PROVIDER_ENABLED', 'false').lower() == 'true'  # Allow switching to it at runtime outside DEPLOYMENT_ENV=mock
+    MOCK_TTFT_MS = float(os.environ.get('MOCK_TTFT_MS', '300'))  # Median time to first token
+    MOCK_TTFT_SIGMA = float(os.environ.get('MOCK_TTFT_SIGMA', '0.3'))  # Log-normal spread of TTFT; 0 = fixed
+    MOCK_TOKEN_DELAY_MS = float(os.environ.get('MOCK_TOKEN_DELAY_MS', '25'))  # Between output tokens
+    MOCK_OUTPUT_TOKENS = int(os.environ.get('MOCK_OUTPUT_TOKENS', '150'))  # Capped by the request's max_tokens
+    MOCK_FAILURE_RATE = float(os.environ.get('MOCK_FAILURE_RATE', '0'))  # Share of requests failing before the first token
+    MOCK_STREAM_FAILURE_RATE = float(os.environ.get('MOCK_STREAM_FAILURE_RATE', '0'))  # Share failing mid-stream
+    MOCK_SEED = int(os.environ.get('MOCK_SEED', '42'))  # Latency and failure draws
+    
     # Generation Parameters (consistent across providers)
     GENERATION_TEMPERATURE = float(os.environ.get('GENERATION_TEMPERATURE', '0.1'))
     GENERATION_MAX_TOKENS = int(os.environ.get('GENERATION_MAX_TOKENS', '1200'))
@@ -50,9 +109,58 @@ class Config:
     
     # Provider Selection Strategy
     PROVIDER_HEALTH_CHECK_TIMEOUT = int(os.environ.get('PROVIDER_HEALTH_CHECK_TIMEOUT', '5'))
+    PROVIDER_HEALTH_INTERVAL = float(os.environ.get('PROVIDER_HEALTH_INTERVAL', '15'))  # Seconds between background probes
+    PROVIDER_BREAKER_FAILURES = int(os.environ.get('PROVIDER_BREAKER_FAILURES', '3'))  # Consecutive request failures that open the circuit
+    PROVIDER_BREAKER_RESET = float(os.environ.get('PROVIDER_BREAKER_RESET', '30'))  # Seconds open before retrying
     
     # Inference Manager Configuration
     INFERENCE_MANAGER_TYPE = os.environ.get('INFERENCE_MANAGER_TYPE', 'langchain')
+    INFERENCE_MAX_CONCURRENCY = int(os.environ.get('INFERENCE_MAX_CONCURRENCY', '4'))  # Per process; match llama-server --parallel; 0 = unlimited
+    INFERENCE_QUEUE_SIZE = int(os.environ.get('INFERENCE_QUEUE_SIZE', '64'))  # Waiting generations before 429
+    INFERENCE_QUEUE_PER_CLIENT = int(os.environ.get('INFERENCE_QUEUE_PER_CLIENT', '8'))
+    INFERENCE_QUEUE_TIMEOUT = float(os.environ.get('INFERENCE_QUEUE_TIMEOUT', '120'))  # Max seconds waiting for a slot
+    INFERENCE_CLIENT_ID_HEADER = os.environ.get('INFERENCE_CLIENT_ID_HEADER', '')  # Header set by a trusted proxy to key fair queueing; '' = client address
+    INFERENCE_HEDGE_TTFT_SEC = float(os.environ.get('INFERENCE_HEDGE_TTFT_SEC', '0'))  # Hedge to the next provider after this long without a first token; 0 = off
+    INFERENCE_HEDGE_RECOVERY_SEC = float(os.environ.get('INFERENCE_HEDGE_RECOVERY_SEC', '60'))  # Before a demoted slow provider is tried first again
+    
+    # Batch answering (/rag/answer/batch and python -m services.rag.batch)
+    BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '0'))  # Generations in flight per batch; 0 = INFERENCE_MAX_CONCURRENCY
+    BATCH_RETRIEVAL_CHUNK = int(os.environ.get('BATCH_RETRIEVAL_CHUNK', '32'))  # Questions retrieved together before their generations start
+    BATCH_MAX_QUESTIONS = int(os.environ.get('BATCH_MAX_QUESTIONS', '1000'))  # Per /rag/answer/batch request
+    BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', '16'))  # Cap on a /rag/answer/batch request's "concurrency"
+    
+    # Request tracing (see tracing.py); clients can also ask for "timings": true
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0.01'))  # Share of requests exported; 0 = off
+    TRACE_EXPORTER = os.environ.get('TRACE_EXPORTER', 'log')  # log ("rag.trace" logger), file or none
+    TRACE_FILE = os.environ.get('TRACE_FILE', 'logs/traces.jsonl')  # For TRACE_EXPORTER=file
+    TRACE_QUEUE_SIZE = int(os.environ.get('TRACE_QUEUE_SIZE', '1000'))  # Traces waiting for export; more are dropped
+    TRACE_CAPTURE_PROMPTS = os.environ.get('TRACE_CAPTURE_PROMPTS', 'false').lower() == 'true'  # Full prompt and answer text
+    TRACE_CAPTURE_SAMPLE_RATE = float(os.environ.get('TRACE_CAPTURE_SAMPLE_RATE', '0.1'))  # Share of exported traces with text
+    
+    # Audit log of questions and answers (see audit.py)
+    AUDIT_ENABLED = os.environ.get('AUDIT_ENABLED', 'false').lower() == 'true'
+    AUDIT_DIR = os.environ.get('AUDIT_DIR', 'logs/audit')
+    AUDIT_SAMPLE_RATE = float(os.environ.get('AUDIT_SAMPLE_RATE', '1.0'))  # Share of answers recorded
+    AUDIT_ROUTE_SAMPLE_RATES = os.environ.get('AUDIT_ROUTE_SAMPLE_RATES', '')  # Per route, e.g. "answer=1,answer_stream=0.5,answer_batch=0.1"
+    AUDIT_SEGMENT_MAX_BYTES = int(os.environ.get('AUDIT_SEGMENT_MAX_BYTES', str(64 * 1024 * 1024)))  # Compressed
+    AUDIT_SEGMENT_MAX_AGE_SEC = float(os.environ.get('AUDIT_SEGMENT_MAX_AGE_SEC', '3600'))
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', '10000'))  # Records waiting to be written; more are dropped
+    
+    # Application log file (production)
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', '10'))
+    
+    # Pre-fork WSGI server settings (gunicorn, see gunicorn_conf.py)
+    SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:8001')
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', '2'))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', '8'))  # Each SSE stream holds one thread
+    WORKER_MAX_REQUESTS = int(os.environ.get('WORKER_MAX_REQUESTS', '0'))  # 0 = never recycle workers
+    WORKER_MAX_REQUESTS_JITTER = int(os.environ.get('WORKER_MAX_REQUESTS_JITTER', '0'))
+    WORKER_GRACEFUL_TIMEOUT = int(os.environ.get('WORKER_GRACEFUL_TIMEOUT', '30'))
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', '0'))  # Trusted reverse proxies setting X-Forwarded-For; 0 = use the peer address
+    
+    # Pooled connections to the search service, sized to per-worker concurrency
+    SEARCH_HTTP_POOL_SIZE = int(os.environ.get('SEARCH_HTTP_POOL_SIZE', str(SERVER_THREADS)))
     
     # LangSmith Configuration
     LANGSMITH_API_KEY = os.environ.get('LANGSMITH_API_KEY')
@@ -93,7 +201,7 @@ class ProductionConfig(Config):
         if not app.debug and not app.testing:
             if not os.path.exists('logs'):
                 os.mkdir('logs')
-            file_handler = RotatingFileHandler('logs/rag_api.log', maxBytes=10240, backupCount=10)
+            file_handler = RotatingFileHandler('logs/rag_api.log', maxBytes=Config.LOG_MAX_BYTES, backupCount=Config.LOG_BACKUP_COUNT)
             file_handler.setFormatter(logging.Formatter(
                 '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
             ))
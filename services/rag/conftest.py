@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.inference.scheduler import GenerationScheduler
+from services.rag.providers.mock import MockProvider
+from services.rag.rag_engine import RAGEngine
+from services.rag.retrieval import build_prompt_with_sources
+
+
+class _Backend:
+    supports_batching = False
+
+    def search(self, query, collection=None, num_results=5):
+        return {"results": [{"id": f"{query}-{i}", "collection": collection, "text": f"Text {i} of {query}",
+                             "relevance": 0.5} for i in range(num_results)]}
+
+
+class _Manager:
+    def __init__(self):
+        self.provider = MockProvider(ttft_ms=50, ttft_sigma=0, token_delay_ms=2, output_tokens=20)
+        self.scheduler = GenerationScheduler(1)
+
+    def stream_generate(self, prompt, ticket=None, **kwargs):
+        assert ticket is not None and ticket.granted
+        yield from self.provider.stream_generate(self.provider.to_messages(prompt), **kwargs)
+
+
+@pytest.fixture
+def rag_engine():
+    """RAGEngine over a fake search backend and the mock provider; two query variations per question"""
+    engine = RAGEngine()
+    engine.model_mgr = _Manager()
+    engine.retrieval_backend = _Backend()
+    engine.fetch_simple_search = engine.retrieval_backend.search
+    engine.normalize_legal_query = lambda q: q.lower()
+    engine.get_query_variations = lambda q: [q, q + " zoning"]
+    engine.expand_query_with_references = lambda q, results, **kwargs: results
+    engine.rerank_results = lambda q, results, top_k: results[:top_k]
+    engine.build_prompt_with_sources = build_prompt_with_sources
+    return engine
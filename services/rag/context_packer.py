@@ -0,0 +1,168 @@
+"""
+Token-budget packing of retrieved sources into the prompt.
+
+The prompt must fit the model's context window together with `max_tokens` of
+output. The packer measures the fixed parts of the prompt (instructions,
+question, per-source headers) with the active model's tokenizer and then
+shares the remaining budget across sources by relevance: a source that needs
+less than its share gives the surplus to the others, and sources that would
+get only a sliver are dropped. Sources over their allocation are trimmed at a
+sentence boundary.
+
+Token counts are cached per (tokenizer, document id, text hash), so repeated
+sources cost one tokenizer call. Estimates made while the tokenizer is
+unreachable are not cached.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# Sentence ends (followed by whitespace) and line breaks are acceptable cut points
+_CUT_POINT_RE = re.compile(r"[.!?;:](?=\s)|\n")
+
+
+class EstimatedTokens(int):
+    """A token count estimated from the text length instead of the tokenizer"""
+
+
+class TokenCounter:
+    """Token counting with an LRU cache of counts per document version."""
+
+    def __init__(self, count_fn: Callable[[str], int], name: str = "", max_entries: int = 8192):
+        self.count_fn = count_fn
+        self.name = name
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[tuple, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, text: str, doc_id: Optional[str] = None) -> int:
+        if not text:
+            return 0
+        key = (doc_id, hashlib.sha1(text.encode("utf-8")).hexdigest())
+        with self._lock:
+            n = self._counts.get(key)
+            if n is not None:
+                self._counts.move_to_end(key)
+                return n
+        n = self.count_fn(text)
+        if isinstance(n, EstimatedTokens):
+            return int(n)  # Ask the tokenizer again next time
+        n = int(n)
+        with self._lock:
+            self._counts[key] = n
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return n
+
+
+def allocate_budget(needs: Sequence[int], weights: Sequence[float], budget: int) -> List[int]:
+    """Split `budget` across items in proportion to `weights`, capped at each item's need.
+
+    Water-filling: items whose need is below their share are fully granted and
+    the remainder is re-shared among the rest.
+    """
+    alloc = [0] * len(needs)
+    active = [i for i, n in enumerate(needs) if n > 0]
+    remaining = max(0, budget)
+    while active and remaining > 0:
+        weight_sum = sum(weights[i] for i in active) or float(len(active))
+        shares = {i: remaining * (weights[i] or 1.0) / weight_sum for i in active}
+        satisfied = [i for i in active if needs[i] - alloc[i] <= shares[i]]
+        if not satisfied:
+            for i in active:
+                alloc[i] += int(shares[i])
+            break
+        for i in satisfied:
+            remaining -= needs[i] - alloc[i]
+            alloc[i] = needs[i]
+            active.remove(i)
+    return alloc
+
+
+def trim_to_tokens(text: str, budget: int, counter: TokenCounter, doc_id: Optional[str] = None) -> Tuple[str, int]:
+    """Longest prefix of `text` ending at a sentence boundary that fits `budget` tokens.
+
+    Returns (text, tokens). Falls back to a cut at whitespace when no sentence
+    boundary fits.
+    """
+    total = counter.count(text, doc_id)
+    if total <= budget:
+        return text, total
+    if budget <= 0:
+        return "", 0
+
+    chars_per_token = len(text) / max(total, 1)
+    target = int(budget * chars_per_token)
+    cut_points = [m.end() for m in _CUT_POINT_RE.finditer(text, 0, target + 1)]
+    if not cut_points:
+        space = text.rfind(" ", 0, target)
+        cut_points = [space if space > 0 else target]
+
+    while cut_points:
+        trimmed = text[:cut_points.pop()].rstrip()
+        n = counter.count(trimmed)
+        if n <= budget:
+            return trimmed, n
+
+    # Even the shortest candidate is over: shrink proportionally until it fits
+    trimmed = text[:target]
+    n = counter.count(trimmed)
+    while n > budget and trimmed:
+        trimmed = trimmed[:int(len(trimmed) * budget / n * 0.95)]
+        n = counter.count(trimmed)
+    return trimmed, n
+
+
+def pack_sources(
+    texts: Sequence[str],
+    weights: Sequence[float],
+    budget: int,
+    counter: TokenCounter,
+    *,
+    doc_ids: Optional[Sequence[Optional[str]]] = None,
+    header_tokens: int = 0,
+    min_source_tokens: int = 48,
+) -> List[Optional[Tuple[str, int]]]:
+    """Fit sources into `budget` tokens.
+
+    Args:
+        texts: Source texts in rank order
+        weights: Relevance weight per source
+        budget: Tokens available for all sources, including headers
+        counter: Token counter of the active model
+        doc_ids: Cache keys for the token counts
+        header_tokens: Tokens per source header ("[n] (collection=..., id=...)")
+        min_source_tokens: Sources allocated fewer tokens than this (and that
+            would need more) are dropped
+
+    Returns:
+        One (text, tokens) per source, or None for dropped sources
+    """
+    doc_ids = list(doc_ids) if doc_ids is not None else [None] * len(texts)
+    needs = [counter.count(t, d) for t, d in zip(texts, doc_ids)]
+    keep = [bool(t) for t in texts]
+
+    # Drop the sources that cannot get a useful share, lowest ranked first
+    while True:
+        kept = [i for i in range(len(texts)) if keep[i]]
+        available = budget - header_tokens * len(kept)
+        alloc = allocate_budget([needs[i] if keep[i] else 0 for i in range(len(texts))], weights, available)
+        starved = [i for i in kept if alloc[i] < min(needs[i], min_source_tokens)]
+        if not starved:
+            break
+        keep[max(starved)] = False
+
+    packed: List[Optional[Tuple[str, int]]] = []
+    for i, text in enumerate(texts):
+        if not keep[i]:
+            packed.append(None)
+        elif alloc[i] >= needs[i]:
+            packed.append((text, needs[i]))
+        else:
+            packed.append(trim_to_tokens(text, alloc[i], counter, doc_ids[i]))
+    return packed
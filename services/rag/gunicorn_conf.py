@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration for the RAG API (production entry point)
+
+Usage (from project root):
+    gunicorn -c services/rag/gunicorn_conf.py services.rag.rag_api:app
+
+The app is preloaded in the master process so the RAG engine and provider
+clients are built once and inherited by every worker. Workers use threads
+because each `/rag/answer/stream` request holds its thread for the whole
+generation.
+
+Send SIGHUP to the master for a graceful worker reload. Because the app is
+preloaded, picking up new code requires a full restart.
+"""
+
+import gc
+import os
+import sys
+
+# Config files are loaded before gunicorn puts the working directory on sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.config import Config
+
+# The app module is imported after this file is read; default to production config
+os.environ.setdefault('FLASK_ENV', 'production')
+
+bind = Config.SERVER_BIND
+workers = Config.SERVER_WORKERS
+worker_class = 'gthread'
+threads = Config.SERVER_THREADS
+preload_app = True
+
+# Streams can legitimately run as long as the inference timeout
+timeout = Config.INFERENCE_SERVICE_TIMEOUT + 30
+graceful_timeout = Config.WORKER_GRACEFUL_TIMEOUT
+max_requests = Config.WORKER_MAX_REQUESTS
+max_requests_jitter = Config.WORKER_MAX_REQUESTS_JITTER
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    # Keep objects allocated while preloading out of GC passes so workers
+    # continue sharing their pages with the master.
+    gc.freeze()
+    server.log.info(f"RAG API preloaded; frozen {gc.get_freeze_count()} objects before fork")
@@ -0,0 +1,76 @@
+"""Async `/rag/answer` and `/rag/answer/stream` for the ASGI runtime (asgi_app.py).
+
+Same URLs, parameters and payloads as the Flask handlers in answer.py and
+stream.py, over the same `AnswerPipeline` (pipeline.py). `aevents()` retrieves
+through the backend's async methods and generates through the provider's
+`astream`, so a stream holds no thread while tokens are generated.
+"""
+
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, StreamingResponse
+
+from .pipeline import SSE_HEADERS, SSE_PADDING, AnswerPipeline, _client_id, _sse
+
+
+async def _json_body(request):
+    """Parsed JSON body, {} when empty or invalid (like Flask's get_json(silent=True) or {})"""
+    try:
+        return (await request.json()) or {}
+    except ValueError:
+        return {}
+
+
+def _pipeline(request, data, route):
+    remote_addr = request.client.host if request.client else None
+    return AnswerPipeline(request.app.state.rag_engine, data, route, _client_id(request.headers, remote_addr))
+
+
+async def rag_answer(request):
+    data = await _json_body(request)
+    if not isinstance(data, dict):
+        return JSONResponse({"error": "request body must be a JSON object"}, status_code=400)
+    try:
+        pipeline = _pipeline(request, data, "answer")
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    try:
+        async for _ in pipeline.aevents():
+            pass
+        status, body, headers = pipeline.response()
+        return JSONResponse(body, status_code=status, headers=headers)
+    except Exception as e:
+        pipeline.trace.finish(error=str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+    finally:
+        pipeline.close()
+
+
+async def rag_answer_stream(request):
+    if request.method == "GET":
+        data = dict(request.query_params)
+    else:
+        data = await _json_body(request)
+        if not isinstance(data, dict):
+            return JSONResponse({"error": "request body must be a JSON object"}, status_code=400)
+    try:
+        pipeline = _pipeline(request, data, "answer_stream")
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    async def generate():
+        events = pipeline.aevents()
+        try:
+            yield _sse(await events.__anext__()) + SSE_PADDING
+            async for event in events:
+                yield _sse(event)
+        finally:
+            await events.aclose()
+            pipeline.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream; charset=utf-8",
+        headers=SSE_HEADERS,
+        background=BackgroundTask(pipeline.close),
+    )
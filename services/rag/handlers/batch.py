@@ -0,0 +1,60 @@
+from flask import Blueprint, request, Response, jsonify, current_app, stream_with_context
+import json
+
+from .. import audit
+from ..batch import BatchRunner, normalize_items
+from ..config import Config
+
+batch_bp = Blueprint('batch', __name__)
+
+@batch_bp.route('/rag/answer/batch', methods=['POST'])
+def rag_answer_batch():
+    """Answer many questions in one request, streaming NDJSON results as they complete.
+
+    Body: {"questions": [str | {"id", "query", ...}], plus optional defaults
+    "collection", "num_results", "max_tokens", "temperature", "top_p",
+    "cache", "concurrency"}. Each line is one result (same fields as
+    /rag/answer plus "id"); the last line is {"summary": {...}}.
+    """
+    rag_engine = current_app.config['RAG_ENGINE']
+    data = request.get_json(force=True, silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "request body must be a JSON object"}), 400
+    questions = data.get("questions")
+
+    if not isinstance(questions, list) or not questions:
+        return jsonify({"error": "questions must be a non-empty list"}), 400
+    if len(questions) > Config.BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"At most {Config.BATCH_MAX_QUESTIONS} questions per batch; "
+                                 f"use python -m services.rag.batch for larger jobs"}), 413
+    try:
+        items = normalize_items(questions, {
+            key: data[key] for key in ("collection", "num_results", "max_tokens", "temperature", "top_p") if key in data
+        })
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    concurrency = data.get("concurrency")
+    if concurrency is not None:
+        if isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1:
+            return jsonify({"error": "concurrency must be a positive integer"}), 400
+        concurrency = min(concurrency, Config.BATCH_MAX_CONCURRENCY)
+
+    runner = BatchRunner(
+        rag_engine,
+        concurrency=concurrency,
+        use_cache=str(data.get("cache", True)).lower() not in ("false", "0"),
+    )
+
+    @stream_with_context
+    def generate():
+        for record in runner.run(items):
+            audit.record_answer("answer_batch", record["query"], record["collection"], record["num_results"],
+                                record, id=record["id"])
+            yield json.dumps(record) + "\n"
+        yield json.dumps({"summary": runner.stats}) + "\n"
+
+    resp = Response(generate(), mimetype="application/x-ndjson")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"  # nginx buffering hint
+    return resp
@@ -4,11 +4,25 @@ This module provides endpoints to inspect the current factory configurations
 and available managers/providers.
 """
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, current_app
 import os
 
 factory_info_bp = Blueprint('factory_info', __name__)
 
+
+def _provider_status(env):
+    """Cached health-monitor status for `env`; providers are never constructed or probed here."""
+    from ..providers.health import get_health_monitor
+    status = get_health_monitor().environment_status(env)
+    if status is None:
+        return {"available": False, "monitored": False}
+    return {"monitored": True, **status}
+
+
+def _current_manager():
+    rag_engine = current_app.config.get('RAG_ENGINE')
+    return rag_engine.model_mgr if rag_engine else None
+
 @factory_info_bp.route('/rag/factory/info', methods=['GET'])
 def factory_info():
     """Get information about available factories and their status.
@@ -22,32 +36,20 @@ def factory_info():
     try:
         # Get inference manager factory info
         from ..inference import InferenceManagerFactory
-        inference_info = InferenceManagerFactory.get_manager_info()
+        inference_info = InferenceManagerFactory.get_manager_info(_current_manager())
         
         # Get LLM provider factory info
         provider_info = {}
         try:
-            from ..providers import LLMProviderFactory
-            
             provider_info = {
                 "supported_environments": ["local", "staging", "production"],
                 "current_environment": os.getenv("DEPLOYMENT_ENV", "local"),
                 "provider_status": {}
             }
             
-            # Check each provider environment
+            # Report each provider environment from the health monitor
             for env in ["local", "staging", "production"]:
-                try:
-                    provider = LLMProviderFactory.get_provider(env)
-                    provider_info["provider_status"][env] = {
-                        "available": provider.is_available(),
-                        "type": type(provider).__name__
-                    }
-                except Exception as e:
-                    provider_info["provider_status"][env] = {
-                        "available": False,
-                        "error": str(e)
-                    }
+                provider_info["provider_status"][env] = _provider_status(env)
                     
         except Exception as e:
             provider_info = {"error": f"Cannot load LLM provider factory: {e}"}
@@ -82,7 +84,7 @@ def available_managers():
     """Get detailed information about available inference managers."""
     try:
         from ..inference import InferenceManagerFactory
-        info = InferenceManagerFactory.get_manager_info()
+        info = InferenceManagerFactory.get_manager_info(_current_manager())
         return jsonify(info)
     except Exception as e:
         return jsonify({
@@ -93,34 +95,19 @@ def available_managers():
 def available_providers():
     """Get detailed information about available LLM providers."""
     try:
-        from ..providers import LLMProviderFactory
-        
         provider_info = {
             "supported_environments": ["local", "staging", "production"],
             "current_environment": os.getenv("DEPLOYMENT_ENV", "local"),
             "provider_status": {}
         }
         
-        # Check each provider environment
+        # Report each provider environment from the health monitor
         for env in ["local", "staging", "production"]:
-            try:
-                provider = LLMProviderFactory.get_provider(env)
-                provider_info["provider_status"][env] = {
-                    "available": provider.is_available(),
-                    "type": type(provider).__name__,
-                    "config": {
-                        "environment": env
-                    }
-                }
-            except Exception as e:
-                provider_info["provider_status"][env] = {
-                    "available": False,
-                    "error": str(e)
-                }
+            provider_info["provider_status"][env] = _provider_status(env)
         
         return jsonify(provider_info)
         
     except Exception as e:
         return jsonify({
-            "error": f"Cannot load LLM provider factory: {e}"
+            "error": f"Cannot read provider health: {e}"
         }), 500
\ No newline at end of file
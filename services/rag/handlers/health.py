@@ -2,6 +2,11 @@ from flask import Blueprint, jsonify, current_app
 from datetime import datetime
 import os
 
+from ..audit import get_audit_writer
+from ..config import Config
+from ..providers.health import get_health_monitor
+from ..tracing import get_exporter
+
 health_bp = Blueprint('health', __name__)
 
 @health_bp.route('/rag/health', methods=['GET'])
@@ -34,6 +39,8 @@ def rag_health():
             "status": "healthy" if model_mgr.is_available else "unhealthy",
             "type": type(model_mgr.provider).__name__
         })
+        if hasattr(model_mgr.provider, 'pool_stats'):
+            provider_info["pool"] = model_mgr.provider.pool_stats()
     
     overall_status = "healthy" if (model_mgr and model_mgr.is_available) else "degraded"
     
@@ -43,11 +50,19 @@ def rag_health():
         "inference_manager": inference_manager_info,
         "llm_provider": provider_info,
         "streaming": True,
+        "answer_cache": rag_engine.answer_cache.stats() if rag_engine.answer_cache else None,
+        "semantic_cache": rag_engine.semantic_cache.stats() if rag_engine.semantic_cache else None,
+        "scheduler": model_mgr.scheduler.stats() if getattr(model_mgr, "scheduler", None) else None,
+        "provider_health": get_health_monitor().snapshot(),
+        "hedging": model_mgr.hedger.stats() if getattr(model_mgr, "hedger", None) else None,
+        "tracing": get_exporter().stats(),
+        "audit": get_audit_writer().stats() if Config.AUDIT_ENABLED else None,
         "endpoints": [
             "/rag/health",
             "/rag/config", 
             "/rag/answer",
             "/rag/answer/stream",
+            "/rag/answer/batch",
             "/rag/provider/switch",
             "/rag/factory/info",
             "/rag/factory/managers", 
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 
+from ..config import Config
+
 model_bp = Blueprint('model', __name__)
 
 @model_bp.route('/rag/provider/switch', methods=['POST'])
@@ -15,10 +17,14 @@ def switch_provider():
     env = data.get("environment", "").strip()
     
     if not env:
-        return jsonify({"error": "environment is required (local, staging, production)"}), 400
+        return jsonify({"error": "environment is required (local, staging, production, mock)"}), 400
+    
+    if env not in ["local", "staging", "production", "mock"]:
+        return jsonify({"error": "environment must be local, staging, production, or mock"}), 400
     
-    if env not in ["local", "staging", "production"]:
-        return jsonify({"error": "environment must be local, staging, or production"}), 400
+    # A live service must not start serving made-up answers on request
+    if env == "mock" and not (Config.DEPLOYMENT_ENV == "mock" or Config.MOCK_PROVIDER_ENABLED):
+        return jsonify({"error": "mock provider is disabled (set MOCK_PROVIDER_ENABLED=true)"}), 400
 
     try:
         old_provider = type(model_mgr.provider).__name__ if model_mgr.provider else "None"
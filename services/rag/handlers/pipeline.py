@@ -0,0 +1,449 @@
+"""The `/rag/answer` and `/rag/answer/stream` pipeline, independent of the web framework.
+
+The Flask handlers (answer.py, stream.py) and the Starlette handlers
+(async_answer.py) run a request through the same steps:
+
+1. Parse the parameters and start the trace
+2. Look up the answer cache; a hit is replayed
+3. Retrieve and pack sources into the prompt, falling back to the bare question
+4. Wait for a generation slot (after retrieval, so retrieval holds no slot)
+5. Generate, cite, store in the answer cache and audit
+
+`AnswerPipeline` holds those steps and yields the stream's events as dicts.
+`events()` runs retrieval and generation blocking; `aevents()` runs them on
+the event loop, with the other blocking steps in worker threads. The stream
+handlers send each event as SSE. The plain answer handlers run the events to
+the end and return `response()`.
+"""
+
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from .. import audit, tracing
+from ..config import Config
+from ..inference.scheduler import QueueFullError
+from ..retrieval import fallback_prompt
+
+DEFAULT_COLLECTION = "la_plata_county_code"
+
+# Sent after the start event: large SSE comment padding to defeat buffering in certain proxies/browsers
+SSE_PADDING = ": " + (" " * 2048) + "\n\n"
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # nginx buffering hint
+    "Connection": "keep-alive",
+}
+
+
+def _sse(data: dict) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def _elapsed_ms(started: float) -> float:
+    """Milliseconds since the request arrived (time.perf_counter() at entry)"""
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _same_sources(previews, sources_meta) -> bool:
+    """Whether packing kept every retrieved source under its early `sources` number"""
+    return [(s["index"], s["id"]) for s in previews] == [(s["index"], s["id"]) for s in sources_meta]
+
+
+def _client_id(headers, remote_addr) -> str:
+    """Fair-queueing key: INFERENCE_CLIENT_ID_HEADER when configured and set, else the client address.
+
+    Headers a client can send itself are not trusted. Behind a proxy,
+    remote_addr is resolved from X-Forwarded-For by ProxyFix (PROXY_FIX_X_FOR)
+    or by uvicorn's --forwarded-allow-ips.
+    """
+    if Config.INFERENCE_CLIENT_ID_HEADER:
+        value = (headers.get(Config.INFERENCE_CLIENT_ID_HEADER) or "").strip()
+        if value:
+            return value
+    return remote_addr or "anonymous"
+
+
+def _replay_chunks(text: str, words_per_chunk: int = 3):
+    """Split a cached answer into token-sized chunks (whitespace preserved)"""
+    words = re.findall(r"\s*\S+", text)
+    for i in range(0, len(words), words_per_chunk):
+        yield "".join(words[i:i + words_per_chunk])
+
+
+class AnswerPipeline:
+    """One answer request: its parameters, trace and progress.
+
+    Args:
+        rag_engine: RAGEngine
+        data: Request parameters (JSON body or query string)
+        route: "answer" or "answer_stream"; names the trace and the audit route
+        client_id: Fair-queueing key for the generation scheduler
+
+    Raises:
+        ValueError: Missing query or malformed numeric parameters
+    """
+
+    def __init__(self, rag_engine, data: Dict[str, Any], route: str, client_id: str = "anonymous"):
+        self.started = time.perf_counter()
+        self.rag_engine = rag_engine
+        self.model_mgr = rag_engine.model_mgr
+        self.route = route
+        self.streaming = route == "answer_stream"
+        self.client_id = client_id
+
+        self.query = (data.get("query", "") or "").strip()
+        if not self.query:
+            raise ValueError("query is required")
+        self.collection = data.get("collection", DEFAULT_COLLECTION)
+        self.num_results = int(data.get("num_results", 5))
+        self.generation_params = {
+            "max_tokens": rag_engine.effective_max_tokens(int(data.get("max_tokens", 1200 if self.streaming else 2500))),
+            "temperature": float(data.get("temperature", 0.2)),
+            "top_p": float(data.get("top_p", 0.9)),
+        }
+        self.use_cache = str(data.get("cache", True)).lower() not in ("false", "0")
+
+        self.trace = tracing.start("rag.answer.stream" if self.streaming else "rag.answer",
+                                   timings=tracing.requested(data.get("timings", False)),
+                                   collection=self.collection, num_results=self.num_results,
+                                   query_chars=len(self.query))
+        # Cached health-monitor status, safe to read on the event loop
+        self.model_available = bool(self.model_mgr) and self.model_mgr.is_available
+        if self.model_available:
+            self.trace.set(provider=self.model_mgr.provider.describe())
+
+        self.cached = None
+        self.cache_context = None
+        self.retrieval_info = None
+        self.previews: List[Dict[str, Any]] = []
+        self.prompt = None
+        self.sources_meta: List[Dict[str, Any]] = []
+        self.ticket = None
+        self.tokens: List[str] = []
+        self.first_token_ms = None
+        self.payload: Optional[Dict[str, Any]] = None  # /rag/answer body once finished
+        self.error: Optional[Tuple[int, str, Optional[int]]] = None  # (status, message, retry_after)
+        self._parser = None
+        self._generation_started = None
+        self._first_token = None
+
+    # -----------------------------
+    # Drivers
+    # -----------------------------
+
+    def events(self) -> Iterator[Dict[str, Any]]:
+        """Run the request with blocking retrieval and generation (WSGI)"""
+        yield self._start_event()
+        if not self.model_available:
+            yield from self._unavailable()
+            return
+        self.lookup_cache()
+        if self.cached:
+            yield from self._replay_cached()
+            return
+
+        yield self._event("retrieval_started")
+        results = self.retrieve()
+        yield self._sources_event(results)
+        self.build_prompt(results)
+        yield from self._packed_sources()
+
+        yield from self._admit()
+        if self.error is not None:
+            return
+        if self.ticket is not None:
+            # Wait for a generation slot, reporting the queue position
+            for position in self.ticket.positions(Config.INFERENCE_QUEUE_TIMEOUT):
+                yield {"event": "queue", "position": position}
+            yield from self._waited()
+            if self.error is not None:
+                return
+
+        yield self._generation_started_event()
+        try:
+            for text in self.model_mgr.stream_generate(self.prompt, ticket=self.ticket, **self.generation_params):
+                yield from self._token(text)
+            self._generated()
+            yield self.complete()
+        except Exception as e:
+            yield from self._failed(e)
+        finally:
+            self.release()
+
+    async def aevents(self) -> AsyncIterator[Dict[str, Any]]:
+        """Run the request on the event loop (ASGI); blocking steps go to worker threads"""
+        yield self._start_event()
+        if not self.model_available:
+            for event in self._unavailable():
+                yield event
+            return
+        await asyncio.to_thread(self.lookup_cache)
+        if self.cached:
+            for event in self._replay_cached():
+                yield event
+            return
+
+        yield self._event("retrieval_started")
+        results = await self.aretrieve()
+        yield self._sources_event(results)
+        await asyncio.to_thread(self.build_prompt, results)
+        for event in self._packed_sources():
+            yield event
+
+        for event in self._admit():
+            yield event
+        if self.error is not None:
+            return
+        if self.ticket is not None:
+            async for position in self.ticket.apositions(Config.INFERENCE_QUEUE_TIMEOUT):
+                yield {"event": "queue", "position": position}
+            for event in self._waited():
+                yield event
+            if self.error is not None:
+                return
+
+        yield self._generation_started_event()
+        try:
+            async for text in self.model_mgr.astream_generate(self.prompt, ticket=self.ticket, **self.generation_params):
+                for event in self._token(text):
+                    yield event
+            self._generated()
+            yield await asyncio.to_thread(self.complete)
+        except Exception as e:
+            for event in self._failed(e):
+                yield event
+        finally:
+            self.release()
+
+    def response(self) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        """Status, body and headers for `/rag/answer` once the events have run"""
+        if self.error is None:
+            return 200, self.payload, {}
+        status, message, retry_after = self.error
+        if retry_after is None:
+            return status, {"error": message}, {}
+        return status, {"error": message, "retry_after": retry_after}, {"Retry-After": str(retry_after)}
+
+    def release(self) -> None:
+        """Give back the generation slot (safe to call more than once)"""
+        if self.ticket is not None:
+            self.ticket.release()
+
+    def close(self) -> None:
+        """Release the slot and end the trace; called when the response is done"""
+        self.release()
+        self.trace.finish()
+
+    # -----------------------------
+    # Steps
+    # -----------------------------
+
+    def lookup_cache(self) -> None:
+        if self.use_cache:
+            with self.trace.span("cache_lookup") as span:
+                self.cached, self.cache_context = self.rag_engine.get_cached_answer(
+                    self.query, self.collection, self.num_results, **self.generation_params
+                )
+                span["hit"] = self.cached["cache"] if self.cached else None
+        self.trace.set(cache=self.cached["cache"] if self.cached else None)
+
+    def _can_retrieve(self) -> bool:
+        return bool(self.rag_engine.fetch_simple_search and self.rag_engine.build_prompt_with_sources)
+
+    def retrieve(self) -> Optional[List[Dict[str, Any]]]:
+        """Results of retrieval with query normalization; None when unavailable or failed"""
+        if not self._can_retrieve():
+            return None
+        try:
+            with self.trace.active():
+                results, _, self.retrieval_info = self.rag_engine.enhanced_retrieval_with_normalization(
+                    self.query, collection=self.collection, num_results=self.num_results
+                )
+        except Exception:
+            return None
+        return results
+
+    async def aretrieve(self) -> Optional[List[Dict[str, Any]]]:
+        """`retrieve` through the backend's async methods"""
+        if not self._can_retrieve():
+            return None
+        try:
+            with self.trace.active():
+                results, _, self.retrieval_info = await self.rag_engine.aenhanced_retrieval_with_normalization(
+                    self.query, collection=self.collection, num_results=self.num_results
+                )
+        except Exception:
+            return None
+        return results
+
+    def build_prompt(self, results: Optional[List[Dict[str, Any]]]) -> None:
+        """Pack the sources into the prompt; the bare question without results"""
+        prompt, sources_meta = fallback_prompt(self.query), []
+        if results:
+            try:
+                with self.trace.active():
+                    prompt, sources_meta = self.rag_engine.build_prompt(
+                        self.query, results, self.generation_params["max_tokens"]
+                    )
+            except Exception:
+                prompt, sources_meta = fallback_prompt(self.query), []
+        self.prompt, self.sources_meta = prompt, sources_meta
+        self.trace.set_sources(sources_meta)
+        self.trace.capture(prompt=prompt)
+
+    def complete(self) -> Dict[str, Any]:
+        """Cite, cache and audit the generated answer; returns the `end` event"""
+        answer_text = "".join(self.tokens).strip()
+        self.trace.capture(response=answer_text)
+        with self.trace.span("citations") as span:
+            citations, used_sources = self.rag_engine.extract_citations(answer_text, self.sources_meta)
+            if not citations and self.sources_meta:
+                # Best-effort auto-citation fallback
+                answer_text, citations, used_sources = self.rag_engine.auto_cite_answer(answer_text, self.sources_meta)
+            span["citations"] = len(citations)
+        result = {
+            "answer": answer_text,
+            "citations": citations,
+            "sources": used_sources,
+            "verification": None,
+            "retrieval": self.retrieval_info,
+        }
+        if self.cache_context and answer_text:
+            self.rag_engine.store_answer(self.cache_context, result)
+        audit.record_answer(self.route, self.query, self.collection, self.num_results, result, self.trace.trace_id)
+
+        timings = self.trace.response_timings()
+        self.payload = {**self._request_fields(), **result, "cached": False, **timings}
+        return {
+            "event": "end",
+            "answer": answer_text,
+            "citations": citations,
+            "sources": used_sources,
+            "retrieval": self.retrieval_info,
+            "cached": False,
+            "first_token_ms": self.first_token_ms,
+            "elapsed_ms": _elapsed_ms(self.started),
+            **timings,
+        }
+
+    # -----------------------------
+    # Events
+    # -----------------------------
+
+    def _request_fields(self) -> Dict[str, Any]:
+        return {"query": self.query, "collection": self.collection, "num_results": self.num_results}
+
+    def _event(self, name: str, **fields) -> Dict[str, Any]:
+        return {"event": name, **fields, "elapsed_ms": _elapsed_ms(self.started)}
+
+    def _start_event(self) -> Dict[str, Any]:
+        return {"event": "start", "model_loaded": self.model_available, "collection": self.collection}
+
+    def _empty_end(self) -> Dict[str, Any]:
+        return {"event": "end", "answer": None, "citations": [], "sources": [],
+                "retrieval": self.retrieval_info, "cached": False}
+
+    def _unavailable(self) -> Iterator[Dict[str, Any]]:
+        self.payload = {
+            **self._request_fields(),
+            "answer": "[stub] Inference not available.",
+            "citations": [],
+            "sources": [],
+            "verification": None,
+            "retrieval": None,
+            "cached": False,
+            **self.trace.response_timings(),
+        }
+        if self.streaming:
+            for text in ["Model", " not", " loaded."]:
+                yield {"event": "token", "text": text}
+        yield self._empty_end()
+
+    def _replay_cached(self) -> Iterator[Dict[str, Any]]:
+        """The cached answer with the same events as a fresh one"""
+        cached = self.cached
+        audit.record_answer(self.route, self.query, self.collection, self.num_results,
+                            {**cached, "cached": True}, self.trace.trace_id)
+        timings = self.trace.response_timings()
+        self.payload = {**self._request_fields(), **cached, "cached": True, **timings}
+        if self.streaming:
+            yield self._event("sources", sources=cached["sources"])
+            parser = self.rag_engine.citation_stream_parser(cached["sources"])
+            for text in _replay_chunks(cached["answer"]):
+                yield {"event": "token", "text": text}
+                for citation in parser.feed(text):
+                    yield {"event": "citation", **citation}
+        yield {
+            "event": "end",
+            "answer": cached["answer"],
+            "citations": cached["citations"],
+            "sources": cached["sources"],
+            "retrieval": cached["retrieval"],
+            "cached": True,
+            "cache": cached["cache"],
+            "cache_similarity": cached.get("cache_similarity"),
+            "elapsed_ms": _elapsed_ms(self.started),
+            **timings,
+        }
+
+    def _sources_event(self, results) -> Dict[str, Any]:
+        # The client can render the source list before compression, packing and generation
+        self.previews = self.rag_engine.source_previews(results) if results else []
+        return self._event("sources", sources=self.previews, retrieval=self.retrieval_info)
+
+    def _packed_sources(self) -> Iterator[Dict[str, Any]]:
+        if not _same_sources(self.previews, self.sources_meta):
+            # Some sources did not fit the context: renumbered list for citations
+            yield self._event("sources", sources=self.sources_meta, retrieval=self.retrieval_info, packed=True)
+
+    def _admit(self) -> Iterator[Dict[str, Any]]:
+        """Take a place in the generation scheduler; error events when the queue is full"""
+        scheduler = getattr(self.model_mgr, "scheduler", None)
+        if scheduler is None:
+            return
+        try:
+            self.ticket = scheduler.enqueue(self.client_id)
+        except QueueFullError as e:
+            yield from self._rejected(str(e), e.retry_after)
+
+    def _waited(self) -> Iterator[Dict[str, Any]]:
+        ticket = self.ticket
+        waited_ms = ticket.wait_ms if ticket.granted else (time.monotonic() - ticket.enqueued_at) * 1000
+        self.trace.add("queue", waited_ms, granted=ticket.granted)
+        if not ticket.granted:
+            yield from self._rejected("Timed out waiting for a generation slot", self.model_mgr.scheduler.retry_after())
+
+    def _rejected(self, message: str, retry_after: int) -> Iterator[Dict[str, Any]]:
+        self.trace.set(error=message)
+        self.error = (429, message, retry_after)
+        yield {"event": "error", "message": message, "retry_after": retry_after}
+        yield self._empty_end()
+
+    def _generation_started_event(self) -> Dict[str, Any]:
+        if self.streaming:
+            self._parser = self.rag_engine.citation_stream_parser(self.sources_meta)
+        self._generation_started = time.perf_counter()
+        return self._event("generation_started",
+                           queue_ms=round(self.ticket.wait_ms, 1) if self.ticket is not None else None)
+
+    def _token(self, text: str) -> Iterator[Dict[str, Any]]:
+        if self._first_token is None:
+            self._first_token = time.perf_counter()
+            self.first_token_ms = _elapsed_ms(self.started)
+        self.tokens.append(text)
+        if self.streaming:
+            yield {"event": "token", "text": text}
+            for citation in self._parser.feed(text):
+                yield {"event": "citation", **citation}
+
+    def _generated(self) -> None:
+        self.trace.generation(self._generation_started, self._first_token, time.perf_counter(), len(self.tokens))
+
+    def _failed(self, error: Exception) -> Iterator[Dict[str, Any]]:
+        self.trace.set(error=str(error))
+        self.error = (500, str(error), None)
+        yield {"event": "error", "message": str(error)}
+        yield self._empty_end()
@@ -0,0 +1,206 @@
+"""Shared HTTP client for RAG → search service calls.
+
+One pooled, keep-alive `requests.Session` per process (recreated after fork so
+pre-fork workers never share sockets), bounded retries with full jitter for
+idempotent calls, and per-attempt plus total deadlines. `arequest` is the
+httpx-based equivalent for async handlers, with one client per event loop
+closed by `aclose_async_clients`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+_session_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session, creating it on first use.
+
+    The session is shared across threads; its urllib3 connection pool is
+    thread-safe and sized to the worker's concurrency.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=Config.SEARCH_HTTP_POOL_SIZE,
+                    max_retries=0,  # Retries are handled in request() with deadlines
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session, _session_pid = session, pid
+    return _session
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    cap = min(Config.SEARCH_HTTP_BACKOFF_MAX, Config.SEARCH_HTTP_BACKOFF * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def _retry_plan(method: str, idempotent: Optional[bool], max_retries: Optional[int],
+                attempt_timeout: Optional[float], total_deadline: Optional[float]):
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    if max_retries is None:
+        max_retries = Config.SEARCH_HTTP_RETRIES
+    retries = max_retries if idempotent else 0
+    attempt_timeout = attempt_timeout or Config.SEARCH_TIMEOUT
+    total_deadline = total_deadline or Config.SEARCH_HTTP_TOTAL_DEADLINE
+    return retries, attempt_timeout, time.monotonic() + total_deadline
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    idempotent: Optional[bool] = None,
+    max_retries: Optional[int] = None,
+    attempt_timeout: Optional[float] = None,
+    total_deadline: Optional[float] = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """Send a request through the pooled session with retries and deadlines.
+
+    Args:
+        method: HTTP method
+        url: Target URL
+        idempotent: Whether the call may be retried. Defaults to True for
+            GET/HEAD/OPTIONS/PUT/DELETE; pass True for read-only POSTs.
+        max_retries: Retries after the first attempt (default SEARCH_HTTP_RETRIES)
+        attempt_timeout: Seconds per attempt (default SEARCH_TIMEOUT)
+        total_deadline: Seconds for all attempts including backoff
+            (default SEARCH_HTTP_TOTAL_DEADLINE)
+        **kwargs: Passed to `requests.Session.request`
+
+    Returns:
+        requests.Response: The last response (callers decide on raise_for_status)
+
+    Raises:
+        requests.RequestException: If every attempt failed or the deadline passed
+    """
+    retries, attempt_timeout, deadline = _retry_plan(method, idempotent, max_retries, attempt_timeout, total_deadline)
+    session = get_session()
+
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout(f"Deadline exceeded for {method} {url}")
+        try:
+            resp = session.request(method, url, timeout=min(attempt_timeout, remaining), **kwargs)
+            if resp.status_code not in RETRY_STATUSES or attempt >= retries:
+                return resp
+            logger.debug(f"{method} {url} returned {resp.status_code}; retrying")
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= retries:
+                raise
+            logger.debug(f"{method} {url} failed ({e}); retrying")
+
+        delay = _backoff_delay(attempt)
+        if time.monotonic() + delay >= deadline:
+            raise requests.Timeout(f"Deadline exceeded for {method} {url}")
+        time.sleep(delay)
+        attempt += 1
+
+
+def get_async_client():
+    """Return the pooled httpx.AsyncClient for the running event loop."""
+    try:
+        import httpx
+    except ImportError as e:
+        raise RuntimeError("httpx is required for async HTTP calls: pip install httpx") from e
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=Config.SEARCH_HTTP_POOL_SIZE,
+                max_keepalive_connections=Config.SEARCH_HTTP_POOL_SIZE,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_clients() -> None:
+    """Close the running event loop's pooled httpx.AsyncClient and its connections.
+
+    Called on ASGI lifespan shutdown; a later `arequest` on the loop opens a
+    new client.
+    """
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def arequest(
+    method: str,
+    url: str,
+    *,
+    idempotent: Optional[bool] = None,
+    max_retries: Optional[int] = None,
+    attempt_timeout: Optional[float] = None,
+    total_deadline: Optional[float] = None,
+    **kwargs: Any,
+):
+    """Async variant of `request` using httpx; same retry and deadline semantics.
+
+    Returns:
+        httpx.Response: The last response
+
+    Raises:
+        httpx.HTTPError: If every attempt failed or the deadline passed
+    """
+    import httpx
+
+    retries, attempt_timeout, deadline = _retry_plan(method, idempotent, max_retries, attempt_timeout, total_deadline)
+    client = get_async_client()
+
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise httpx.TimeoutException(f"Deadline exceeded for {method} {url}")
+        try:
+            resp = await client.request(method, url, timeout=min(attempt_timeout, remaining), **kwargs)
+            if resp.status_code not in RETRY_STATUSES or attempt >= retries:
+                return resp
+            logger.debug(f"{method} {url} returned {resp.status_code}; retrying")
+        except (httpx.TransportError, httpx.TimeoutException) as e:
+            if attempt >= retries:
+                raise
+            logger.debug(f"{method} {url} failed ({e}); retrying")
+
+        delay = _backoff_delay(attempt)
+        if time.monotonic() + delay >= deadline:
+            raise httpx.TimeoutException(f"Deadline exceeded for {method} {url}")
+        await asyncio.sleep(delay)
+        attempt += 1
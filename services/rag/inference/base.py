@@ -3,8 +3,9 @@
 This module defines the clean interface that all inference managers must implement.
 """
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Generator
+from typing import AsyncIterator, Generator
 
 
 class InferenceManagerBase(ABC):
@@ -27,4 +28,17 @@ class InferenceManagerBase(ABC):
     @abstractmethod
     def stream_generate(self, prompt: str, **kwargs) -> Generator[str, None, None]:
         """Generate streaming text from a prompt."""
-        pass
\ No newline at end of file
+        pass
+    
+    async def astream_generate(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Generate streaming text from a prompt without blocking the event loop.
+        
+        The default pulls tokens from `stream_generate` in a worker thread.
+        """
+        iterator = iter(self.stream_generate(prompt, **kwargs))
+        done = object()
+        while True:
+            token = await asyncio.to_thread(next, iterator, done)
+            if token is done:
+                break
+            yield token
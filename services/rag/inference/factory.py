@@ -138,9 +138,13 @@ class InferenceManagerFactory:
             raise RuntimeError(f"Cannot create LangChain inference manager: {e}")
     
     @classmethod
-    def get_manager_info(cls) -> dict:
+    def get_manager_info(cls, manager: Optional[InferenceManagerBase] = None) -> dict:
         """Get information about available manager types.
         
+        Args:
+            manager: The running manager to report on. Without one a new
+                manager is created, which selects (and probes) a provider.
+        
         Returns:
             dict: Information about supported managers and their status
         """
@@ -153,7 +157,8 @@ class InferenceManagerFactory:
         for manager_type in cls._SUPPORTED_MANAGERS:
             try:
                 if manager_type == "langchain":
-                    manager = cls._create_langchain_manager()
+                    if not isinstance(manager, LangChainInferenceManager):
+                        manager = cls._create_langchain_manager()
                     info["manager_status"][manager_type] = {
                         "available": manager.is_available,
                         "provider_type": type(manager.provider).__name__ if hasattr(manager, 'provider') and manager.provider else "None"
@@ -0,0 +1,344 @@
+"""Time-to-first-token hedging and failover across LLM providers.
+
+The provider chosen at startup serves every request, so an overloaded local
+llama.cpp server makes every answer wait. With hedging, a stream starts on the
+preferred provider. If no token arrives within the TTFT SLA
+(INFERENCE_HEDGE_TTFT_SEC), the same request also starts on the next provider
+in `LLMProviderFactory._SUPPORTED_ENVIRONMENTS` order. The first provider to
+produce a token wins, and the other streams are cancelled. A provider that
+fails before its first token is failed over to the next one right away.
+
+Routing adapts to the results. Each provider keeps an EWMA of its time to
+first token. A provider whose EWMA exceeds the SLA is demoted behind the
+others. After INFERENCE_HEDGE_RECOVERY_SEC without a new observation it gets
+the first slot again, and hedging still covers that trial request. Providers
+whose health-monitor circuit is open are skipped.
+
+Sync streams race in worker threads. A cancelled lane stops at its next chunk
+and closes its provider stream. Async streams race as tasks on the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_EWMA_ALPHA = 0.3
+
+
+class _ProviderStats:
+    def __init__(self):
+        self.ewma_ttft: Optional[float] = None  # Seconds
+        self.observed_at = 0.0
+        self.started = 0
+        self.wins = 0
+        self.cancelled = 0
+        self.errors = 0
+
+    def observe(self, ttft: float) -> None:
+        self.ewma_ttft = ttft if self.ewma_ttft is None else _EWMA_ALPHA * ttft + (1 - _EWMA_ALPHA) * self.ewma_ttft
+        self.observed_at = time.monotonic()
+
+
+class ProviderHedger:
+    """Race providers on time to first token and route to the fastest.
+
+    Args:
+        candidates: Environment name to provider, in preference order
+        ttft_sla: Seconds to wait for a first token before hedging
+        monitor: ProviderHealthMonitor for circuit state and breaker updates;
+            None uses every candidate and records nothing
+        recovery_sec: Seconds before a demoted provider is tried first again
+    """
+
+    def __init__(self, candidates: "OrderedDict[str, Any]", ttft_sla: float,
+                 monitor=None, recovery_sec: float = 60.0):
+        self.candidates = OrderedDict(candidates)
+        self.ttft_sla = ttft_sla
+        self.monitor = monitor
+        self.recovery_sec = recovery_sec
+        self.hedged = 0
+        self.failovers = 0
+        self._keys = {}
+        self._stats = {env: _ProviderStats() for env in self.candidates}
+        self._lock = threading.Lock()
+        if monitor is not None:
+            for env, provider in self.candidates.items():
+                self._keys[env] = monitor.watch(provider, env=env)
+
+    def order(self) -> List[str]:
+        """Environments to try for the next request, best first."""
+        envs = list(self.candidates)
+        if self.monitor is not None:
+            envs = [env for env in envs if self.monitor.is_available(self._keys[env])] or envs
+        now = time.monotonic()
+        preference = list(self.candidates)
+
+        def rank(env):
+            stats = self._stats[env]
+            slow = (stats.ewma_ttft is not None and stats.ewma_ttft > self.ttft_sla
+                    and now - stats.observed_at < self.recovery_sec)
+            return (slow, preference.index(env))
+
+        with self._lock:
+            return sorted(envs, key=rank)
+
+    def any_available(self) -> bool:
+        if self.monitor is None:
+            return bool(self.candidates)
+        return any(self.monitor.is_available(key) for key in self._keys.values())
+
+    def stats(self) -> Dict[str, Any]:
+        order = self.order()
+        with self._lock:
+            return {
+                "ttft_sla_sec": self.ttft_sla,
+                "hedged": self.hedged,
+                "failovers": self.failovers,
+                "order": order,
+                "providers": {
+                    env: {
+                        "ewma_ttft_ms": round(s.ewma_ttft * 1000, 1) if s.ewma_ttft is not None else None,
+                        "started": s.started,
+                        "wins": s.wins,
+                        "cancelled": s.cancelled,
+                        "errors": s.errors,
+                    }
+                    for env, s in self._stats.items()
+                },
+            }
+
+    # -----------------------------
+    # Outcome bookkeeping
+    # -----------------------------
+
+    def _started(self, env: str, hedge: bool) -> None:
+        with self._lock:
+            self._stats[env].started += 1
+            if hedge:
+                self.hedged += 1
+
+    def _won(self, env: str, ttft: float) -> None:
+        with self._lock:
+            self._stats[env].wins += 1
+            self._stats[env].observe(ttft)
+
+    def _cancelled(self, env: str, elapsed: float) -> None:
+        # The loser's TTFT is at least `elapsed`; record that lower bound
+        with self._lock:
+            self._stats[env].cancelled += 1
+            self._stats[env].observe(elapsed)
+
+    def _failed_over(self) -> None:
+        with self._lock:
+            self.failovers += 1
+
+    def _failed(self, env: str, error: BaseException) -> None:
+        logger.warning(f"Provider {env} failed: {error}")
+        with self._lock:
+            self._stats[env].errors += 1
+        if self.monitor is not None:
+            self.monitor.record_failure(self._keys[env], error)
+
+    def _succeeded(self, env: str) -> None:
+        if self.monitor is not None:
+            self.monitor.record_success(self._keys[env])
+
+    # -----------------------------
+    # Sync streams
+    # -----------------------------
+
+    def stream(self, prompt, **kwargs) -> Iterator[str]:
+        """Stream from whichever provider produces the first token.
+
+        Raises the last error if every provider fails before its first token.
+        """
+        pending = self.order()
+        events: "queue.Queue" = queue.Queue()
+        lanes: Dict[str, _Lane] = {}
+
+        def start(hedge: bool):
+            env = pending.pop(0)
+            self._started(env, hedge)
+            lanes[env] = _Lane(env, self.candidates[env], prompt, kwargs, events)
+
+        start(False)
+        deadline = time.monotonic() + self.ttft_sla
+        winner, first, error = None, None, None
+        try:
+            while winner is None:
+                try:
+                    timeout = max(0.0, deadline - time.monotonic()) if pending else None
+                    env, kind, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    start(True)
+                    deadline = time.monotonic() + self.ttft_sla
+                    continue
+                if env not in lanes:
+                    continue
+                if kind == "error":
+                    lanes.pop(env)
+                    self._failed(env, value)
+                    error = value
+                    if not lanes:
+                        if not pending:
+                            raise error
+                        self._failed_over()
+                        start(False)
+                        deadline = time.monotonic() + self.ttft_sla
+                    continue
+                winner, first = lanes.pop(env), value  # "token", or "done" for an empty answer
+                self._won(env, time.monotonic() - winner.started_at)
+                for loser in lanes.values():
+                    loser.cancel()
+                    self._cancelled(loser.env, time.monotonic() - loser.started_at)
+                lanes.clear()
+                if kind == "done":
+                    self._succeeded(env)
+                    return
+
+            yield first
+            while True:
+                env, kind, value = events.get()
+                if env != winner.env:
+                    continue
+                if kind == "token":
+                    yield value
+                elif kind == "error":
+                    self._failed(env, value)
+                    raise value
+                else:
+                    self._succeeded(env)
+                    return
+        finally:
+            for lane in lanes.values():
+                lane.cancel()
+            if winner is not None:
+                winner.cancel()
+
+    # -----------------------------
+    # Async streams
+    # -----------------------------
+
+    async def astream(self, prompt, **kwargs) -> AsyncIterator[str]:
+        """Async `stream`: providers race as tasks on the event loop."""
+        pending = self.order()
+        racing: Dict[asyncio.Future, tuple] = {}  # Task -> (env, iterator, started_at)
+
+        def start(hedge: bool):
+            env = pending.pop(0)
+            self._started(env, hedge)
+            provider = self.candidates[env]
+            iterator = provider.astream_generate(provider.to_messages(prompt), **kwargs).__aiter__()
+            racing[asyncio.ensure_future(iterator.__anext__())] = (env, iterator, time.monotonic())
+
+        async def cancel(tasks):
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for task in tasks:
+                env, iterator, started_at = racing.pop(task)
+                self._cancelled(env, time.monotonic() - started_at)
+                await _aclose(iterator)
+
+        start(False)
+        winner, first, error = None, None, None
+        try:
+            while winner is None:
+                done, _ = await asyncio.wait(
+                    list(racing), timeout=self.ttft_sla if pending else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    start(True)
+                    continue
+                for task in [t for t in racing if t in done]:  # Preference order, so ties are stable
+                    env, iterator, started_at = racing.pop(task)
+                    if winner is not None:
+                        if not task.cancelled():
+                            task.exception()  # Tied with the winner; its token or error is discarded
+                        await _aclose(iterator)
+                        continue
+                    try:
+                        result = task.result()
+                    except StopAsyncIteration:
+                        result = None  # An empty answer
+                    except Exception as e:
+                        self._failed(env, e)
+                        error = e
+                        continue
+                    winner, first = (env, iterator), result
+                    self._won(env, time.monotonic() - started_at)
+                if winner is not None:
+                    await cancel(list(racing))
+                elif not racing:
+                    if not pending:
+                        raise error
+                    self._failed_over()
+                    start(False)
+
+            env, iterator = winner
+            if first is None:
+                self._succeeded(env)
+                return
+            yield first
+            try:
+                async for chunk in iterator:
+                    yield chunk
+            except Exception as e:
+                self._failed(env, e)
+                raise
+            self._succeeded(env)
+        finally:
+            if racing:
+                await cancel(list(racing))
+            if winner is not None:
+                await _aclose(winner[1])
+
+
+class _Lane:
+    """One provider's attempt at a sync stream, run in a worker thread."""
+
+    def __init__(self, env: str, provider, prompt, kwargs: Dict[str, Any], events: "queue.Queue"):
+        self.env = env
+        self.started_at = time.monotonic()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(provider, prompt, kwargs, events), name=f"hedge-{env}", daemon=True
+        )
+        self._thread.start()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def _run(self, provider, prompt, kwargs, events) -> None:
+        stream = None
+        try:
+            stream = iter(provider.stream_generate(provider.to_messages(prompt), **kwargs))
+            for chunk in stream:
+                if self._cancelled.is_set():
+                    return
+                events.put((self.env, "token", chunk))
+            events.put((self.env, "done", None))
+        except Exception as e:
+            events.put((self.env, "error", e))
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+
+async def _aclose(iterator) -> None:
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception:
+            pass
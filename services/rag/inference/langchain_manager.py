@@ -3,33 +3,153 @@
 Clean implementation using LangChain providers for text generation.
 """
 
-from typing import Generator
-from langchain_core.messages import HumanMessage
+import logging
+from collections import OrderedDict
+from typing import AsyncIterator, Generator
 
 from .base import InferenceManagerBase
+from .hedging import ProviderHedger
+from .scheduler import GenerationScheduler, QueueFullError
+from ..config import Config
 from ..providers import LLMProviderFactory
+from ..providers.health import get_health_monitor
+
+logger = logging.getLogger(__name__)
 
 
 class LangChainInferenceManager(InferenceManagerBase):
     """LangChain-based inference manager.
     
     Provides text generation through LangChain providers with automatic
-    environment-based provider selection.
+    environment-based provider selection. Generations go through a
+    GenerationScheduler that bounds how many reach the provider at once.
+    Availability comes from the background ProviderHealthMonitor, and request
+    outcomes feed the provider's circuit breaker. With INFERENCE_HEDGE_TTFT_SEC
+    set, generations are hedged across providers (see hedging.py).
     """
     
-    def __init__(self):
-        self.provider = LLMProviderFactory.get_available_provider()
+    def __init__(self, provider=None):
+        """
+        Args:
+            provider: LLMProvider to use instead of the first available one
+                (replay and tests); it is probed once here
+        """
+        self.health = get_health_monitor()
+        if provider is not None:
+            self.provider = provider
+            self._health_key = self.health.watch(provider, probe=True)
+        else:
+            self.provider = LLMProviderFactory.get_available_provider()
+            self._health_key = self.health.watch(self.provider)
+        self.hedger = self._create_hedger()
+        self.scheduler = GenerationScheduler(
+            Config.INFERENCE_MAX_CONCURRENCY,
+            max_queue=Config.INFERENCE_QUEUE_SIZE,
+            max_queue_per_client=Config.INFERENCE_QUEUE_PER_CLIENT,
+        )
     
     @property
     def is_available(self) -> bool:
-        """Check if inference is available."""
-        return self.provider is not None and self.provider.is_available()
+        """Check if inference is available (cached probe result and circuit state)."""
+        if self.provider is None:
+            return False
+        if self.hedger is not None:
+            return self.hedger.any_available()
+        return self.health.is_available(self._health_key)
+    
+    @property
+    def is_loaded(self) -> bool:
+        """Alias of `is_available` used by the streaming handler."""
+        return self.is_available
+    
+    def _create_hedger(self):
+        """ProviderHedger over the current provider and the fallback environments, or None.
+        
+        The current provider goes first; the others follow in
+        `LLMProviderFactory._SUPPORTED_ENVIRONMENTS` order and are probed once
+        here so the hedger knows which can take requests.
+        """
+        if Config.INFERENCE_HEDGE_TTFT_SEC <= 0 or self.provider is None:
+            return None
+        primary_env = (self.health.status(self._health_key) or {}).get("environment")
+        candidates = OrderedDict([(primary_env or "primary", self.provider)])
+        for env in LLMProviderFactory._SUPPORTED_ENVIRONMENTS:
+            if env == primary_env:
+                continue
+            try:
+                provider = LLMProviderFactory.get_provider(env)
+            except Exception as e:
+                logger.debug(f"Skipping {env} provider for hedging: {e}")
+                continue
+            self.health.watch(provider, probe=True, env=env)
+            candidates[env] = provider
+        return ProviderHedger(
+            candidates,
+            ttft_sla=Config.INFERENCE_HEDGE_TTFT_SEC,
+            monitor=self.health,
+            recovery_sec=Config.INFERENCE_HEDGE_RECOVERY_SEC,
+        )
+    
+    def _generate(self, prompt, **kwargs) -> str:
+        """Unhedged completion with the outcome recorded on the breaker."""
+        try:
+            text = self.provider.generate(self.provider.to_messages(prompt), **kwargs)
+        except Exception as e:
+            self.health.record_failure(self._health_key, e)
+            raise
+        self.health.record_success(self._health_key)
+        return text
+    
+    def _stream(self, prompt, **kwargs) -> Generator[str, None, None]:
+        """Provider stream, hedged when enabled, with outcomes recorded on the breaker."""
+        if self.hedger is not None:
+            yield from self.hedger.stream(prompt, **kwargs)
+            return
+        try:
+            yield from self.provider.stream_generate(self.provider.to_messages(prompt), **kwargs)
+        except Exception as e:
+            self.health.record_failure(self._health_key, e)
+            raise
+        else:
+            self.health.record_success(self._health_key)
+    
+    async def _astream(self, prompt, **kwargs) -> AsyncIterator[str]:
+        """Async `_stream`."""
+        if self.hedger is not None:
+            async for chunk in self.hedger.astream(prompt, **kwargs):
+                yield chunk
+            return
+        try:
+            async for chunk in self.provider.astream_generate(self.provider.to_messages(prompt), **kwargs):
+                yield chunk
+        except Exception as e:
+            self.health.record_failure(self._health_key, e)
+            raise
+        else:
+            self.health.record_success(self._health_key)
     
-    def generate(self, prompt: str, **kwargs) -> str:
+    def _acquire(self, ticket, client_id: str = "internal"):
+        """Return (ticket, owned): the caller's granted ticket, or a new one after queueing.
+        
+        Raises:
+            QueueFullError: If the queue is full or the wait timed out
+        """
+        if ticket is not None:
+            return ticket, False
+        ticket = self.scheduler.enqueue(client_id)
+        if not ticket.wait(Config.INFERENCE_QUEUE_TIMEOUT):
+            ticket.release()
+            raise QueueFullError("Timed out waiting for a generation slot", self.scheduler.retry_after())
+        return ticket, True
+    
+    def generate(self, prompt: str, ticket=None, **kwargs) -> str:
         """Generate complete text from a prompt.
         
         Args:
-            prompt: Input text prompt
+            prompt: Input text prompt, or a retrieval.PromptParts sent as
+                separate chat messages
+            ticket: Granted scheduler ticket held (and released) by the caller;
+                without one the call queues for a slot itself
             **kwargs: Additional generation parameters
             
         Returns:
@@ -38,14 +158,23 @@ class LangChainInferenceManager(InferenceManagerBase):
         if not self.is_available:
             raise RuntimeError("Inference not available")
         
-        messages = [HumanMessage(content=prompt)]
-        return self.provider.generate(messages, **kwargs)
+        ticket, owned = self._acquire(ticket)
+        try:
+            if self.hedger is not None:
+                return "".join(self.hedger.stream(prompt, **kwargs))
+            return self._generate(prompt, **kwargs)
+        finally:
+            if owned:
+                ticket.release()
     
-    def stream_generate(self, prompt: str, **kwargs) -> Generator[str, None, None]:
+    def stream_generate(self, prompt: str, ticket=None, **kwargs) -> Generator[str, None, None]:
         """Generate streaming text from a prompt.
         
         Args:
-            prompt: Input text prompt
+            prompt: Input text prompt, or a retrieval.PromptParts sent as
+                separate chat messages
+            ticket: Granted scheduler ticket held (and released) by the caller;
+                without one the call queues for a slot itself
             **kwargs: Additional generation parameters
             
         Yields:
@@ -54,16 +183,54 @@ class LangChainInferenceManager(InferenceManagerBase):
         if not self.is_available:
             raise RuntimeError("Inference not available")
         
-        messages = [HumanMessage(content=prompt)]
-        yield from self.provider.stream_generate(messages, **kwargs)
+        ticket, owned = self._acquire(ticket)
+        try:
+            yield from self._stream(prompt, **kwargs)
+        finally:
+            if owned:
+                ticket.release()
+    
+    async def astream_generate(self, prompt: str, ticket=None, **kwargs) -> AsyncIterator[str]:
+        """Generate streaming text on the event loop (provider `astream`).
+        
+        Availability is not re-checked here: the caller already did so off
+        the event loop, and a failed request raises from the provider.
+        
+        Args:
+            prompt: Input text prompt or retrieval.PromptParts
+            ticket: Granted scheduler ticket held (and released) by the caller;
+                without one the call queues for a slot itself
+            **kwargs: Additional generation parameters
+            
+        Yields:
+            str: Generated text tokens
+        """
+        if self.provider is None:
+            raise RuntimeError("Inference not available")
+        
+        owned = ticket is None
+        if owned:
+            ticket = self.scheduler.enqueue("internal")
+            if not await ticket.wait_async(Config.INFERENCE_QUEUE_TIMEOUT):
+                ticket.release()
+                raise QueueFullError("Timed out waiting for a generation slot", self.scheduler.retry_after())
+        try:
+            async for chunk in self._astream(prompt, **kwargs):
+                yield chunk
+        finally:
+            if owned:
+                ticket.release()
     
     def reload_provider(self, env: str = None):
         """Reload provider for different environment.
         
         Args:
-            env: Optional environment ('local', 'staging', 'production')
+            env: Optional environment ('local', 'staging', 'production', 'mock')
         """
         if env:
             self.provider = LLMProviderFactory.get_provider(env)
+            self._health_key = self.health.watch(self.provider, probe=True, env=env)
         else:
-            self.provider = LLMProviderFactory.get_available_provider()
\ No newline at end of file
+            self.provider = LLMProviderFactory.get_available_provider()
+            self._health_key = self.health.watch(self.provider)
+        self.hedger = self._create_hedger()
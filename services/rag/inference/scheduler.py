@@ -0,0 +1,288 @@
+"""Admission control and fair queueing in front of the LLM provider.
+
+Without a limit every request reaches the llama.cpp server at once and all of
+them slow down together until they time out. The scheduler admits at most
+`max_concurrency` generations (match llama.cpp `--parallel`). Later requests
+wait in a bounded queue, one FIFO per client, served round-robin so one busy
+client cannot starve the others. When the queue (or a client's share of it) is
+full, `enqueue` raises QueueFullError with a Retry-After estimate from recent
+generation times.
+
+Usage:
+    ticket = scheduler.enqueue(client_id)    # May raise QueueFullError
+    for position in ticket.positions(timeout):
+        ...                                   # Report queue position
+    if ticket.granted:
+        with ticket:                          # Released on exit
+            generate()
+
+The scheduler is thread-safe and also serves asyncio handlers (`apositions`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional
+
+
+class QueueFullError(RuntimeError):
+    """The wait queue is full (or the wait timed out); retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A request's place in the scheduler: queued, then granted, then released."""
+
+    def __init__(self, scheduler: "GenerationScheduler", client_id: str):
+        self.scheduler = scheduler
+        self.client_id = client_id
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.released = False
+        self._event = threading.Event()
+        self._wakers: List[Callable[[], None]] = []
+
+    @property
+    def granted(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def position(self) -> int:
+        """1-based position in the queue, 0 once granted."""
+        return self.scheduler.position(self)
+
+    @property
+    def wait_ms(self) -> Optional[float]:
+        if self.granted_at is None:
+            return None
+        return (self.granted_at - self.enqueued_at) * 1000
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until granted; False on timeout."""
+        return self._event.wait(timeout)
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        """Wait on the event loop until granted; False on timeout."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+            except RuntimeError:
+                pass  # Loop already closed
+
+        if not self.scheduler._add_waker(self, wake):
+            return True
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.scheduler._remove_waker(self, wake)
+        return self.granted
+
+    def positions(self, timeout: float, interval: float = 1.0) -> Iterator[int]:
+        """Wait until granted, yielding the queue position whenever it changes.
+
+        Ends when the ticket is granted or `timeout` seconds have passed; check
+        `granted` afterwards.
+        """
+        deadline = time.monotonic() + timeout
+        last = None
+        while not self.granted:
+            position = self.position
+            if position != last and position > 0:
+                last = position
+                yield position
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.wait(min(interval, remaining)):
+                return
+
+    async def apositions(self, timeout: float, interval: float = 1.0) -> AsyncIterator[int]:
+        """Async `positions`."""
+        deadline = time.monotonic() + timeout
+        last = None
+        while not self.granted:
+            position = self.position
+            if position != last and position > 0:
+                last = position
+                yield position
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or await self.wait_async(min(interval, remaining)):
+                return
+
+    def release(self) -> None:
+        """Free the slot (or leave the queue). Safe to call more than once."""
+        self.scheduler.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class GenerationScheduler:
+    """Concurrency limit with a bounded, per-client round-robin wait queue.
+
+    Args:
+        max_concurrency: Generations running at once; 0 disables the limit
+        max_queue: Requests allowed to wait
+        max_queue_per_client: Waiting requests allowed per client
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int = 64, max_queue_per_client: int = 8):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self._lock = threading.Lock()
+        self._queues: "OrderedDict[str, Deque[Ticket]]" = OrderedDict()  # Round-robin order
+        self._queued = 0
+        self._running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self.completed = 0
+        self._wait_ms: Deque[float] = deque(maxlen=1024)
+        self._service_sec: Deque[float] = deque(maxlen=256)
+
+    def enqueue(self, client_id: str = "anonymous") -> Ticket:
+        """Admit a request: granted now, queued, or rejected with QueueFullError."""
+        ticket = Ticket(self, client_id or "anonymous")
+        with self._lock:
+            if self.max_concurrency <= 0 or (self._running < self.max_concurrency and not self._queued):
+                self._grant(ticket)
+                return ticket
+            queue = self._queues.get(ticket.client_id)
+            if self._queued >= self.max_queue or (queue is not None and len(queue) >= self.max_queue_per_client):
+                self.rejected += 1
+                raise QueueFullError(
+                    f"Generation queue full ({self._queued} waiting)", self._retry_after_locked()
+                )
+            if queue is None:
+                queue = self._queues[ticket.client_id] = deque()
+            queue.append(ticket)
+            self._queued += 1
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket.granted:
+                self._running -= 1
+                self.completed += 1
+                self._service_sec.append(time.monotonic() - ticket.granted_at)
+            else:
+                # Gave up waiting (timeout or client disconnect)
+                queue = self._queues.get(ticket.client_id)
+                if queue is not None and ticket in queue:
+                    queue.remove(ticket)
+                    self._queued -= 1
+                    if not queue:
+                        del self._queues[ticket.client_id]
+                self.abandoned += 1
+            self._dispatch_locked()
+
+    def retry_after(self) -> int:
+        """Seconds until a new request would likely be admitted."""
+        with self._lock:
+            return self._retry_after_locked()
+
+    def position(self, ticket: Ticket) -> int:
+        """Requests served before `ticket` under round-robin, plus one; 0 when granted."""
+        with self._lock:
+            if ticket.granted or ticket.released:
+                return 0
+            queue = self._queues.get(ticket.client_id)
+            if queue is None:
+                return 0
+            k = queue.index(ticket)
+            ahead = 0
+            before = True
+            for client_id, q in self._queues.items():
+                if client_id == ticket.client_id:
+                    before = False
+                    ahead += k
+                else:
+                    ahead += min(len(q), k + 1 if before else k)
+            return ahead + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._wait_ms)
+
+            def pct(p):
+                return round(waits[min(len(waits) - 1, int(p * len(waits)))], 1) if waits else None
+
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "queue_depth": self._queued,
+                "max_queue": self.max_queue,
+                "clients_waiting": len(self._queues),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "abandoned": self.abandoned,
+                "completed": self.completed,
+                "wait_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": round(waits[-1], 1) if waits else None},
+                "generation_sec_avg": (
+                    round(sum(self._service_sec) / len(self._service_sec), 2) if self._service_sec else None
+                ),
+                "retry_after": self._retry_after_locked(),
+            }
+
+    # -----------------------------
+    # Internals (called with the lock held)
+    # -----------------------------
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted_at = time.monotonic()
+        self._running += 1
+        self.admitted += 1
+        self._wait_ms.append(ticket.wait_ms)
+        ticket._event.set()
+        for wake in ticket._wakers:
+            wake()
+        ticket._wakers.clear()
+
+    def _dispatch_locked(self) -> None:
+        while self._queued and (self.max_concurrency <= 0 or self._running < self.max_concurrency):
+            client_id, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(client_id)  # Next client's turn
+            else:
+                del self._queues[client_id]
+            self._grant(ticket)
+
+    def _add_waker(self, ticket: Ticket, wake: Callable[[], None]) -> bool:
+        """Register a grant callback; False when the ticket is already granted."""
+        with self._lock:
+            if ticket.granted:
+                return False
+            ticket._wakers.append(wake)
+            return True
+
+    def _remove_waker(self, ticket: Ticket, wake: Callable[[], None]) -> None:
+        with self._lock:
+            if wake in ticket._wakers:
+                ticket._wakers.remove(wake)
+
+    def _retry_after_locked(self) -> int:
+        if not self._service_sec:
+            return 5
+        avg = sum(self._service_sec) / len(self._service_sec)
+        slots = self.max_concurrency if self.max_concurrency > 0 else 1
+        return max(1, min(300, math.ceil(avg * (self._queued + 1) / slots)))
@@ -3,10 +3,15 @@
 This module defines the interface that all LLM providers must implement.
 """
 
+import asyncio
+import math
 from abc import ABC, abstractmethod
-from typing import Iterator
+from typing import AsyncIterator, Iterator
 
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from ..config import Config
+from ..context_packer import EstimatedTokens
 
 
 class LLMProvider(ABC):
@@ -49,6 +54,23 @@ class LLMProvider(ABC):
         """
         raise NotImplementedError
     
+    async def astream_generate(self, messages: list[BaseMessage], **kwargs) -> AsyncIterator[str]:
+        """Async variant of `stream_generate` for the ASGI runtime.
+        
+        The default pulls chunks from `stream_generate` in a worker thread;
+        LangChain-backed providers override it with the model's `astream`.
+        
+        Yields:
+            str: Chunks of generated text
+        """
+        iterator = iter(self.stream_generate(messages, **kwargs))
+        done = object()
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, done)
+            if chunk is done:
+                break
+            yield chunk
+    
     @abstractmethod
     def is_available(self) -> bool:
         """Check if provider is available.
@@ -56,4 +78,48 @@ class LLMProvider(ABC):
         Returns:
             bool: True if provider can accept requests, False otherwise
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+    
+    def describe(self) -> str:
+        """Identify the provider and model behind it.
+        
+        Returns:
+            str: Stable identifier such as "bedrock:<model id>", used to key
+                caches of generated answers
+        """
+        return type(self).__name__
+
+    
+    @property
+    def context_tokens(self) -> int:
+        """Context window of the model in tokens (prompt plus output)."""
+        return Config.MODEL_CONTEXT_TOKENS
+    
+    def to_messages(self, prompt) -> list[BaseMessage]:
+        """Convert a prompt to chat messages.
+        
+        A structured prompt (retrieval.PromptParts) becomes the constant system
+        prefix followed by one user message with sources and question; a plain
+        string becomes a single user message.
+        
+        Returns:
+            list[BaseMessage]: Messages for generate()/stream_generate()
+        """
+        if hasattr(prompt, "system"):
+            return [
+                SystemMessage(content=prompt.system),
+                HumanMessage(content=f"{prompt.sources}\n\n{prompt.question}"),
+            ]
+        return [HumanMessage(content=str(prompt))]
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens of `text` with the model's tokenizer.
+        
+        The default is a conservative estimate (about 3.5 characters per
+        token, returned as EstimatedTokens); providers with access to the
+        real tokenizer override it.
+        
+        Returns:
+            int: Number of tokens
+        """
+        return EstimatedTokens(math.ceil(len(text) / 3.5)) if text else 0
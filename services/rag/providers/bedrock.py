@@ -1,4 +1,4 @@
-from typing import Iterator
+from typing import AsyncIterator, Iterator
 from langchain_aws import ChatBedrock
 from langchain_core.messages import BaseMessage, HumanMessage
 from .base import LLMProvider
@@ -31,6 +31,21 @@ class BedrockProvider(LLMProvider):
             if chunk.content:
                 yield chunk.content
     
+    async def astream_generate(self, messages: list[BaseMessage], **kwargs) -> AsyncIterator[str]:
+        """Stream response using AWS Bedrock via LangChain's `astream`"""
+        async for chunk in self.llm.astream(messages, **kwargs):
+            if chunk.content:
+                yield chunk.content
+    
+    @property
+    def context_tokens(self) -> int:
+        """Claude context window"""
+        return Config.BEDROCK_CONTEXT_TOKENS
+    
+    def describe(self) -> str:
+        """Bedrock model id and region"""
+        return f"bedrock:{self.model_id}@{self.region}"
+    
     def is_available(self) -> bool:
         """Check if AWS Bedrock is accessible"""
         try:
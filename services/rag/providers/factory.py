@@ -10,7 +10,9 @@ from typing import Optional
 
 from .base import LLMProvider
 from .bedrock import BedrockProvider
+from .health import get_health_monitor
 from .local_llamacpp import LocalLlamaCppProvider
+from .mock import MockProvider
 from ..config import Config
 
 logger = logging.getLogger(__name__)
@@ -35,13 +37,16 @@ class LLMProviderFactory:
     # Supported environments in fallback order
     _SUPPORTED_ENVIRONMENTS = ["local", "staging", "production"]
     
+    # Selectable only explicitly, never a fallback
+    _MOCK_ENVIRONMENT = "mock"
+    
     @classmethod
     def get_provider(cls, env: Optional[str] = None) -> LLMProvider:
         """Get LLM provider based on environment.
         
         Args:
-            env: Target environment ('local', 'staging', 'production').
-                If None, uses DEPLOYMENT_ENV or config default.
+            env: Target environment ('local', 'staging', 'production', or
+                'mock' for tests). If None, uses DEPLOYMENT_ENV or config default.
                 
         Returns:
             LLMProvider: Configured provider instance
@@ -64,16 +69,23 @@ class LLMProviderFactory:
             return BedrockProvider(Config.BEDROCK_STAGING_MODEL)
         elif env == "production":
             return BedrockProvider(Config.BEDROCK_PRODUCTION_MODEL)
+        elif env == cls._MOCK_ENVIRONMENT:
+            return MockProvider()
         else:
             raise ValueError(
                 f"Unknown environment '{env}'. "
-                f"Supported: {', '.join(cls._SUPPORTED_ENVIRONMENTS)}"
+                f"Supported: {', '.join(cls._SUPPORTED_ENVIRONMENTS + [cls._MOCK_ENVIRONMENT])}"
             )
     
     @classmethod
     def get_available_provider(cls, preferred_env: Optional[str] = None) -> LLMProvider:
         """Get first available provider with fallback logic.
         
+        Each provider tried is registered with the background health monitor,
+        which probes it once now and on an interval afterwards. The mock
+        provider is only used when it is preferred, or DEPLOYMENT_ENV is
+        'mock' and no preference is given; it never falls back to a real one.
+        
         Args:
             preferred_env: Preferred environment to try first.
                 If None or unavailable, falls back through supported environments.
@@ -91,6 +103,14 @@ class LLMProviderFactory:
             >>> # Try all environments in order
             >>> provider = LLMProviderFactory.get_available_provider()
         """
+        if preferred_env is None and os.getenv("DEPLOYMENT_ENV", Config.DEPLOYMENT_ENV) == cls._MOCK_ENVIRONMENT:
+            preferred_env = cls._MOCK_ENVIRONMENT
+        if preferred_env == cls._MOCK_ENVIRONMENT:
+            provider = cls.get_provider(preferred_env)
+            get_health_monitor().watch(provider, probe=True, env=preferred_env)
+            logger.info(f"Using mock provider: {provider.describe()}")
+            return provider
+        
         environments_to_try = []
         
         # Add preferred environment first if specified
@@ -104,10 +124,11 @@ class LLMProviderFactory:
                 
         logger.debug(f"Trying providers in order: {environments_to_try}")
         
+        monitor = get_health_monitor()
         for env in environments_to_try:
             try:
                 provider = cls.get_provider(env)
-                if provider.is_available():
+                if monitor.is_available(monitor.watch(provider, probe=True, env=env)):
                     logger.info(f"Using {env} provider: {type(provider).__name__}")
                     return provider
                 else:
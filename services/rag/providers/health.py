@@ -0,0 +1,232 @@
+"""Background provider health monitoring with a circuit breaker.
+
+`provider.is_available()` is a network round trip (llama.cpp `/health`, a
+one-token Bedrock `invoke`). Instead of calling it on every request, a daemon
+thread probes each watched provider every PROVIDER_HEALTH_INTERVAL seconds and
+caches the result. Availability checks read that cache.
+
+Each provider also has a circuit breaker driven by real request outcomes:
+
+- closed: requests flow; PROVIDER_BREAKER_FAILURES consecutive failures open it
+- open: the provider reports unavailable for PROVIDER_BREAKER_RESET seconds
+- half_open: after the reset time requests are let through again; the next
+  success closes the breaker, a failure opens it again
+
+The monitor thread is started lazily in each process, so pre-fork workers each
+run their own after the fork.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..config import Config
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker."""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self.last_failure: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            return self._state
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Circuit closed after a successful request")
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self._failures += 1
+            self.last_failure = str(error) if error is not None else None
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuit opened after {self._failures} failure(s): {self.last_failure}")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "last_failure": self.last_failure,
+                "retry_in_sec": (
+                    round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+                    if state == OPEN else None
+                ),
+            }
+
+
+class _Watched:
+    """A monitored provider: last probe result plus its circuit breaker."""
+
+    def __init__(self, provider, breaker: CircuitBreaker, env: Optional[str] = None):
+        self.provider = provider
+        self.breaker = breaker
+        self.env = env
+        self.healthy: Optional[bool] = None  # None until the first probe
+        self.checked_at: Optional[float] = None  # Wall clock, for reporting
+        self.latency_ms: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class ProviderHealthMonitor:
+    """Periodic provider probes and per-provider circuit breakers, read in O(1)."""
+
+    def __init__(self, interval: float = 15.0, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.interval = interval
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._watched: Dict[str, _Watched] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stop = threading.Event()
+
+    def watch(self, provider, probe: bool = False, env: Optional[str] = None) -> str:
+        """Monitor `provider`; returns its key (`provider.describe()`).
+
+        With `probe`, the first probe runs now instead of on the monitor thread.
+        A provider already watched under the same key keeps its breaker.
+        """
+        key = provider.describe()
+        with self._lock:
+            entry = self._watched.get(key)
+            if entry is None or entry.provider is not provider:
+                breaker = entry.breaker if entry is not None else CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                env = env or (entry.env if entry is not None else None)
+                entry = self._watched[key] = _Watched(provider, breaker, env)
+            elif env:
+                entry.env = env
+        if probe and entry.healthy is None:
+            self._probe(entry)
+        self._ensure_thread()
+        return key
+
+    def is_available(self, key: str) -> bool:
+        """Last probe succeeded and the breaker is not open."""
+        entry = self._watched.get(key)
+        if entry is None:
+            return False
+        self._ensure_thread()
+        return bool(entry.healthy) and entry.breaker.state != OPEN
+
+    def record_success(self, key: str) -> None:
+        entry = self._watched.get(key)
+        if entry is not None:
+            entry.breaker.record_success()
+
+    def record_failure(self, key: str, error: Optional[BaseException] = None) -> None:
+        entry = self._watched.get(key)
+        if entry is not None:
+            entry.breaker.record_failure(error)
+
+    def status(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._watched.get(key)
+        if entry is None:
+            return None
+        return {
+            "provider": key,
+            "type": type(entry.provider).__name__,
+            "environment": entry.env,
+            "available": bool(entry.healthy) and entry.breaker.state != OPEN,
+            "healthy": entry.healthy,
+            "checked_at": entry.checked_at,
+            "age_sec": round(time.time() - entry.checked_at, 1) if entry.checked_at else None,
+            "latency_ms": entry.latency_ms,
+            "error": entry.error,
+            "circuit": entry.breaker.snapshot(),
+        }
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            keys = list(self._watched)
+        return {key: self.status(key) for key in keys}
+
+    def environment_status(self, env: str) -> Optional[Dict[str, Any]]:
+        """Status of the provider watched for deployment `env`, None if there is none."""
+        with self._lock:
+            keys = [key for key, entry in self._watched.items() if entry.env == env]
+        return self.status(keys[-1]) if keys else None
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # -----------------------------
+    # Monitor thread
+    # -----------------------------
+
+    def _probe(self, entry: _Watched) -> None:
+        start = time.monotonic()
+        try:
+            healthy, error = bool(entry.provider.is_available()), None
+        except Exception as e:
+            healthy, error = False, str(e)
+        if healthy != entry.healthy and entry.healthy is not None:
+            logger.info(f"Provider {entry.provider.describe()} is now {'healthy' if healthy else 'unhealthy'}")
+        entry.latency_ms = round((time.monotonic() - start) * 1000, 1)
+        entry.error = error
+        entry.checked_at = time.time()
+        entry.healthy = healthy
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                entries = list(self._watched.values())
+            for entry in entries:
+                self._probe(entry)
+
+    def _ensure_thread(self) -> None:
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is None or self._pid != pid:
+                self._stop = threading.Event()
+                self._thread = threading.Thread(target=self._run, name="provider-health", daemon=True)
+                self._pid = pid
+                self._thread.start()
+
+
+_monitor: Optional[ProviderHealthMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_health_monitor() -> ProviderHealthMonitor:
+    """Process-wide health monitor configured from Config."""
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = ProviderHealthMonitor(
+                    interval=Config.PROVIDER_HEALTH_INTERVAL,
+                    failure_threshold=Config.PROVIDER_BREAKER_FAILURES,
+                    reset_timeout=Config.PROVIDER_BREAKER_RESET,
+                )
+    return _monitor
@@ -0,0 +1,195 @@
+"""Load-balanced pool of llama.cpp servers behind one provider.
+
+LocalLlamaCppProvider uses a pool when LLAMA_CPP_BASE_URLS lists more than one
+server. Each request is leased to one backend:
+
+- Least outstanding requests: the backend with the fewest in-flight requests
+  wins, and ties go to the lower first-token latency.
+- Prefix affinity: requests with the same prompt prefix (system prompt plus
+  sources) go to the same backend via rendezvous hashing, so that server's KV
+  cache for the prefix is reused. Affinity yields to load balancing when its
+  backend has LLAMA_CPP_AFFINITY_SLACK more requests in flight than the least
+  loaded one. Rendezvous hashing moves only the ejected backend's prefixes
+  when a server drops out.
+- Health and ejection: a backend that fails its `/health` probe, or fails
+  LLAMA_CPP_EJECT_FAILURES requests in a row, takes no traffic for
+  LLAMA_CPP_EJECT_SEC seconds. If every backend is out, requests are still
+  spread over all of them rather than refused.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_EWMA_ALPHA = 0.2
+
+
+class LlamaCppBackend:
+    """One llama.cpp server: its client plus load, latency and health counters."""
+
+    def __init__(self, base_url: str, client):
+        self.base_url = base_url
+        self.client = client
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.healthy = True  # Until the first probe says otherwise
+        self.ttft_ewma: Optional[float] = None  # Seconds to first token
+        self.latency_ewma: Optional[float] = None  # Seconds per request
+
+    @property
+    def health_url(self) -> str:
+        return f"{self.base_url.replace('/v1', '')}/health"
+
+    def usable(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "healthy": self.healthy,
+            "ejected_for_sec": round(self.ejected_until - now, 1) if now < self.ejected_until else None,
+            "ttft_ms": round(self.ttft_ewma * 1000, 1) if self.ttft_ewma is not None else None,
+            "latency_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+        }
+
+
+class _Lease:
+    """A request's hold on a backend; call `first_token()` when output starts."""
+
+    def __init__(self, backend: LlamaCppBackend):
+        self.backend = backend
+        self.started_at = time.monotonic()
+        self.ttft: Optional[float] = None
+
+    def first_token(self) -> None:
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.started_at
+
+
+class LlamaCppPool:
+    """Route requests across llama.cpp backends.
+
+    Args:
+        base_urls: OpenAI-compatible base URLs (".../v1")
+        make_client: Builds the chat client for one base URL
+        eject_failures: Consecutive failed requests that eject a backend
+        eject_sec: Seconds an ejected backend takes no traffic
+        affinity_slack: Extra in-flight requests tolerated to keep prefix affinity
+    """
+
+    def __init__(self, base_urls: List[str], make_client: Callable[[str], Any],
+                 eject_failures: int = 3, eject_sec: float = 30.0, affinity_slack: int = 2):
+        self.backends = [LlamaCppBackend(url, make_client(url)) for url in base_urls]
+        self.eject_failures = eject_failures
+        self.eject_sec = eject_sec
+        self.affinity_slack = affinity_slack
+        self.affinity_hits = 0
+        self.affinity_misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def affinity_key(prefix: str) -> Optional[int]:
+        return zlib.crc32(prefix.encode("utf-8")) if prefix else None
+
+    def choose(self, affinity_key: Optional[int] = None) -> LlamaCppBackend:
+        """Pick the backend for a request (does not lease it)."""
+        with self._lock:
+            return self._choose_locked(affinity_key)
+
+    @contextmanager
+    def lease(self, affinity_key: Optional[int] = None) -> Iterator[_Lease]:
+        """Hold a backend for one request, recording latency and failures.
+
+        Exceptions raised in the block count as backend failures and are
+        re-raised; GeneratorExit and cancellation (client went away) do not.
+        """
+        with self._lock:
+            backend = self._choose_locked(affinity_key)
+            backend.in_flight += 1
+            backend.requests += 1
+        lease = _Lease(backend)
+        try:
+            yield lease
+        except Exception as e:
+            self._finish(lease, error=e)
+            raise
+        except BaseException:
+            self._finish(lease, error=None, completed=False)
+            raise
+        else:
+            self._finish(lease, error=None)
+
+    def probe(self, check: Callable[[LlamaCppBackend], bool]) -> bool:
+        """Run `check` against every backend; True when any is healthy."""
+        for backend in self.backends:
+            try:
+                healthy = bool(check(backend))
+            except Exception:
+                healthy = False
+            if healthy != backend.healthy:
+                logger.info(f"llama.cpp backend {backend.base_url} is now {'healthy' if healthy else 'unhealthy'}")
+            backend.healthy = healthy
+        return any(b.healthy for b in self.backends)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "backends": [b.stats(now) for b in self.backends],
+                "affinity_hits": self.affinity_hits,
+                "affinity_misses": self.affinity_misses,
+            }
+
+    # -----------------------------
+    # Internals
+    # -----------------------------
+
+    def _choose_locked(self, affinity_key: Optional[int]) -> LlamaCppBackend:
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b.usable(now)] or self.backends
+        least = min(candidates, key=lambda b: (b.in_flight, b.ttft_ewma or 0.0))
+        if affinity_key is None or len(candidates) == 1:
+            return least
+        # Rendezvous hashing: highest score for (prefix, backend) wins
+        preferred = max(candidates, key=lambda b: zlib.crc32(f"{affinity_key}:{b.base_url}".encode("utf-8")))
+        if preferred.in_flight <= least.in_flight + self.affinity_slack:
+            self.affinity_hits += 1
+            return preferred
+        self.affinity_misses += 1
+        return least
+
+    def _finish(self, lease: _Lease, error: Optional[BaseException], completed: bool = True) -> None:
+        backend = lease.backend
+        elapsed = time.monotonic() - lease.started_at
+        with self._lock:
+            backend.in_flight -= 1
+            if error is not None:
+                backend.errors += 1
+                backend.consecutive_failures += 1
+                if backend.consecutive_failures >= self.eject_failures:
+                    backend.ejected_until = time.monotonic() + self.eject_sec
+                    backend.consecutive_failures = 0
+                    logger.warning(f"Ejecting llama.cpp backend {backend.base_url} for {self.eject_sec}s: {error}")
+                return
+            backend.consecutive_failures = 0
+            if lease.ttft is not None:
+                backend.ttft_ewma = _ewma(backend.ttft_ewma, lease.ttft)
+            if completed:
+                backend.latency_ewma = _ewma(backend.latency_ewma, elapsed)
+
+
+def _ewma(current: Optional[float], value: float) -> float:
+    return value if current is None else _EWMA_ALPHA * value + (1 - _EWMA_ALPHA) * current
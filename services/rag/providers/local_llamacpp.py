@@ -1,43 +1,146 @@
-from typing import Iterator
+import zlib
+from typing import AsyncIterator, Iterator
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from .base import LLMProvider
+from .llamacpp_pool import LlamaCppPool
+from .. import http_client
 from ..config import Config
 
 
+def _chat_client(base_url: str) -> ChatOpenAI:
+    return ChatOpenAI(
+        base_url=base_url,
+        api_key="dummy",  # llama.cpp doesn't validate
+        model="gpt-3.5-turbo",  # Placeholder, ignored by llama.cpp
+        temperature=Config.GENERATION_TEMPERATURE,
+        max_tokens=Config.GENERATION_MAX_TOKENS,
+        seed=Config.GENERATION_SEED,
+        # Note: repeat_penalty not supported in OpenAI-compatible API
+        # llama.cpp server should be configured with these parameters
+    )
+
+
 class LocalLlamaCppProvider(LLMProvider):
-    """LangChain provider for local llama.cpp HTTP server"""
-    
-    def __init__(self, base_url: str = None):
-        self.base_url = base_url or Config.LLAMA_CPP_BASE_URL
-        self.llm = ChatOpenAI(
-            base_url=self.base_url,
-            api_key="dummy",  # llama.cpp doesn't validate
-            model="gpt-3.5-turbo",  # Placeholder, ignored by llama.cpp
-            temperature=Config.GENERATION_TEMPERATURE,
-            max_tokens=Config.GENERATION_MAX_TOKENS,
-            seed=Config.GENERATION_SEED,
-            # Note: repeat_penalty not supported in OpenAI-compatible API
-            # llama.cpp server should be configured with these parameters
+    """LangChain provider for local llama.cpp HTTP server(s)
+    
+    With several servers in LLAMA_CPP_BASE_URLS (or `base_urls`), requests are
+    balanced across them by a LlamaCppPool (least outstanding requests,
+    prefix affinity, ejection of failing servers).
+    """
+    
+    def __init__(self, base_url: str = None, base_urls: list[str] = None):
+        urls = base_urls or ([base_url] if base_url else Config.LLAMA_CPP_BASE_URLS) or [Config.LLAMA_CPP_BASE_URL]
+        self.base_url = urls[0]
+        self.pool = LlamaCppPool(
+            urls,
+            _chat_client,
+            eject_failures=Config.LLAMA_CPP_EJECT_FAILURES,
+            eject_sec=Config.LLAMA_CPP_EJECT_SEC,
+            affinity_slack=Config.LLAMA_CPP_AFFINITY_SLACK,
         )
+        self.llm = self.pool.backends[0].client
+    
+    def to_messages(self, prompt) -> list[BaseMessage]:
+        """System prefix, sources and question as separate messages.
+        
+        Keeping the sources in their own message makes the rendered chat
+        template identical up to the question for requests over the same
+        sources, so the server's prompt cache covers all of it.
+        """
+        if hasattr(prompt, "system"):
+            return [
+                SystemMessage(content=prompt.system),
+                HumanMessage(content=prompt.sources),
+                HumanMessage(content=prompt.question),
+            ]
+        return super().to_messages(prompt)
+    
+    @staticmethod
+    def _prefix(messages: list[BaseMessage]) -> str:
+        """Everything but the last message: the part shared by follow-up questions"""
+        return "\x00".join(str(m.content) for m in messages[:-1]) if len(messages) > 1 else ""
+    
+    def _cache_params(self, messages: list[BaseMessage]) -> dict:
+        """llama.cpp prompt-cache options for a request.
+        
+        `cache_prompt` lets the server reuse the KV cache of the longest common
+        prefix with the slot's previous prompt. With `LLAMA_CPP_SLOTS` set,
+        requests sharing everything but the last message are pinned to the
+        same slot so that prefix is still cached there.
+        """
+        extra_body = {"cache_prompt": Config.LLAMA_CPP_CACHE_PROMPT}
+        prefix = self._prefix(messages)
+        if Config.LLAMA_CPP_SLOTS > 0 and prefix:
+            extra_body["id_slot"] = zlib.crc32(prefix.encode("utf-8")) % Config.LLAMA_CPP_SLOTS
+        return {"extra_body": extra_body}
     
     def generate(self, messages: list[BaseMessage], **kwargs) -> str:
         """Generate response using local llama.cpp server"""
-        response = self.llm.invoke(messages, **kwargs)
-        return response.content
+        kwargs = {**self._cache_params(messages), **kwargs}
+        with self.pool.lease(self.pool.affinity_key(self._prefix(messages))) as lease:
+            response = lease.backend.client.invoke(messages, **kwargs)
+            lease.first_token()
+            return response.content
     
     def stream_generate(self, messages: list[BaseMessage], **kwargs) -> Iterator[str]:
         """Stream response using local llama.cpp server"""
-        for chunk in self.llm.stream(messages, **kwargs):
-            if chunk.content:
-                yield chunk.content
+        kwargs = {**self._cache_params(messages), **kwargs}
+        with self.pool.lease(self.pool.affinity_key(self._prefix(messages))) as lease:
+            for chunk in lease.backend.client.stream(messages, **kwargs):
+                if chunk.content:
+                    lease.first_token()
+                    yield chunk.content
     
-    def is_available(self) -> bool:
-        """Check if llama.cpp server is responding"""
+    async def astream_generate(self, messages: list[BaseMessage], **kwargs) -> AsyncIterator[str]:
+        """Stream response from the llama.cpp server on the event loop"""
+        kwargs = {**self._cache_params(messages), **kwargs}
+        with self.pool.lease(self.pool.affinity_key(self._prefix(messages))) as lease:
+            async for chunk in lease.backend.client.astream(messages, **kwargs):
+                if chunk.content:
+                    lease.first_token()
+                    yield chunk.content
+    
+    def pool_stats(self) -> dict:
+        """Per-backend in-flight requests, latency, errors and ejection state"""
+        return self.pool.stats()
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with a server's tokenizer (`/tokenize`), estimating if unreachable.
+
+        The server is the pool's least loaded usable backend, so ejected or
+        unhealthy servers are skipped.
+        """
+        if not text:
+            return 0
+        backend = self.pool.choose()
         try:
-            import requests
-            health_url = Config.LLAMA_CPP_HEALTH_URL or f"{self.base_url.replace('/v1', '')}/health"
+            response = http_client.request(
+                "POST",
+                f"{backend.base_url.replace('/v1', '')}/tokenize",
+                idempotent=True,
+                max_retries=0,  # The estimate is good enough for one request
+                attempt_timeout=Config.PROVIDER_HEALTH_CHECK_TIMEOUT,
+                json={"content": text},
+            )
+            response.raise_for_status()
+            return len(response.json()["tokens"])
+        except Exception:
+            return super().count_tokens(text)
+    
+    def describe(self) -> str:
+        """llama.cpp server(s) and the model they are expected to serve"""
+        return f"llamacpp:{Config.DEFAULT_MODEL_ID}@{','.join(b.base_url for b in self.pool.backends)}"
+    
+    def is_available(self) -> bool:
+        """Check if any llama.cpp server is responding, updating per-backend health"""
+        import requests
+        single = len(self.pool.backends) == 1
+        
+        def check(backend):
+            # LLAMA_CPP_HEALTH_URL only applies to a single server
+            health_url = (Config.LLAMA_CPP_HEALTH_URL if single else None) or backend.health_url
             response = requests.get(health_url, timeout=Config.PROVIDER_HEALTH_CHECK_TIMEOUT)
             return response.status_code == 200
-        except:
-            return False
\ No newline at end of file
+        
+        return self.pool.probe(check)
\ No newline at end of file
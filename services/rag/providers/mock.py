@@ -0,0 +1,163 @@
+"""Deterministic mock LLM provider for load and performance tests.
+
+Selected with DEPLOYMENT_ENV=mock (or `LLMProviderFactory.get_provider("mock")`).
+It is never used as a fallback. It needs no model server and behaves like
+one on the clock:
+
+- Time to first token is drawn from a log-normal distribution with median
+  MOCK_TTFT_MS and shape MOCK_TTFT_SIGMA.
+- Output tokens follow every MOCK_TOKEN_DELAY_MS. There are
+  MOCK_OUTPUT_TOKENS of them, capped by the request's max_tokens.
+- MOCK_FAILURE_RATE of requests fail before their first token, and
+  MOCK_STREAM_FAILURE_RATE fail part-way through the stream.
+
+The answer text depends only on the prompt. Each source in the prompt's
+SOURCES block contributes its opening sentence with a [n] marker, so
+citation extraction and the stream parser see realistic output. Latency and
+failure draws come from a generator seeded with MOCK_SEED, so a sequential
+run is reproducible.
+
+`mock_server.py` serves the same provider behind an OpenAI-compatible HTTP
+API so that LocalLlamaCppProvider can be exercised end to end.
+"""
+
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+from typing import AsyncIterator, Iterator, List, Optional
+
+from langchain_core.messages import BaseMessage
+
+from .base import LLMProvider
+from ..config import Config
+
+_SOURCE_RE = re.compile(
+    r"^\[(\d+)\] \(collection=[^,\n]*, id=([^)\n]*)\)\n(.*?)(?=^\[\d+\] \(collection=|\Z)",
+    re.MULTILINE | re.DOTALL,
+)
+_SENTENCE_END_RE = re.compile(r"(?<=[.;:!?])\s")
+_MAX_SENTENCE_WORDS = 24
+_MAX_CITED_SOURCES = 3
+
+
+class MockPlan:
+    """One request's output and timing.
+
+    Attributes:
+        tokens: Output chunks (a word with its leading whitespace)
+        ttft: Seconds to the first token
+        fail_at: Index of the token before which the request fails, or None
+        finish_reason: "stop", or "length" when max_tokens cut the output short
+    """
+
+    def __init__(self, tokens: List[str], ttft: float, token_delay: float,
+                 fail_at: Optional[int], finish_reason: str):
+        self.tokens = tokens
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.fail_at = fail_at
+        self.finish_reason = finish_reason
+
+    def events(self) -> Iterator[tuple]:
+        """(seconds after the request started, token) in order; token None means fail then"""
+        for i, token in enumerate(self.tokens):
+            due = self.ttft + i * self.token_delay
+            if i == self.fail_at:
+                yield due, None
+                return
+            yield due, token
+
+
+class MockProvider(LLMProvider):
+    """Mock LLM with configurable latency, output length and failures.
+
+    Arguments default to the MOCK_* settings.
+    """
+
+    def __init__(self, ttft_ms: Optional[float] = None, ttft_sigma: Optional[float] = None,
+                 token_delay_ms: Optional[float] = None, output_tokens: Optional[int] = None,
+                 failure_rate: Optional[float] = None, stream_failure_rate: Optional[float] = None,
+                 seed: Optional[int] = None):
+        self.ttft_ms = Config.MOCK_TTFT_MS if ttft_ms is None else ttft_ms
+        self.ttft_sigma = Config.MOCK_TTFT_SIGMA if ttft_sigma is None else ttft_sigma
+        self.token_delay_ms = Config.MOCK_TOKEN_DELAY_MS if token_delay_ms is None else token_delay_ms
+        self.output_tokens = Config.MOCK_OUTPUT_TOKENS if output_tokens is None else output_tokens
+        self.failure_rate = Config.MOCK_FAILURE_RATE if failure_rate is None else failure_rate
+        self.stream_failure_rate = Config.MOCK_STREAM_FAILURE_RATE if stream_failure_rate is None else stream_failure_rate
+        self._rng = random.Random(Config.MOCK_SEED if seed is None else seed)
+        self._lock = threading.Lock()
+
+    def plan(self, texts: List[str], max_tokens: Optional[int] = None) -> MockPlan:
+        """Output and timing for a prompt given as its message texts."""
+        answer = answer_for(texts)
+        limit = max(1, min(self.output_tokens, max_tokens or self.output_tokens))
+        words = answer.split()
+        tokens = [(" " if i else "") + words[i % len(words)] for i in range(limit)]  # Repeats to fill the length
+        with self._lock:
+            ttft = self.ttft_ms / 1000 * math.exp(self.ttft_sigma * self._rng.gauss(0.0, 1.0))
+            fail_at = None
+            if self._rng.random() < self.failure_rate:
+                fail_at = 0
+            elif len(tokens) > 1 and self._rng.random() < self.stream_failure_rate:
+                fail_at = self._rng.randrange(1, len(tokens))
+        finish_reason = "length" if limit < self.output_tokens else "stop"
+        return MockPlan(tokens, ttft, self.token_delay_ms / 1000, fail_at, finish_reason)
+
+    def _plan(self, messages: list[BaseMessage], kwargs) -> MockPlan:
+        return self.plan([str(m.content) for m in messages], kwargs.get("max_tokens"))
+
+    def generate(self, messages: list[BaseMessage], **kwargs) -> str:
+        """Complete answer after the full simulated generation time"""
+        return "".join(self.stream_generate(messages, **kwargs))
+
+    def stream_generate(self, messages: list[BaseMessage], **kwargs) -> Iterator[str]:
+        """Stream the planned tokens on schedule"""
+        plan = self._plan(messages, kwargs)
+        started = time.monotonic()
+        for due, token in plan.events():
+            delay = started + due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if token is None:
+                raise RuntimeError("Mock provider: injected failure")
+            yield token
+
+    async def astream_generate(self, messages: list[BaseMessage], **kwargs) -> AsyncIterator[str]:
+        """`stream_generate` on the event loop, without a worker thread"""
+        plan = self._plan(messages, kwargs)
+        started = time.monotonic()
+        for due, token in plan.events():
+            delay = started + due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if token is None:
+                raise RuntimeError("Mock provider: injected failure")
+            yield token
+
+    def is_available(self) -> bool:
+        return True
+
+    def count_tokens(self, text: str) -> int:
+        """Whitespace-separated words: the mock's unit of output"""
+        return len(text.split())
+
+    def describe(self) -> str:
+        return f"mock:ttft={self.ttft_ms:g}ms,delay={self.token_delay_ms:g}ms"
+
+
+def answer_for(texts: List[str]) -> str:
+    """Deterministic answer citing the opening sentence of each source in the prompt"""
+    sources = _SOURCE_RE.findall("\n".join(texts))
+    sentences = []
+    for index, ident, chunk in sources[:_MAX_CITED_SOURCES]:
+        opening = _SENTENCE_END_RE.split(" ".join(chunk.split()), maxsplit=1)[0]
+        words = opening.split()[:_MAX_SENTENCE_WORDS]
+        if not words:
+            continue
+        sentences.append(f"According to {ident.strip()}, {' '.join(words).rstrip('.;:!?,')} [{index}].")
+    if not sentences:
+        return "The provided sources do not address this question."
+    return " ".join(sentences)
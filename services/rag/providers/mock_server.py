@@ -0,0 +1,152 @@
+"""OpenAI-compatible HTTP stand-in for a llama.cpp server, backed by MockProvider.
+
+Serves the llama.cpp endpoints LocalLlamaCppProvider uses: /health,
+/tokenize and /v1/chat/completions (streamed or not). Replies have
+MockProvider's latency, output and injected failures, so the local provider
+path can be tested end to end without a model. That path covers the HTTP
+client, the server pool, ejection, health probes and hedging. Start several
+on different ports to exercise LLAMA_CPP_BASE_URLS.
+
+Usage (from project root):
+    python -m services.rag.providers.mock_server --port 8003
+    python -m services.rag.providers.mock_server --port 8004 --ttft-ms 800 --failure-rate 0.1
+
+    LLAMA_CPP_BASE_URLS=http://localhost:8003/v1,http://localhost:8004/v1 DEPLOYMENT_ENV=local python services/rag/rag_api.py
+"""
+
+import argparse
+import json
+import time
+import uuid
+from typing import List, Optional
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+
+from .mock import MockProvider
+
+_MODEL = "mock"
+
+
+def _texts(messages) -> List[str]:
+    """Message contents as text (string content or a list of text parts)"""
+    texts = []
+    for message in messages or []:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        texts.append(str(content))
+    return texts
+
+
+def _chunk(completion_id: str, created: int, delta: dict, finish_reason: Optional[str] = None) -> str:
+    return "data: " + json.dumps({
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": _MODEL,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }) + "\n\n"
+
+
+def create_mock_server(provider: Optional[MockProvider] = None) -> Flask:
+    """Flask app serving `provider` (default: one from the MOCK_* settings)"""
+    provider = provider or MockProvider()
+    app = Flask(__name__)
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        return jsonify({"status": "ok"})
+
+    @app.route('/tokenize', methods=['POST'])
+    def tokenize():
+        data = request.get_json(force=True, silent=True) or {}
+        return jsonify({"tokens": list(range(provider.count_tokens(data.get("content") or "")))})
+
+    @app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        data = request.get_json(force=True, silent=True) or {}
+        texts = _texts(data.get("messages"))
+        plan = provider.plan(texts, data.get("max_tokens"))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        started = time.monotonic()
+        prompt_tokens = sum(provider.count_tokens(text) for text in texts)
+
+        if not data.get("stream"):
+            text = []
+            for due, token in plan.events():
+                time.sleep(max(0.0, started + due - time.monotonic()))
+                if token is None:
+                    return jsonify({"error": {"message": "Mock server: injected failure", "type": "server_error"}}), 500
+                text.append(token)
+            return jsonify({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": _MODEL,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(text)},
+                    "finish_reason": plan.finish_reason,
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(text),
+                    "total_tokens": prompt_tokens + len(text),
+                },
+            })
+
+        if plan.fail_at == 0:
+            # Fails before any output: a plain error response, as when the server rejects the request
+            time.sleep(plan.ttft)
+            return jsonify({"error": {"message": "Mock server: injected failure", "type": "server_error"}}), 500
+
+        @stream_with_context
+        def generate():
+            yield _chunk(completion_id, created, {"role": "assistant", "content": ""})
+            for due, token in plan.events():
+                time.sleep(max(0.0, started + due - time.monotonic()))
+                if token is None:
+                    # The OpenAI client raises on an error payload in the stream
+                    yield "data: " + json.dumps({"error": {"message": "Mock server: injected failure",
+                                                           "type": "server_error"}}) + "\n\n"
+                    return
+                yield _chunk(completion_id, created, {"content": token})
+            yield _chunk(completion_id, created, {}, plan.finish_reason)
+            yield "data: [DONE]\n\n"
+
+        resp = Response(generate(), mimetype="text/event-stream")
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible llama.cpp server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8003, help="Default matches LLAMA_CPP_BASE_URL")
+    parser.add_argument("--ttft-ms", type=float, default=None, help="Median time to first token (MOCK_TTFT_MS)")
+    parser.add_argument("--ttft-sigma", type=float, default=None, help="Log-normal TTFT spread (MOCK_TTFT_SIGMA)")
+    parser.add_argument("--token-delay-ms", type=float, default=None, help="Between tokens (MOCK_TOKEN_DELAY_MS)")
+    parser.add_argument("--output-tokens", type=int, default=None, help="Tokens per answer (MOCK_OUTPUT_TOKENS)")
+    parser.add_argument("--failure-rate", type=float, default=None, help="Failures before the first token")
+    parser.add_argument("--stream-failure-rate", type=float, default=None, help="Failures mid-stream")
+    parser.add_argument("--seed", type=int, default=None, help="Latency and failure draws (MOCK_SEED)")
+    args = parser.parse_args(argv)
+
+    provider = MockProvider(
+        ttft_ms=args.ttft_ms,
+        ttft_sigma=args.ttft_sigma,
+        token_delay_ms=args.token_delay_ms,
+        output_tokens=args.output_tokens,
+        failure_rate=args.failure_rate,
+        stream_failure_rate=args.stream_failure_rate,
+        seed=args.seed,
+    )
+    print(f"Mock llama.cpp server ({provider.describe()}) on http://{args.host}:{args.port}/v1")
+    create_mock_server(provider).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
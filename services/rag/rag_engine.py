@@ -1,11 +1,27 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import timing
+from .config import Config
+
 
 class RAGEngine:
     def __init__(self):
         self.model_mgr = None
+        self.retrieval_backend = None
+        self.section_index = None
+        self.xref_graph = None
+        self.answer_cache = None
+        self.semantic_cache = None
+        self._token_counters = {}
         self.fetch_simple_search = None
         self.build_prompt_with_sources = None
+        self.source_previews = None
         self.rerank_results = None
         self.extract_citations = None
+        self.citation_stream_parser = None
         self.auto_cite_answer = None
         self.expand_query_with_references = None
         self.verify_answer_support = None
@@ -23,20 +39,26 @@ class RAGEngine:
 
         try:
             from .retrieval import (
-                fetch_simple_search,
                 build_prompt_with_sources,
+                source_previews,
                 rerank_results,
                 extract_citations,
+                CitationStreamParser,
                 auto_cite_answer,
                 expand_query_with_references,
             )
             from .verify import verify_answer_support
             from .normalize import normalize_legal_query, get_query_variations
+            from .backends import RetrievalBackendFactory
             
-            self.fetch_simple_search = fetch_simple_search
+            # Retrieval backend selected by RETRIEVAL_BACKEND (http, batched_http, in_process)
+            self.retrieval_backend = RetrievalBackendFactory.get_backend()
+            self.fetch_simple_search = self.retrieval_backend.search
             self.build_prompt_with_sources = build_prompt_with_sources
+            self.source_previews = source_previews
             self.rerank_results = rerank_results
             self.extract_citations = extract_citations
+            self.citation_stream_parser = CitationStreamParser
             self.auto_cite_answer = auto_cite_answer
             self.expand_query_with_references = expand_query_with_references
             self.verify_answer_support = verify_answer_support
@@ -44,7 +66,178 @@ class RAGEngine:
             self.get_query_variations = get_query_variations
         except Exception:
             pass
+        
+        # Section reference index (dictionary lookup for "section 67-4" style references)
+        try:
+            from .section_index import SectionIndex
+            self.section_index = SectionIndex.load_or_build(Config.SECTION_INDEX_PATH, Config.CODE_DIR)
+        except Exception as e:
+            print(f"⚠️  Section index unavailable: {e}")
+            self.section_index = None
+        
+        # Citation graph for bounded reference expansion (falls back to regex scanning without it)
+        try:
+            from .xref_graph import XrefGraph
+            self.xref_graph = XrefGraph.load_or_build(
+                Config.XREF_GRAPH_PATH, Config.CODE_DIR, self.section_index, max_fanout=Config.XREF_MAX_FANOUT
+            )
+        except Exception as e:
+            print(f"⚠️  Cross-reference graph unavailable: {e}")
+            self.xref_graph = None
+        
+        if Config.ANSWER_CACHE_ENABLED:
+            from .answer_cache import AnswerCache
+            self.answer_cache = AnswerCache(
+                max_entries=Config.ANSWER_CACHE_MAX_ENTRIES,
+                ttl_sec=Config.ANSWER_CACHE_TTL,
+                disk_dir=Config.ANSWER_CACHE_DIR,
+                disk_max_entries=Config.ANSWER_CACHE_DISK_MAX_ENTRIES,
+            )
+        if Config.SEMANTIC_CACHE_ENABLED:
+            try:
+                from .semantic_cache import SemanticAnswerCache
+                self.semantic_cache = SemanticAnswerCache(
+                    max_entries=Config.SEMANTIC_CACHE_MAX_ENTRIES,
+                    threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+                    ttl_sec=Config.ANSWER_CACHE_TTL,
+                )
+            except Exception as e:
+                print(f"⚠️  Semantic answer cache unavailable: {e}")
             
+    def effective_max_tokens(self, requested: int) -> int:
+        """Clamp the output budget so at least MIN_PROMPT_TOKENS remain for the prompt"""
+        provider = getattr(self.model_mgr, "provider", None)
+        if provider is None:
+            return requested
+        return max(1, min(requested, provider.context_tokens - Config.MIN_PROMPT_TOKENS))
+
+    def token_counter(self):
+        """Cached token counter for the active provider's tokenizer, or None"""
+        provider = getattr(self.model_mgr, "provider", None)
+        if provider is None:
+            return None
+        name = provider.describe()
+        counter = self._token_counters.get(name)
+        if counter is None:
+            from .context_packer import TokenCounter
+            counter = self._token_counters[name] = TokenCounter(provider.count_tokens, name)
+        return counter
+
+    def compress(self, question: str, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Query-focused extractive compression of long sources"""
+        from .compress import compress_results
+
+        embed_fn = None
+        backend = self.retrieval_backend
+        if Config.COMPRESSION_EMBEDDINGS and backend is not None:
+            collection = results[0].get("collection", Config.DEFAULT_COLLECTION) if results else Config.DEFAULT_COLLECTION
+
+            def embed_fn(texts):
+                size = max(1, Config.EMBED_BATCH_SIZE)
+                vectors = []
+                for i in range(0, len(texts), size):
+                    vectors.extend(backend.embed(texts[i:i + size], collection=collection))
+                return vectors
+
+        return compress_results(
+            question,
+            results,
+            ratio=Config.COMPRESSION_RATIO,
+            min_chars=Config.COMPRESSION_MIN_CHARS,
+            embed_fn=embed_fn,
+        )
+
+    def build_prompt(self, question: str, results: List[Dict[str, Any]], max_tokens: int):
+        """Build the grounded prompt, packing sources into the model's context budget.
+
+        Long sources are first compressed to their spans most relevant to the
+        question (COMPRESSION_RATIO). Leaves room for `max_tokens` of output.
+        Without a provider, falls back to cutting each source at
+        MAX_CHUNK_CHARS characters.
+        """
+        if Config.COMPRESSION_RATIO < 1.0:
+            with timing.stage("compress", sources=len(results)):
+                results = self.compress(question, results)
+        with timing.stage("prompt_build") as attrs:
+            counter = self.token_counter()
+            if counter is None:
+                prompt, sources = self.build_prompt_with_sources(question, results, max_chunk_chars=Config.MAX_CHUNK_CHARS)
+            else:
+                prompt, sources = self.build_prompt_with_sources(
+                    question,
+                    results,
+                    token_counter=counter,
+                    context_tokens=self.model_mgr.provider.context_tokens,
+                    reserve_tokens=max_tokens,
+                    max_source_tokens=Config.SOURCE_TOKEN_BUDGET or None,
+                )
+            attrs["sources"] = len(sources)
+        return prompt, sources
+
+    def _answer_cache_scope(self, collection: str, num_results: int, generation_params: Dict[str, Any]):
+        """Everything a cached answer depends on besides the question, or None when unknown.
+
+        Answers are only cacheable when the provider and the search index
+        version are known: a rebuilt index or a different model invalidates them.
+        """
+        if not self.model_mgr or not getattr(self.model_mgr, "provider", None):
+            return None
+        index_version = self.retrieval_backend.index_version(collection) if self.retrieval_backend else None
+        if index_version is None:
+            return None
+        return {
+            "collection": collection,
+            "num_results": num_results,
+            "generation": generation_params,
+            "provider": self.model_mgr.provider.describe(),
+            "index_version": index_version,
+            "section_index": self.section_index.version if self.section_index else None,
+            "compression": [Config.COMPRESSION_RATIO, Config.COMPRESSION_MIN_CHARS, Config.COMPRESSION_EMBEDDINGS],
+        }
+
+    def get_cached_answer(self, query: str, collection: str, num_results: int, **generation_params):
+        """Look up a previous answer: exact key first, then a semantically similar question.
+
+        Returns (payload, context). Payload is None on a miss; pass the context
+        to `store_answer` once the answer is generated (it is None when the
+        request is not cacheable).
+        """
+        if self.answer_cache is None and self.semantic_cache is None:
+            return None, None
+        scope = self._answer_cache_scope(collection, num_results, generation_params)
+        if scope is None:
+            return None, None
+        
+        from .answer_cache import make_key, normalize_query
+        question = normalize_query(query)
+        context = {"key": make_key(query=question, **scope), "scope": make_key(**scope),
+                   "question": question, "collection": collection, "vector": None}
+        
+        if self.answer_cache is not None:
+            payload = self.answer_cache.get(context["key"])
+            if payload:
+                return {**payload, "cache": "exact"}, context
+        
+        if self.semantic_cache is not None:
+            try:
+                context["vector"] = self.retrieval_backend.embed([question], collection=collection)[0]
+            except Exception as e:
+                print(f"Question embedding failed, skipping semantic cache: {e}")
+                return None, context
+            payload, similarity = self.semantic_cache.lookup(context["vector"], context["scope"], question)
+            if payload:
+                return {**payload, "cache": "semantic", "cache_similarity": round(similarity, 4)}, context
+        return None, context
+
+    def store_answer(self, context, payload: Dict[str, Any]):
+        """Store a generated answer under the context returned by `get_cached_answer`"""
+        if not context or not payload.get("answer"):
+            return
+        if self.answer_cache is not None:
+            self.answer_cache.set(context["key"], payload)
+        if self.semantic_cache is not None and context["vector"] is not None:
+            self.semantic_cache.add(context["vector"], context["scope"], payload, context["question"])
+
     def auto_load_default_model(self):
         """Check if inference manager is available on startup."""
         if self.model_mgr and self.model_mgr.is_available:
@@ -57,45 +250,310 @@ class RAGEngine:
         """
         Perform retrieval with query normalization and fallback variations.
         
+        All query variations are retrieved at once (one batched search when the
+        backend supports it). Variations are considered in preference order and
+        the first whose top relevance reaches VARIATION_ACCEPT_SCORE is accepted
+        without waiting for the rest; otherwise the variation with the best
+        quality (mean relevance of its top results) wins. Only the winner goes
+        through reference expansion and reranking.
+        
         Args:
             query: User query string
             collection: Collection to search
             num_results: Number of results to retrieve
             
         Returns:
-            Tuple of (final_results, used_query) where final_results are the retrieved results
-            and used_query is the query that worked best
+            Tuple of (final_results, used_query, retrieval_info) where final_results are
+            the retrieved results, used_query is the query that worked best and
+            retrieval_info reports which variation won and why
         """
+        info = _new_retrieval_info(query)
         if not self.fetch_simple_search or not self.expand_query_with_references:
-            return [], query
+            return [], query, info
         
         # Normalize the query
-        normalized_query = self.normalize_legal_query(query)
-        query_variations = self.get_query_variations(normalized_query)
+        with timing.stage("normalize"):
+            normalized_query = self.normalize_legal_query(query)
+            query_variations = self.get_query_variations(normalized_query)
+        info["variations"] = len(query_variations)
+        
+        variations = self._retrieve_variations(query_variations, collection, num_results)
+        try:
+            best = _select_variation(variations, info)
+        finally:
+            variations.close()  # Drops searches still outstanding
+        
+        if best is None:
+            # If all variations failed, return empty results with original query
+            print(f"All query variations failed for: '{query}'")
+            return [], query, info
+        
+        return self._expand_and_rerank(query, best, info, collection, num_results)
+
+    def batch_retrieval_with_normalization(self, queries: List[str], collection: str = "la_plata_county_code", num_results: int = 5):
+        """
+        `enhanced_retrieval_with_normalization` for many questions at once.
+        
+        The variations of all questions are deduplicated and retrieved
+        together: in `search_many` calls of up to BATCH_SEARCH_SIZE queries when
+        the backend batches, otherwise with VARIATION_WORKERS parallel searches.
+        Each question then picks its variation as usual, and reference
+        expansion and reranking run in parallel across questions.
+        
+        Returns:
+            List of (final_results, used_query, retrieval_info), in input order
+        """
+        infos = [_new_retrieval_info(query) for query in queries]
+        if not self.fetch_simple_search or not self.expand_query_with_references:
+            return [([], query, info) for query, info in zip(queries, infos)]
         
-        # Try each query variation until we get good results
-        for i, variant_query in enumerate(query_variations):
+        with timing.stage("normalize", queries=len(queries)):
+            per_query = [self.get_query_variations(self.normalize_legal_query(query)) for query in queries]
+        unique = list(dict.fromkeys(v for variations in per_query for v in variations))
+        payloads = dict(zip(unique, self._search_batch(unique, collection, num_results)))
+        
+        def finish(query, variations, info):
+            info["variations"] = len(variations)
+            best = _select_variation(((i, v, payloads.get(v)) for i, v in enumerate(variations)), info)
+            if best is None:
+                print(f"All query variations failed for: '{query}'")
+                return [], query, info
+            return self._expand_and_rerank(query, best, info, collection, num_results)
+        
+        with ThreadPoolExecutor(max_workers=max(1, Config.VARIATION_WORKERS)) as executor:
+            return list(executor.map(timing.bind(finish), queries, per_query, infos))
+
+    def _search_batch(self, queries: List[str], collection: str, num_results: int) -> List[Optional[Dict[str, Any]]]:
+        """Payload per query in input order, None where the search failed"""
+        backend = self.retrieval_backend
+        if getattr(backend, "supports_batching", False):
+            payloads = []
+            for start in range(0, len(queries), Config.BATCH_SEARCH_SIZE):
+                chunk = queries[start:start + Config.BATCH_SEARCH_SIZE]
+                try:
+                    with timing.stage("retrieval", queries=len(chunk)):
+                        payloads.extend(backend.search_many(chunk, collection=collection, num_results=num_results))
+                except Exception as e:
+                    print(f"Error retrieving batch of {len(chunk)} queries: {e}")
+                    payloads.extend([None] * len(chunk))
+            return payloads
+        
+        def search(query):
+            try:
+                return self._search(query, collection, num_results)
+            except Exception as e:
+                print(f"Error with query variation '{query}': {e}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=max(1, Config.VARIATION_WORKERS)) as executor:
+            return list(executor.map(timing.bind(search), queries))
+
+    def _search(self, query: str, collection: str, num_results: int) -> Dict[str, Any]:
+        """One backend search, timed as a retrieval stage"""
+        with timing.stage("retrieval", queries=1):
+            return self.retrieval_backend.search(query, collection=collection, num_results=num_results)
+
+    async def _asearch(self, query: str, collection: str, num_results: int) -> Dict[str, Any]:
+        """Async `_search`"""
+        with timing.stage("retrieval", queries=1):
+            return await self.retrieval_backend.asearch(query, collection=collection, num_results=num_results)
+
+    async def aenhanced_retrieval_with_normalization(self, query: str, collection: str = "la_plata_county_code", num_results: int = 5):
+        """Async `enhanced_retrieval_with_normalization` for the ASGI runtime.
+
+        Variations are retrieved on the event loop through the backend's async
+        methods; reference expansion and reranking run in a worker thread.
+        """
+        info = _new_retrieval_info(query)
+        if not self.fetch_simple_search or not self.expand_query_with_references:
+            return [], query, info
+        
+        with timing.stage("normalize"):
+            normalized_query = self.normalize_legal_query(query)
+            query_variations = self.get_query_variations(normalized_query)
+        info["variations"] = len(query_variations)
+        
+        best = None
+        variations = self._aretrieve_variations(query_variations, collection, num_results)
+        try:
+            async for retrieval in variations:
+                best, accepted = _consider_variation(best, retrieval, info)
+                if accepted:
+                    break
+        finally:
+            await variations.aclose()  # Cancels searches still outstanding
+        
+        if best is None:
+            print(f"All query variations failed for: '{query}'")
+            return [], query, info
+        return await asyncio.to_thread(self._expand_and_rerank, query, best, info, collection, num_results)
+
+    def _expand_and_rerank(self, query: str, best, info: Dict[str, Any], collection: str, num_results: int):
+        """Reference expansion and reranking of the winning variation"""
+        quality, i, variant_query, initial_results, top_score = best
+        info.update({"used_query": variant_query, "variation": i, "top_score": top_score, "quality": quality})
+        
+        # Apply enhanced retrieval (reference expansion) to the winning variation only
+        try:
+            with timing.stage("expansion", results=len(initial_results)) as attrs:
+                expanded_results = self.expand_query_with_references(
+                    variant_query,
+                    initial_results,
+                    collection=collection,
+                    backend=self.retrieval_backend,
+                    max_workers=Config.REFERENCE_EXPANSION_WORKERS,
+                    deadline_sec=Config.REFERENCE_EXPANSION_DEADLINE,
+                    section_index=self.section_index,
+                    xref_graph=self.xref_graph,
+                    xref_max_depth=Config.XREF_MAX_DEPTH,
+                )
+                attrs["expanded"] = len(expanded_results)
+        except Exception as e:
+            print(f"Reference expansion failed for '{variant_query}': {e}")
+            expanded_results = initial_results
+        with timing.stage("rerank", results=len(expanded_results)):
+            final_results = self.rerank_results(variant_query, expanded_results, top_k=min(num_results, 6))
+        
+        # Log which query variation worked (for debugging)
+        if i > 0:  # Only log if we needed a fallback
+            print(f"Query normalization: '{query}' → '{variant_query}' (variation {i+1})")
+        return final_results, variant_query, info
+
+    async def _aretrieve_variations(self, variations: List[str], collection: str, num_results: int):
+        """Async `_retrieve_variations`: same order, deadline and early-close semantics"""
+        backend = self.retrieval_backend
+        if len(variations) == 1 or getattr(backend, "supports_batching", False):
             try:
-                # Get initial results
-                retrieval = self.fetch_simple_search(variant_query, collection=collection, num_results=num_results)
-                initial_results = retrieval.get("results", [])
-                
-                # If we got results, apply enhanced retrieval (reference expansion)
-                if initial_results:
-                    expanded_results = self.expand_query_with_references(variant_query, initial_results, collection=collection)
-                    final_results = self.rerank_results(variant_query, expanded_results, top_k=min(num_results, 6))
-                    
-                    # Return results if we found something substantial
-                    if final_results:
-                        # Log which query variation worked (for debugging)
-                        if i > 0:  # Only log if we needed a fallback
-                            print(f"Query normalization: '{query}' → '{variant_query}' (variation {i+1})")
-                        return final_results, variant_query
-                            
+                with timing.stage("retrieval", queries=len(variations)):
+                    payloads = await backend.asearch_many(variations, collection=collection, num_results=num_results)
             except Exception as e:
-                print(f"Error with query variation '{variant_query}': {e}")
-                continue
+                print(f"Error retrieving query variations {variations}: {e}")
+                payloads = [None] * len(variations)
+            for i, (v, p) in enumerate(zip(variations, payloads)):
+                yield i, v, p
+            return
         
-        # If all variations failed, return empty results with original query
-        print(f"All query variations failed for: '{query}'")
-        return [], query
\ No newline at end of file
+        tasks = [
+            asyncio.ensure_future(self._asearch(v, collection, num_results))
+            for v in variations
+        ]
+        deadline = time.monotonic() + Config.VARIATION_DEADLINE
+        try:
+            for i, (variant_query, task) in enumerate(zip(variations, tasks)):
+                try:
+                    payload = await asyncio.wait_for(asyncio.shield(task), max(0.0, deadline - time.monotonic()))
+                except Exception as e:
+                    print(f"Error with query variation '{variant_query}': {e}")
+                    payload = None
+                yield i, variant_query, payload
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _retrieve_variations(self, variations: List[str], collection: str, num_results: int):
+        """Retrieve all variations concurrently, yielding (index, query, payload) in preference order.
+
+        Payload is None when a variation failed or missed VARIATION_DEADLINE. Closing
+        the generator early (accepting a variation) drops the outstanding searches.
+        """
+        backend = self.retrieval_backend
+        if len(variations) == 1 or getattr(backend, "supports_batching", False):
+            try:
+                with timing.stage("retrieval", queries=len(variations)):
+                    payloads = backend.search_many(variations, collection=collection, num_results=num_results)
+            except Exception as e:
+                print(f"Error retrieving query variations {variations}: {e}")
+                payloads = [None] * len(variations)
+            yield from ((i, v, p) for i, (v, p) in enumerate(zip(variations, payloads)))
+            return
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, min(Config.VARIATION_WORKERS, len(variations))))
+        try:
+            search = timing.bind(self._search)
+            futures = [executor.submit(search, v, collection, num_results) for v in variations]
+            deadline = time.monotonic() + Config.VARIATION_DEADLINE
+            for i, (variant_query, future) in enumerate(zip(variations, futures)):
+                try:
+                    payload = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except Exception as e:
+                    print(f"Error with query variation '{variant_query}': {e}")
+                    payload = None
+                yield i, variant_query, payload
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _new_retrieval_info(query: str) -> Dict[str, Any]:
+    """Retrieval info before any variation is retrieved: which one wins and why"""
+    return {
+        "used_query": query,
+        "variation": None,
+        "variations": 0,
+        "variations_retrieved": 0,
+        "top_score": None,
+        "quality": None,
+        "accepted_early": False,
+    }
+
+
+def _select_variation(retrievals, info: Dict[str, Any]):
+    """Pick the winning variation from (index, query, payload) in preference order.
+
+    The first variation whose top relevance reaches VARIATION_ACCEPT_SCORE is
+    accepted without looking further; otherwise the best quality wins. Updates
+    the counters in `info`.
+
+    Returns:
+        (quality, index, variant_query, initial_results, top_score), or None
+    """
+    best = None
+    for retrieval in retrievals:
+        best, accepted = _consider_variation(best, retrieval, info)
+        if accepted:
+            break
+    return best
+
+
+def _consider_variation(best, retrieval, info: Dict[str, Any]):
+    """One step of `_select_variation`, shared with the async retrieval path.
+
+    Args:
+        best: Winning candidate so far, or None
+        retrieval: (index, query, payload) of the next variation
+        info: Retrieval info whose counters are updated
+
+    Returns:
+        (best, accepted): the new winning candidate, and whether it was
+        accepted early so later variations need not be looked at
+    """
+    i, variant_query, payload = retrieval
+    if payload is None:
+        return best, False
+    info["variations_retrieved"] += 1
+    initial_results = payload.get("results", [])
+    if not initial_results:
+        return best, False
+    
+    top_score, quality = _variation_scores(initial_results)
+    candidate = (quality, i, variant_query, initial_results, top_score)
+    
+    # Accept early: good enough, no need to wait for later variations
+    if Config.VARIATION_ACCEPT_SCORE > 0 and top_score >= Config.VARIATION_ACCEPT_SCORE:
+        info["accepted_early"] = True
+        return candidate, True
+    if best is None or quality > best[0]:
+        return candidate, False
+    return best, False
+
+
+def _variation_scores(results: List[Dict[str, Any]], k: int = 3) -> Tuple[float, float]:
+    """Return (top relevance, mean relevance of the top k) for one variation's results."""
+    scores = []
+    for r in results:
+        try:
+            scores.append(float(r.get("relevance")))
+        except (TypeError, ValueError):
+            scores.append(0.0)
+    scores.sort(reverse=True)
+    top = scores[:k]
+    return (top[0] if top else 0.0), (sum(top) / len(top) if top else 0.0)
@@ -0,0 +1,448 @@
+"""
+Replay recorded RAG requests and break their latency down by stage.
+
+`run` sends each request through the pipeline and writes one JSONL record per
+request with its stage timings. Two runs, for example before and after a
+retrieval or prompt change, are then compared with `compare`.
+
+Modes:
+
+- In process (default): builds the app and drives RAGEngine directly. Every
+  stage is timed: normalize, each retrieval call, expansion, rerank, compress,
+  prompt_build, queue (generation slot wait), ttft and generation.
+  `--provider mock` replaces the LLM with the mock provider
+  (providers/mock.py, latency set by the MOCK_* settings), so retrieval and
+  prompt changes can be measured without a model server.
+- HTTP (`--http URL`): posts each request to a running server's
+  /rag/answer/stream and derives coarser stages from the stream events:
+  retrieval_pipeline (normalize through rerank), prompt_build (compress and
+  packing), queue, ttft and generation.
+
+The answer cache is bypassed in both modes so every request does the full
+work. Token rates are output tokens per second after the first token. In
+process they are counted with the provider's tokenizer, over HTTP as stream
+chunks.
+
+Input is the batch question format: JSONL request bodies ({"id", "query",
+optional "collection", "num_results", "max_tokens", "temperature", "top_p"}),
+or plain text with one question per line.
+
+Usage (from project root):
+    python -m services.rag.replay run requests.jsonl -o before.jsonl
+    python -m services.rag.replay run requests.jsonl -o after.jsonl --provider mock --label compress-0.5
+    python -m services.rag.replay run requests.jsonl -o http.jsonl --http http://localhost:8001
+    python -m services.rag.replay compare before.jsonl after.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from . import timing
+from .batch import _generation_params, normalize_items, read_questions
+from .config import Config
+from .inference.scheduler import QueueFullError
+from .retrieval import fallback_prompt
+
+# Per-request metrics compared besides the stage totals
+_REQUEST_METRICS = ["total_ms", "ttft_ms", "generation_ms", "tokens_per_sec"]
+
+
+# -----------------------------
+# Replaying one request
+# -----------------------------
+
+def _record(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": item["id"],
+        "query": item["query"],
+        "used_query": None,
+        "sources": [],
+        "error": None,
+        "tokens": 0,
+        "ttft_ms": None,
+        "generation_ms": None,
+        "tokens_per_sec": None,
+        "total_ms": None,
+    }
+
+
+def _finish_generation(record: Dict[str, Any], tokens: int, ttft_ms: Optional[float], generation_ms: float) -> None:
+    record["tokens"] = tokens
+    record["ttft_ms"] = round(ttft_ms, 1) if ttft_ms is not None else None
+    record["generation_ms"] = round(generation_ms, 1)
+    decode_sec = (generation_ms - (ttft_ms or 0.0)) / 1000
+    if tokens > 1 and decode_sec > 0:
+        record["tokens_per_sec"] = round((tokens - 1) / decode_sec, 1)
+
+
+def replay_in_process(rag_engine, item: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one request through RAGEngine, timing every stage."""
+    record = _record(item)
+    model_mgr = rag_engine.model_mgr
+    started = time.perf_counter()
+    with timing.record() as timings:
+        try:
+            if model_mgr is None:
+                raise RuntimeError("Inference not available")
+            params = _generation_params(rag_engine, item)
+            results, used_query, _ = rag_engine.enhanced_retrieval_with_normalization(
+                item["query"], collection=item["collection"], num_results=item["num_results"]
+            )
+            if results:
+                prompt, sources = rag_engine.build_prompt(item["query"], results, params["max_tokens"])
+            else:
+                prompt, sources = fallback_prompt(item["query"]), []  # As the answer handlers do
+            record["used_query"] = used_query
+            record["sources"] = [s["id"] for s in sources]
+
+            ticket = None
+            scheduler = getattr(model_mgr, "scheduler", None)
+            if scheduler is not None:
+                with timing.stage("queue"):
+                    ticket = scheduler.enqueue("replay")
+                    if not ticket.wait(Config.INFERENCE_QUEUE_TIMEOUT):
+                        ticket.release()
+                        raise QueueFullError("Timed out waiting for a generation slot", scheduler.retry_after())
+            try:
+                generation_start = time.perf_counter()
+                first, chunks = None, []
+                for chunk in model_mgr.stream_generate(prompt, ticket=ticket, **params):
+                    if first is None:
+                        first = time.perf_counter()
+                    chunks.append(chunk)
+                end = time.perf_counter()
+            finally:
+                if ticket is not None:
+                    ticket.release()
+
+            start_ms = (generation_start - timings.started_at) * 1000
+            ttft_ms = (first - generation_start) * 1000 if first is not None else None
+            generation_ms = (end - generation_start) * 1000
+            if ttft_ms is not None:
+                timings.add("ttft", ttft_ms, start_ms=start_ms)
+            timings.add("generation", generation_ms, start_ms=start_ms, chunks=len(chunks))
+            text = "".join(chunks)
+            provider = getattr(model_mgr, "provider", None)
+            tokens = provider.count_tokens(text) if provider is not None and text else len(chunks)
+            _finish_generation(record, tokens, ttft_ms, generation_ms)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+    record["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    record.update(timings.as_dict())
+    return record
+
+
+def replay_http(session, base_url: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """POST one request to /rag/answer/stream and time it from the stream events.
+
+    The server is asked for its `timings` block, which has the full stage
+    breakdown. Against servers without one, the coarser stages are derived
+    from the events' `elapsed_ms` stamps. `total_ms` is the client's wall time.
+    """
+    record = _record(item)
+    body = {key: item[key] for key in ("query", "collection", "num_results", "max_tokens", "temperature", "top_p")}
+    body["cache"] = False
+    body["timings"] = True
+    marks: Dict[str, float] = {}
+    chunks = 0
+    end: Dict[str, Any] = {}
+    started = time.perf_counter()
+    try:
+        with session.post(f"{base_url.rstrip('/')}/rag/answer/stream", json=body, stream=True, timeout=600) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: "):])
+                kind = event.get("event")
+                if kind in ("retrieval_started", "sources", "generation_started") and kind not in marks:
+                    marks[kind] = event.get("elapsed_ms") or 0.0
+                    if kind == "generation_started":
+                        marks["queue"] = event.get("queue_ms") or 0.0
+                elif kind == "token":
+                    chunks += 1
+                elif kind == "error":
+                    record["error"] = event.get("message")
+                elif kind == "end":
+                    end = event
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    timings = timing.StageTimings()
+    if "retrieval_started" in marks and "sources" in marks:
+        timings.add("retrieval_pipeline", marks["sources"] - marks["retrieval_started"], start_ms=marks["retrieval_started"])
+    if "sources" in marks and "generation_started" in marks:
+        timings.add("prompt_build", marks["generation_started"] - marks["sources"] - marks["queue"], start_ms=marks["sources"])
+        timings.add("queue", marks["queue"], start_ms=marks["generation_started"] - marks["queue"])
+    if "generation_started" in marks and end.get("elapsed_ms") is not None:
+        ttft_ms = end["first_token_ms"] - marks["generation_started"] if end.get("first_token_ms") is not None else None
+        generation_ms = end["elapsed_ms"] - marks["generation_started"]
+        if ttft_ms is not None:
+            timings.add("ttft", ttft_ms, start_ms=marks["generation_started"])
+        timings.add("generation", generation_ms, start_ms=marks["generation_started"], chunks=chunks)
+        _finish_generation(record, chunks, ttft_ms, generation_ms)
+    if end:
+        record["used_query"] = (end.get("retrieval") or {}).get("used_query")
+        record["sources"] = [s.get("id") for s in end.get("sources") or []]
+        if end.get("answer") is None and not record["error"]:
+            record["error"] = "No answer"
+    elif not record["error"]:
+        record["error"] = "Stream ended without an end event"
+    server_timings = end.get("timings")
+    if server_timings:
+        record["server_ms"] = server_timings.get("total_ms")
+        record.update(stages=server_timings["stages"], totals=server_timings["totals"])
+    else:
+        record.update(timings.as_dict())
+    return record
+
+
+def replay(items: List[Dict[str, Any]], replay_one: Callable[[Dict[str, Any]], Dict[str, Any]],
+           concurrency: int = 1) -> Iterator[Dict[str, Any]]:
+    """Yield one record per item, in input order, with `concurrency` requests in flight."""
+    if concurrency <= 1:
+        for item in items:
+            yield replay_one(item)
+        return
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        yield from executor.map(replay_one, items)
+
+
+# -----------------------------
+# Reports
+# -----------------------------
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile (q in 0..100), None for no values"""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def _metrics(record: Dict[str, Any]) -> Dict[str, float]:
+    """Metric name -> value for one successful record; stages as their per-request total"""
+    metrics = {name: record[name] for name in _REQUEST_METRICS if record.get(name) is not None}
+    for name, total in (record.get("totals") or {}).items():
+        if f"{name}_ms" in metrics:
+            continue  # ttft and generation stages repeat the request metrics
+        metrics[f"{name}_ms"] = total["total_ms"]
+        if total["count"] > 1:
+            metrics[f"{name}_calls"] = total["count"]
+    return metrics
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-metric count, p50, p95 and mean over the successful records"""
+    ok = [r for r in records if not r.get("error")]
+    values: Dict[str, List[float]] = {}
+    for record in ok:
+        for name, value in _metrics(record).items():
+            values.setdefault(name, []).append(value)
+    return {
+        "requests": len(records),
+        "errors": len(records) - len(ok),
+        "metrics": {
+            name: {
+                "count": len(vals),
+                "p50": round(_percentile(vals, 50), 2),
+                "p95": round(_percentile(vals, 95), 2),
+                "mean": round(sum(vals) / len(vals), 2),
+            }
+            for name, vals in values.items()
+        },
+    }
+
+
+def compare_runs(baseline: List[Dict[str, Any]], candidate: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compare two runs over the requests both answered.
+
+    Returns per-metric p50/p95 for each run with the candidate's change, plus
+    how much the retrieved sources changed: mean Jaccard overlap of the
+    source ids, and the share of requests whose first source stayed the same.
+    """
+    base = {r["id"]: r for r in baseline if not r.get("error")}
+    cand = {r["id"]: r for r in candidate if not r.get("error")}
+    shared = [rid for rid in base if rid in cand]
+    a, b = summarize([base[rid] for rid in shared]), summarize([cand[rid] for rid in shared])
+
+    metrics = {}
+    for name in list(a["metrics"]) + [n for n in b["metrics"] if n not in a["metrics"]]:
+        row = {"baseline": a["metrics"].get(name), "candidate": b["metrics"].get(name)}
+        if row["baseline"] and row["candidate"]:
+            for q in ("p50", "p95"):
+                before, after = row["baseline"][q], row["candidate"][q]
+                row[f"{q}_delta"] = round(after - before, 2)
+                row[f"{q}_change_pct"] = round((after - before) / before * 100, 1) if before else None
+        metrics[name] = row
+
+    overlaps, same_top = [], 0
+    for rid in shared:
+        before, after = set(base[rid]["sources"]), set(cand[rid]["sources"])
+        overlaps.append(len(before & after) / len(before | after) if before | after else 1.0)
+        same_top += base[rid]["sources"][:1] == cand[rid]["sources"][:1]
+    return {
+        "compared": len(shared),
+        "baseline_only": len(baseline) - len(shared),
+        "candidate_only": len(candidate) - len(shared),
+        "baseline_errors": sum(1 for r in baseline if r.get("error")),
+        "candidate_errors": sum(1 for r in candidate if r.get("error")),
+        "metrics": metrics,
+        "sources": {
+            "mean_overlap": round(sum(overlaps) / len(overlaps), 3) if overlaps else None,
+            "same_top_source": round(same_top / len(shared), 3) if shared else None,
+        },
+    }
+
+
+def _fmt(value: Optional[float]) -> str:
+    return f"{value:10.1f}" if value is not None else f"{'-':>10}"
+
+
+def _print_summary(summary: Dict[str, Any]) -> None:
+    print(f"{summary['requests']} requests, {summary['errors']} errors")
+    print(f"{'metric':<24}{'p50':>10}{'p95':>10}{'mean':>10}")
+    for name, m in summary["metrics"].items():
+        print(f"{name:<24}{_fmt(m['p50'])}{_fmt(m['p95'])}{_fmt(m['mean'])}")
+
+
+def _print_comparison(report: Dict[str, Any], labels: List[str]) -> None:
+    print(f"{labels[0]} → {labels[1]}: {report['compared']} requests compared "
+          f"(errors {report['baseline_errors']} → {report['candidate_errors']})")
+    print(f"{'metric':<24}{'p50 before':>12}{'p50 after':>12}{'change':>9}{'p95 before':>12}{'p95 after':>12}{'change':>9}")
+    for name, row in report["metrics"].items():
+        cells = []
+        for q in ("p50", "p95"):
+            before = row["baseline"][q] if row["baseline"] else None
+            after = row["candidate"][q] if row["candidate"] else None
+            change = row.get(f"{q}_change_pct")
+            cells.append(f"{_fmt(before):>12}{_fmt(after):>12}{(f'{change:+.1f}%' if change is not None else '-'):>9}")
+        print(f"{name:<24}{''.join(cells)}")
+    sources = report["sources"]
+    if sources["mean_overlap"] is not None:
+        print(f"Sources: {sources['mean_overlap'] * 100:.1f}% mean overlap, "
+              f"same first source for {sources['same_top_source'] * 100:.1f}% of requests")
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def read_run(path: str):
+    """(run header, records) from a replay output file"""
+    header, records = {}, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "run" in record:
+                header = record["run"]
+            else:
+                records.append(record)
+    return header, records
+
+
+def _use_mock_provider(rag_engine) -> None:
+    """Serve generations from the mock provider, even when no real provider is reachable"""
+    from .inference.langchain_manager import LangChainInferenceManager
+    from .providers.mock import MockProvider
+    rag_engine.model_mgr = LangChainInferenceManager(provider=MockProvider())
+
+
+def _run(args) -> None:
+    items = normalize_items(read_questions(args.requests), {
+        key: getattr(args, key) for key in ("collection", "num_results", "max_tokens") if getattr(args, key) is not None
+    })
+    if args.limit:
+        items = items[:args.limit]
+
+    header = {
+        "label": args.label or args.output,
+        "mode": "http" if args.http else "in_process",
+        "provider": args.provider,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    def write(records):
+        with open(args.output, "w", encoding="utf-8") as out:
+            out.write(json.dumps({"run": header}) + "\n")
+            for n, record in enumerate(records, start=1):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                if n % 10 == 0 or n == len(items):
+                    print(f"  {n}/{len(items)}")
+
+    if args.http:
+        import requests
+        session = requests.Session()
+        print(f"Replaying {len(items)} requests against {args.http}")
+        write(replay(items, lambda item: replay_http(session, args.http, item), args.concurrency))
+    else:
+        from .app_factory import create_app
+        app = create_app()
+        with app.app_context():
+            rag_engine = app.config['RAG_ENGINE']
+            if args.provider == "mock":
+                _use_mock_provider(rag_engine)
+            if rag_engine.model_mgr is not None and rag_engine.model_mgr.provider is not None:
+                header["provider"] = rag_engine.model_mgr.provider.describe()
+            print(f"Replaying {len(items)} requests in process with {header['provider']}")
+            write(replay(items, lambda item: replay_in_process(rag_engine, item), args.concurrency))
+
+    _print_summary(summarize(read_run(args.output)[1]))
+
+
+def _compare(args) -> None:
+    base_header, baseline = read_run(args.baseline)
+    cand_header, candidate = read_run(args.candidate)
+    report = compare_runs(baseline, candidate)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    _print_comparison(report, [base_header.get("label", args.baseline), cand_header.get("label", args.candidate)])
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay recorded RAG requests with per-stage timings")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Replay requests and write per-request stage timings")
+    run.add_argument("requests", help="JSONL request bodies or text file, one question per line")
+    run.add_argument("-o", "--output", required=True, help="JSONL run file (overwritten)")
+    run.add_argument("--label", help="Name shown in comparisons (default: output path)")
+    run.add_argument("--http", metavar="URL", help="Replay against a running server instead of in process")
+    run.add_argument("--provider", choices=["real", "mock"], default="real",
+                     help="In process: configured LLM provider, or the mock (MOCK_* settings)")
+    run.add_argument("--concurrency", type=int, default=1, help="Requests in flight")
+    run.add_argument("--limit", type=int, default=0, help="Replay only the first N requests")
+    run.add_argument("--collection", help="Default collection for requests without one")
+    run.add_argument("--num-results", type=int, help="Default num_results for requests without one")
+    run.add_argument("--max-tokens", type=int, help="Default max_tokens for requests without one")
+    run.set_defaults(handler=_run)
+
+    compare = commands.add_parser("compare", help="Compare two runs stage by stage")
+    compare.add_argument("baseline", help="Run file before the change")
+    compare.add_argument("candidate", help="Run file after the change")
+    compare.add_argument("--json", action="store_true", help="Print the report as JSON")
+    compare.set_defaults(handler=_compare)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "http", None) and args.provider != "real":
+        parser.error("--provider applies to in-process replay only")
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
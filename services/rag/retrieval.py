@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Any, Dict, List, Tuple, Optional
-import requests
 from flask import current_app
+import base64
 import re
+import zlib
+
+import numpy as np
+
+from . import http_client
 
 
 DEFAULT_SEARCH_BASE = "http://localhost:8000"
@@ -20,6 +26,7 @@ def fetch_simple_search(
     """Call the existing search_api `/search/simple` endpoint and return JSON.
 
     Keeps separation of concerns by delegating retrieval to the dedicated service.
+    Uses the pooled keep-alive session; `timeout_sec` bounds each attempt.
     """
     url = f"{base_url}/search/simple"
     params = {
@@ -27,64 +34,153 @@ def fetch_simple_search(
         "collection": collection,
         "num_results": max(1, min(10, int(num_results))),
     }
-    resp = requests.get(url, params=params, timeout=timeout_sec)
+    resp = http_client.request("GET", url, params=params, attempt_timeout=timeout_sec)
     resp.raise_for_status()
     return resp.json()
 
 
+SYSTEM_PROMPT = (
+    "You are a helpful assistant that answers questions about La Plata County code and regulations. "
+    "Use the provided sources to answer the user's question accurately and concisely. "
+    "Structure your response clearly with the key information first, followed by supporting details. "
+    "Include citation markers [n] in your response to reference the sources you use. "
+    "If the sources don't contain enough information to answer the question, say so."
+)
+
+_INSTRUCTIONS = (
+    "Based on the sources provided above, answer the user's question accurately and concisely. "
+    "Include citation markers [n] to reference specific sources. Provide a complete answer and then stop."
+)
+
+
+class PromptParts(str):
+    """A prompt laid out as constant system prefix, sources block and question block.
+
+    The string value is the flat prompt (so it prints, hashes and counts like
+    any prompt); `system`, `sources` and `question` let providers send the
+    blocks as separate chat messages. The system block never changes, so
+    servers that cache prompt prefixes (llama.cpp `cache_prompt`) reuse it
+    across requests; the question comes last so requests over the same
+    sources share everything before it.
+    """
+
+    def __new__(cls, system: str, sources: str, question: str):
+        text = f"SYSTEM:\n{system}\n\n{sources}\n\n{question}"
+        obj = super().__new__(cls, text)
+        obj.system = system
+        obj.sources = sources
+        obj.question = question
+        return obj
+
+
+def _question_block(question: str) -> str:
+    return f"QUESTION:\n{question}\n\nINSTRUCTIONS:\n{_INSTRUCTIONS}\n\nANSWER:"
+
+
+def _source_id(result: Dict[str, Any]) -> str:
+    return result.get("section") or result.get("account") or result.get("id") or "unknown"
+
+
+def fallback_prompt(query: str) -> str:
+    """Prompt with the bare question, for when retrieval fails or finds nothing"""
+    return f"User question:\n{query}\n\nAnswer concisely."
+
+
+def source_previews(results: List[Dict[str, Any]], preview_chars: int = 200) -> List[Dict[str, Any]]:
+    """Source list for the UI straight from retrieval, before compression and packing.
+
+    Same keys and numbering as build_prompt_with_sources' sources_meta when
+    every source fits the prompt.
+    """
+    return [
+        {
+            "index": i,
+            "collection": r.get("collection", "unknown"),
+            "id": _source_id(r),
+            "preview": ((r.get("original_text") or r.get("text") or "").strip())[:preview_chars],
+        }
+        for i, r in enumerate(results, start=1)
+    ]
+
+
 def build_prompt_with_sources(
     question: str,
     results: List[Dict[str, Any]],
     *,
     max_chunk_chars: Optional[int] = None,
-) -> Tuple[str, List[Dict[str, Any]]]:
+    token_counter: Optional[Any] = None,
+    context_tokens: Optional[int] = None,
+    reserve_tokens: int = 0,
+    max_source_tokens: Optional[int] = None,
+) -> Tuple[PromptParts, List[Dict[str, Any]]]:
     """Construct a grounded prompt with enumerated sources and return (prompt, sources_meta).
 
+    The prompt is a `PromptParts`: system prefix, sources block, question block.
+
+    With a `token_counter` (a context_packer.TokenCounter for the active model)
+    and `context_tokens`, sources are packed into the tokens left after the
+    fixed prompt parts and `reserve_tokens` of output: shared by relevance and
+    trimmed at sentence boundaries, dropping sources that would not fit.
+    `max_source_tokens` optionally caps the tokens spent on sources.
+    Otherwise each source is cut to `max_chunk_chars` characters.
+
     sources_meta preserves mapping for UI: index, collection, section/account, and small preview.
     """
-    if max_chunk_chars is None:
-        max_chunk_chars = getattr(current_app.config, 'MAX_CHUNK_CHARS', 5000)
-    
-    lines: List[str] = []
-
-    system = (
-        "You are a helpful assistant that answers questions about La Plata County code and regulations. "
-        "Use the provided sources to answer the user's question accurately and concisely. "
-        "Structure your response clearly with the key information first, followed by supporting details. "
-        "Include citation markers [n] in your response to reference the sources you use. "
-        "If the sources don't contain enough information to answer the question, say so."
-    )
-
-    lines.append(f"SYSTEM:\n{system}\n")
-    lines.append(f"QUESTION:\n{question}\n")
+    question_block = _question_block(question)
 
+    texts = [(r.get("text") or "").strip() for r in results]  # Compressed text when compression ran
+    idents = [_source_id(r) for r in results]
+    
+    if token_counter is not None and context_tokens:
+        from .context_packer import pack_sources
+        
+        fixed_tokens = token_counter.count(str(PromptParts(SYSTEM_PROMPT, "SOURCES:", question_block)))
+        header_tokens = max(
+            (token_counter.count(f"[{i}] (collection={r.get('collection', 'unknown')}, id={ident})\n\n")
+             for i, (r, ident) in enumerate(zip(results, idents), start=1)),
+            default=0,
+        )
+        budget = context_tokens - reserve_tokens - fixed_tokens - _PROMPT_SAFETY_TOKENS
+        if max_source_tokens:
+            budget = min(budget, max_source_tokens)
+        # Results arrive reranked: weight by service relevance, decaying with rank
+        weights = [(0.5 + _parse_relevance(r.get("relevance"))) / (1 + 0.3 * rank) for rank, r in enumerate(results)]
+        packed = pack_sources(texts, weights, budget, token_counter, doc_ids=idents, header_tokens=header_tokens)
+    else:
+        if max_chunk_chars is None:
+            max_chunk_chars = getattr(current_app.config, 'MAX_CHUNK_CHARS', 5000)
+        packed = [(text[:max_chunk_chars], None) for text in texts]
+
+    source_lines: List[str] = ["SOURCES:"]
     sources_meta: List[Dict[str, Any]] = []
-    lines.append("SOURCES:")
-    for idx, r in enumerate(results, start=1):
-        ident = r.get("section") or r.get("account") or r.get("id") or "unknown"
+    idx = 0
+    for r, ident, text, fit in zip(results, idents, texts, packed):
+        if fit is None:
+            continue  # Did not fit the context budget
+        idx += 1
         collection = r.get("collection", "unknown")
-        text = (r.get("text") or "").strip()
-        chunk = text[:max_chunk_chars]
-        lines.append(f"[{idx}] (collection={collection}, id={ident})\n{chunk}\n")
-        sources_meta.append(
-            {
-                "index": idx,
-                "collection": collection,
-                "id": ident,
-                "preview": chunk[:200],
-                "chunk": text,  # Store full text for final response
-                "truncated_chunk": chunk,  # Store truncated for prompt building
-            }
-        )
+        chunk, tokens = fit
+        source_lines.append(f"[{idx}] (collection={collection}, id={ident})\n{chunk}\n")
+        meta = {
+            "index": idx,
+            "collection": collection,
+            "id": ident,
+            "preview": chunk[:200],
+            "chunk": r.get("original_text") or text,  # Store full text for final response
+            "truncated_chunk": chunk,  # Store truncated for prompt building
+        }
+        if tokens is not None:
+            meta["tokens"] = tokens
+        if "spans" in r:
+            meta["spans"] = r["spans"]  # Offsets into chunk of the text the model saw
+        sources_meta.append(meta)
+
+    prompt = PromptParts(SYSTEM_PROMPT, "\n".join(source_lines).rstrip(), question_block)
+    return prompt, sources_meta
 
 
-    # Add explicit instruction to generate an answer
-    lines.append("\nINSTRUCTIONS:")
-    lines.append("Based on the sources provided above, answer the user's question accurately and concisely. Include citation markers [n] to reference specific sources. Provide a complete answer and then stop.")
-    lines.append("\nANSWER:")
-    
-    prompt = "\n".join(lines)
-    return prompt, sources_meta
+# Tokens kept free for chat template overhead and tokenizer differences
+_PROMPT_SAFETY_TOKENS = 64
 
 
 # -----------------------------
@@ -107,6 +203,48 @@ def _jaccard(a_tokens: List[str], b_tokens: List[str]) -> float:
     return (inter / union) if union else 0.0
 
 
+def _term_ids(tokens: List[str]) -> np.ndarray:
+    """Term ids (CRC-32 of each distinct token), as in services/search/term_features.py"""
+    unique = set(tokens)
+    return np.fromiter(map(zlib.crc32, map(str.encode, unique)), dtype=np.uint32, count=len(unique))
+
+
+def _result_terms(result: Dict[str, Any], max_chars: int) -> np.ndarray:
+    """Term ids of a result's first `max_chars` characters.
+
+    Uses the search service's precomputed `terms` when they cover the same
+    characters, otherwise tokenizes the text.
+    """
+    features = result.get("terms")
+    if isinstance(features, dict) and features.get("max_chars") == max_chars:
+        try:
+            return np.frombuffer(base64.b64decode(features["ids"]), dtype="<u4")
+        except (KeyError, TypeError, ValueError):
+            pass
+    return _term_ids(_tokenize((result.get("text") or "")[:max_chars]))
+
+
+def _pairwise_jaccard(term_sets: List[np.ndarray]) -> np.ndarray:
+    """Jaccard similarity of every pair of term-id sets, as an (n, n) matrix.
+
+    One 0/1 incidence matrix over the union vocabulary; intersections are a
+    single matrix product. Empty sets score 0 against everything.
+    """
+    n = len(term_sets)
+    scores = np.zeros((n, n))
+    lengths = [len(t) for t in term_sets]
+    if not any(lengths):
+        return scores
+    vocab, columns = np.unique(np.concatenate(term_sets), return_inverse=True)
+    incidence = np.zeros((n, len(vocab)), dtype=np.float32)
+    incidence[np.repeat(np.arange(n), lengths), columns] = 1.0
+    sizes = incidence.sum(axis=1, dtype=np.float64)  # Distinct ids, even if a set repeats one
+    inter = (incidence @ incidence.T).astype(np.float64)  # Exact: counts are far below 2**24
+    union = sizes[:, None] + sizes[None, :] - inter
+    np.divide(inter, union, out=scores, where=union > 0)
+    return scores
+
+
 def _parse_relevance(value: Any) -> float:
     try:
         return float(value)
@@ -127,50 +265,44 @@ def rerank_results(
     - Score each candidate by lexical overlap with the query (Jaccard on tokens)
       and the provided relevance score when available.
     - Select top_k with a redundancy penalty to encourage diversity.
-    """
-    q_tokens = _tokenize(query)
-
-    scored: List[Tuple[float, Dict[str, Any], List[str]]] = []
-    for r in results:
-        text = (r.get("text") or "")[:max_chunk_chars]
-        tokens = _tokenize(text)
-        overlap = _jaccard(q_tokens, tokens)
-        rel = _parse_relevance(r.get("relevance"))
-        # Combine: emphasize overlap, keep some weight for service-provided relevance
-        score = 0.7 * overlap + 0.3 * rel
-        scored.append((score, r, tokens))
-
-    # Primary sort by score desc
-    scored.sort(key=lambda x: x[0], reverse=True)
 
-    selected: List[Dict[str, Any]] = []
-    selected_tokens: List[List[str]] = []
-
-    for score, r, tokens in scored:
+    Candidates' term ids come from the search service when it sent them
+    (`terms`); query overlap and candidate-to-candidate similarity are one
+    pairwise Jaccard matrix.
+    """
+    if not results:
+        return []
+    term_sets = [_term_ids(_tokenize(query))] + [_result_terms(r, max_chunk_chars) for r in results]
+    similarity = _pairwise_jaccard(term_sets)
+    overlap = similarity[0, 1:]
+    pairwise = similarity[1:, 1:]
+    rel = np.array([_parse_relevance(r.get("relevance")) for r in results])
+    # Combine: emphasize overlap, keep some weight for service-provided relevance
+    scores = 0.7 * overlap + 0.3 * rel
+
+    # Primary sort by score desc (stable, so ties keep retrieval order)
+    order = np.argsort(-scores, kind="stable")
+
+    selected: List[int] = []
+    for i in order:
         # Diversity check: skip if too similar to any already-selected chunk
-        is_redundant = False
-        for t_sel in selected_tokens:
-            if _jaccard(tokens, t_sel) >= diversity_threshold:
-                is_redundant = True
-                break
-        if is_redundant:
+        if selected and pairwise[i, selected].max() >= diversity_threshold:
             continue
-
-        selected.append(r)
-        selected_tokens.append(tokens)
+        selected.append(i)
         if len(selected) >= top_k:
             break
 
     # If diversity dropped the count too low, fill from the remainder without checks
     if len(selected) < min(top_k, len(results)):
-        for _, r, _ in scored:
-            if r in selected:
+        chosen = set(selected)
+        for i in order:
+            if i in chosen:
                 continue
-            selected.append(r)
+            selected.append(i)
             if len(selected) >= top_k:
                 break
 
-    return selected
+    return [results[i] for i in selected]
 
 
 def extract_citations(answer_text: str, sources_meta: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
@@ -213,6 +345,38 @@ def extract_citations(answer_text: str, sources_meta: List[Dict[str, Any]]) -> T
     return citations, used_sources
 
 
+class CitationStreamParser:
+    """Incremental `[n]` marker parser for streamed answers.
+
+    Feed generated tokens as they arrive; `feed` returns the citations (same
+    shape as extract_citations, plus the mapped `source`) whose marker appeared
+    for the first time. Markers split across tokens ("[", "1", "2]") are held
+    back until complete. Markers without a matching source are ignored.
+    """
+
+    _MARKER_RE = re.compile(r"\[(\d+)\]")
+    _PARTIAL_RE = re.compile(r"\[\d{0,6}$")
+
+    def __init__(self, sources_meta: List[Dict[str, Any]]):
+        self._sources = {s.get("index"): s for s in (sources_meta or [])}
+        self._pending = ""
+        self.seen: set = set()
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        buf = self._pending + (text or "")
+        partial = self._PARTIAL_RE.search(buf)
+        self._pending = partial.group(0) if partial else ""
+        new: List[Dict[str, Any]] = []
+        for m in self._MARKER_RE.finditer(buf):
+            idx = int(m.group(1))
+            src = self._sources.get(idx)
+            if src is None or idx in self.seen:
+                continue
+            self.seen.add(idx)
+            new.append({"marker": idx, "id": src.get("id"), "collection": src.get("collection"), "source": src})
+        return new
+
+
 def extract_section_references(results: List[Dict[str, Any]]) -> List[str]:
     """Extract section references from retrieval results.
     
@@ -246,6 +410,63 @@ def extract_section_references(results: List[Dict[str, Any]]) -> List[str]:
     return list(references)
 
 
+def result_id(r: Dict[str, Any]) -> Optional[str]:
+    """Stable identifier of a search result (section, account or generic id)."""
+    return r.get("section") or r.get("account") or r.get("id")
+
+
+def search_concurrently(
+    queries: List[str],
+    *,
+    collection: str = "la_plata_county_code",
+    num_results: int = 5,
+    backend: Optional[Any] = None,
+    base_url: str = DEFAULT_SEARCH_BASE,
+    max_workers: int = 3,
+    deadline_sec: float = 5.0,
+) -> List[Optional[Dict[str, Any]]]:
+    """Run several searches at once and return payloads in query order.
+
+    Backends that batch (`supports_batching`) get a single `search_many` call.
+    Otherwise the searches run on a bounded thread pool. Either way payloads
+    that fail or arrive after `deadline_sec` are returned as None and their
+    work is dropped.
+    """
+    if not queries:
+        return []
+
+    if backend is not None and getattr(backend, "supports_batching", False):
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(backend.search_many, list(queries), collection=collection, num_results=num_results)
+            wait([future], timeout=deadline_sec)
+            if future.done() and not future.cancelled() and future.exception() is None:
+                return list(future.result())
+            return [None] * len(queries)  # Failed or late
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _search(q: str) -> Dict[str, Any]:
+        if backend is not None:
+            return backend.search(q, collection=collection, num_results=num_results)
+        return fetch_simple_search(q, collection=collection, num_results=num_results, base_url=base_url)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries))))
+    try:
+        futures = [executor.submit(_search, q) for q in queries]
+        wait(futures, timeout=deadline_sec)
+        payloads: List[Optional[Dict[str, Any]]] = []
+        for f in futures:
+            if f.done() and not f.cancelled() and f.exception() is None:
+                payloads.append(f.result())
+            else:
+                payloads.append(None)  # Failed or late
+        return payloads
+    finally:
+        # Don't block on stragglers past the deadline
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
 def expand_query_with_references(
     original_query: str,
     initial_results: List[Dict[str, Any]],
@@ -253,43 +474,114 @@ def expand_query_with_references(
     collection: str = "la_plata_county_code", 
     max_additional_results: int = 8,
     base_url: str = DEFAULT_SEARCH_BASE,
+    backend: Optional[Any] = None,
+    max_workers: int = 3,
+    deadline_sec: float = 5.0,
+    section_index: Optional[Any] = None,
+    xref_graph: Optional[Any] = None,
+    xref_max_depth: int = 2,
 ) -> List[Dict[str, Any]]:
     """Expand retrieval by following section references found in initial results.
     
+    With an `xref_graph` (an XrefGraph, code collection only) the precomputed
+    citation graph is walked from the initial results and the best-ranked cited
+    documents are fetched in one bulk call, without scanning texts. Results the
+    graph does not know fall through to the paths below.
+    
+    With a `section_index` (a SectionIndex, code collection only) references
+    are resolved to document ids by lookup and fetched in one bulk call; only
+    references the index does not know fall back to semantic search.
+    
+    Reference lookups go through `backend` (a RetrievalBackend) when given,
+    otherwise straight to the search API at `base_url`. All lookups are issued
+    at once; those not back within `deadline_sec` are dropped.
+    
     Returns combined and deduplicated results from original query + reference queries.
     """
+    code_collection = backend is not None and collection == "la_plata_county_code"
+    seen_ids = {result_id(r) for r in initial_results}
+    
+    if xref_graph is not None and code_collection:
+        seeds = [rid for rid in (result_id(r) for r in initial_results) if rid in xref_graph]
+        if seeds:
+            doc_ids = xref_graph.expand(seeds, original_query, max_depth=xref_max_depth,
+                                        budget=max_additional_results, exclude=seen_ids)
+            if not doc_ids:
+                return initial_results
+            try:
+                fetched = backend.get_documents(doc_ids, collection=collection)
+                return initial_results + [r for r in fetched if result_id(r) not in seen_ids]
+            except Exception as e:
+                print(f"Error fetching cross-referenced sections {doc_ids}: {e}")
+    
     references = extract_section_references(initial_results)
     
     if not references:
         return initial_results
-        
-    # Collect additional results from reference queries
+    
     additional_results = []
-    seen_ids = {r.get("id") for r in initial_results}
     
-    for ref in references[:3]:  # Limit to top 3 references to avoid explosion
+    if section_index is not None and code_collection:
+        doc_ids, unresolved = section_index.resolve_many(references)
+        doc_ids = [d for d in doc_ids if d not in seen_ids][:max_additional_results]
         try:
-            ref_query = f"section {ref}"
-            ref_data = fetch_simple_search(
-                ref_query,
-                collection=collection,
-                num_results=max_additional_results // 2,
-                base_url=base_url,
-            )
-            
-            for result in ref_data.get("results", []):
-                result_id = result.get("id")
-                if result_id and result_id not in seen_ids:
-                    additional_results.append(result)
-                    seen_ids.add(result_id)
-                    
-        except Exception:
-            continue  # Skip failed reference queries
+            if doc_ids:
+                for result in backend.get_documents(doc_ids, collection=collection):
+                    rid = result_id(result)
+                    if rid and rid not in seen_ids:
+                        additional_results.append(result)
+                        seen_ids.add(rid)
+            references = unresolved
+        except Exception as e:
+            # Fall back to semantic lookups for every reference
+            print(f"Error fetching referenced sections {doc_ids}: {e}")
+        if not references or len(additional_results) >= max_additional_results:
+            return initial_results + additional_results
+        
+    # Limit to top 3 references to avoid explosion
+    ref_queries = [f"section {ref}" for ref in references[:3]]
+    payloads = search_concurrently(
+        ref_queries,
+        collection=collection,
+        num_results=max_additional_results // 2,
+        backend=backend,
+        base_url=base_url,
+        max_workers=max_workers,
+        deadline_sec=deadline_sec,
+    )
+    
+    # Collect additional results from reference queries
+    for ref_data in payloads:
+        if not ref_data:
+            continue  # Skip failed or late reference queries
+        for result in ref_data.get("results", []):
+            rid = result_id(result)
+            if rid and rid not in seen_ids:
+                additional_results.append(result)
+                seen_ids.add(rid)
     
     # Combine and return
     return initial_results + additional_results
 
 
+def _best_sources(texts: List[str], sources_meta: List[Dict[str, Any]]) -> List[Tuple[Optional[int], float]]:
+    """(index of the most overlapping source, or None; its Jaccard score) for each text.
+
+    Sources (at least one) are matched on the chunk the model saw, tokenized
+    once; all text-to-source scores come from one pairwise Jaccard matrix.
+    """
+    if not texts:
+        return []
+    indices = [s.get("index") for s in sources_meta]
+    chunks = [s.get("truncated_chunk") or s.get("chunk") or s.get("preview") or "" for s in sources_meta]
+    similarity = _pairwise_jaccard([_term_ids(_tokenize(t)) for t in texts + chunks])[:len(texts), len(texts):]
+    best: List[Tuple[Optional[int], float]] = []
+    for row in similarity:
+        j = int(np.argmax(row))  # First of equal scores, as a strict > scan would pick
+        best.append((indices[j], float(row[j])) if row[j] > 0 else (None, 0.0))
+    return best
+
+
 def auto_cite_answer(answer_text: str, sources_meta: List[Dict[str, Any]], *,
                      min_jaccard: float = 0.2) -> Tuple[str, List[Dict[str, Any]], List[Dict[str, Any]]]:
     """Best-effort citation insertion when the model omits [n] markers.
@@ -302,41 +594,20 @@ def auto_cite_answer(answer_text: str, sources_meta: List[Dict[str, Any]], *,
     if not answer_text or not sources_meta:
         return answer_text, [], []
 
-    # Pre-tokenize source chunks (use truncated for matching)
-    src_tokens = {}
-    for s in sources_meta:
-        idx = s.get("index")
-        chunk = s.get("truncated_chunk") or s.get("chunk") or s.get("preview") or ""
-        src_tokens[idx] = _tokenize(chunk)
-
     lines = answer_text.split("\n")
-    new_lines: List[str] = []
-    for line in lines:
-        stripped = line.strip()
-        if not stripped:
-            new_lines.append(line)
-            continue
-        # Skip if already cites
-        if re.search(r"\[\d+\]", line):
-            new_lines.append(line)
-            continue
-
-        ltokens = _tokenize(stripped)
-        best_idx, best_score = None, 0.0
-        for idx, toks in src_tokens.items():
-            score = _jaccard(ltokens, toks)
-            if score > best_score:
-                best_idx, best_score = idx, score
+    # Lines to match: non-empty and not already citing
+    pending = [i for i, line in enumerate(lines) if line.strip() and not re.search(r"\[\d+\]", line)]
+    best = _best_sources([lines[i].strip() for i in pending], sources_meta)
 
+    new_lines = list(lines)
+    for i, (best_idx, best_score) in zip(pending, best):
         if best_idx is not None and best_score >= min_jaccard:
             # Append citation keeping original whitespace/punctuation at end
+            line = lines[i]
             if line.endswith(" "):
-                new_line = f"{line}[{best_idx}]"
+                new_lines[i] = f"{line}[{best_idx}]"
             else:
-                new_line = f"{line} [{best_idx}]"
-            new_lines.append(new_line)
-        else:
-            new_lines.append(line)
+                new_lines[i] = f"{line} [{best_idx}]"
 
     new_answer = "\n".join(new_lines)
     citations, used_sources = extract_citations(new_answer, sources_meta)
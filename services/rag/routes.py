@@ -3,6 +3,7 @@ from .handlers.config import config_bp
 from .handlers.model import model_bp
 from .handlers.answer import answer_bp
 from .handlers.stream import stream_bp
+from .handlers.batch import batch_bp
 from .handlers.index import index_bp
 from .handlers.factory_info import factory_info_bp
 
@@ -13,5 +14,6 @@ def register_blueprints(app):
     app.register_blueprint(model_bp)
     app.register_blueprint(answer_bp)
     app.register_blueprint(stream_bp)
+    app.register_blueprint(batch_bp)
     app.register_blueprint(index_bp)
     app.register_blueprint(factory_info_bp)
\ No newline at end of file
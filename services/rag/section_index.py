@@ -0,0 +1,249 @@
+"""
+Section reference resolution index for the La Plata County land use code.
+
+Offline step: parse chapter and section headings out of the scraped code
+(`la_plata_code/full_code.json` or `la_plata_code/section_*.txt`) and persist
+a map from section number ("67-4") and chapter number ("67") to the ids of the
+documents that contain them. Document ids are the scraper's secids, which are
+also the ids of the `la_plata_county_code` Chroma collection.
+
+At query time a reference is resolved by dictionary lookup instead of a
+semantic search for the literal string "section 67-4".
+
+Build:
+    python -m services.rag.section_index --code-dir la_plata_code --out la_plata_code/section_index.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT = 1
+
+# "Sec. 67-4 Minor subdivisions", "Sec. 1-1. Designation and citation of Code.", "Section 66-11"
+_SECTION_HEADING_RE = re.compile(r"^(?:Sec\.|Section)\s*(\d+(?:\.\d+)?-\d+(?:\.\d+)?)\b\.?\s*(.*)$")
+# "Chapter 67 Division of Land", "CHAPTER 66: PERMITS AND PROCEDURES", "Chapters 75—77 RESERVED"
+_CHAPTER_HEADING_RE = re.compile(r"^chapters?\s+(\d+)(?:\s*[—–-]\s*(\d+))?\b", re.IGNORECASE)
+_SECID_RE = re.compile(r"section_(\d+)\.txt$")
+
+
+def normalize_reference(ref: str) -> str:
+    """Canonical form of a section or chapter reference ("67.4" → "67-4", " 67 " → "67")."""
+    ref = (ref or "").strip().lower()
+    ref = re.sub(r"^(?:section|sec\.|§+|chapter|ch\.)\s*", "", ref)
+    if re.fullmatch(r"\d+\.\d+", ref):
+        ref = ref.replace(".", "-")
+    return ref
+
+
+def _parse_document(text: str) -> Tuple[Dict[str, bool], List[str]]:
+    """Return ({section number: has body}, [chapter numbers]) for one document.
+
+    A heading "has body" when it is followed by content rather than by another
+    heading, i.e. it is not just an entry in a "Contents:" listing.
+    """
+    lines = [ln.strip() for ln in text.split("\n") if ln.strip()]
+    sections: Dict[str, bool] = {}
+    chapters: List[str] = []
+
+    for i, line in enumerate(lines):
+        m = _SECTION_HEADING_RE.match(line)
+        if m:
+            number = m.group(1)
+            nxt = lines[i + 1] if i + 1 < len(lines) else ""
+            has_body = bool(nxt) and not _SECTION_HEADING_RE.match(nxt) and not _CHAPTER_HEADING_RE.match(nxt)
+            sections[number] = sections.get(number, False) or has_body
+            continue
+        if i < 3:  # Chapter headings open the document
+            m = _CHAPTER_HEADING_RE.match(line)
+            if m:
+                start = int(m.group(1))
+                end = int(m.group(2)) if m.group(2) else start
+                for n in range(start, min(end, start + 20) + 1):
+                    if str(n) not in chapters:
+                        chapters.append(str(n))
+
+    return sections, chapters
+
+
+def _doc_sort_key(doc_id: str):
+    return (0, int(doc_id)) if doc_id.isdigit() else (1, doc_id)
+
+
+class SectionIndex:
+    """Map from section/chapter numbers to document ids.
+
+    Candidates are ordered best first: documents that carry the section's body
+    before documents that only list it, then documents with fewer sections
+    (a dedicated section page beats the whole chapter), then by id.
+    """
+
+    def __init__(self, sections: Dict[str, List[str]], chapters: Dict[str, List[str]],
+                 titles: Dict[str, str], version: str):
+        self.sections = sections
+        self.chapters = chapters
+        self.titles = titles
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    def resolve(self, ref: str, limit: int = 1) -> List[str]:
+        """Resolve a reference to up to `limit` document ids (empty when unknown)."""
+        key = normalize_reference(ref)
+        if not key:
+            return []
+        if "-" in key:
+            return self.sections.get(key, [])[:limit]
+        return self.chapters.get(key, [])[:limit]
+
+    def resolve_many(self, refs: Iterable[str], limit_per_ref: int = 1) -> Tuple[List[str], List[str]]:
+        """Resolve several references; returns (document ids in order, unresolved refs)."""
+        doc_ids: List[str] = []
+        unresolved: List[str] = []
+        for ref in refs:
+            ids = self.resolve(ref, limit=limit_per_ref)
+            if not ids:
+                unresolved.append(ref)
+            for doc_id in ids:
+                if doc_id not in doc_ids:
+                    doc_ids.append(doc_id)
+        return doc_ids, unresolved
+
+    # -----------------------------
+    # Build / persistence
+    # -----------------------------
+
+    @classmethod
+    def build(cls, documents: Dict[str, str]) -> "SectionIndex":
+        """Build the index from {doc_id: text}."""
+        body_docs: Dict[str, List[str]] = {}
+        listing_docs: Dict[str, List[str]] = {}
+        chapter_docs: Dict[str, List[str]] = {}
+        section_counts: Dict[str, int] = {}
+        titles: Dict[str, str] = {}
+        digest = hashlib.sha1()
+
+        for doc_id in sorted(documents, key=_doc_sort_key):
+            text = documents[doc_id] or ""
+            digest.update(doc_id.encode("utf-8"))
+            digest.update(text.encode("utf-8"))
+
+            first_line = next((ln.strip() for ln in text.split("\n") if ln.strip()), "")
+            first_heading = next((ln.strip() for ln in text.split("\n") if _SECTION_HEADING_RE.match(ln.strip())), "")
+            titles[doc_id] = (f"{first_line} | {first_heading}" if first_heading else first_line)[:200]
+
+            sections, chapters = _parse_document(text)
+            section_counts[doc_id] = len(sections)
+            for number, has_body in sections.items():
+                (body_docs if has_body else listing_docs).setdefault(number, []).append(doc_id)
+            for number in chapters:
+                chapter_docs.setdefault(number, []).append(doc_id)
+
+        merged: Dict[str, List[str]] = {}
+        for number in set(body_docs) | set(listing_docs):
+            ranked = sorted(body_docs.get(number, []), key=lambda d: (section_counts[d], _doc_sort_key(d)))
+            ranked += sorted(listing_docs.get(number, []), key=lambda d: (section_counts[d], _doc_sort_key(d)))
+            merged[number] = ranked
+
+        # Chapter lead documents: the chapter's overview page (its contents listing) first
+        chapters = {
+            number: sorted(ids, key=lambda d: (section_counts[d] == 0, -section_counts[d], _doc_sort_key(d)))
+            for number, ids in chapter_docs.items()
+        }
+
+        return cls(merged, chapters, titles, digest.hexdigest()[:16])
+
+    @classmethod
+    def build_from_directory(cls, code_dir: str) -> "SectionIndex":
+        """Build from `full_code.json` when present, else from `section_*.txt` files."""
+        return cls.build(load_code_documents(code_dir))
+
+    def to_dict(self) -> dict:
+        return {
+            "format": INDEX_FORMAT,
+            "version": self.version,
+            "sections": self.sections,
+            "chapters": self.chapters,
+            "titles": self.titles,
+        }
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SectionIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported section index format: {data.get('format')}")
+        return cls(data["sections"], data["chapters"], data.get("titles", {}), data["version"])
+
+    @classmethod
+    def load_or_build(cls, path: str, code_dir: str) -> Optional["SectionIndex"]:
+        """Load the persisted index, building (and saving) it from `code_dir` if missing.
+
+        Returns None when neither the index nor the source documents exist.
+        """
+        if os.path.exists(path):
+            try:
+                return cls.load(path)
+            except Exception as e:
+                logger.warning(f"Could not load section index {path}: {e}")
+        if not os.path.isdir(code_dir):
+            return None
+        index = cls.build_from_directory(code_dir)
+        if not len(index):
+            return None
+        try:
+            index.save(path)
+            logger.info(f"Built section index {path}: {len(index)} sections")
+        except OSError as e:
+            logger.warning(f"Could not save section index {path}: {e}")
+        return index
+
+
+def load_code_documents(code_dir: str) -> Dict[str, str]:
+    """Load {doc_id: text} for the scraped code, preferring `full_code.json`."""
+    full_code = os.path.join(code_dir, "full_code.json")
+    if os.path.exists(full_code):
+        with open(full_code, "r", encoding="utf-8") as f:
+            return {str(k): v for k, v in json.load(f).items() if isinstance(v, str)}
+
+    documents: Dict[str, str] = {}
+    for path in glob.glob(os.path.join(code_dir, "section_*.txt")):
+        m = _SECID_RE.search(path)
+        if not m:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            documents[m.group(1)] = f.read()
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the land use code section reference index")
+    parser.add_argument("--code-dir", default="la_plata_code", help="Directory with full_code.json or section_*.txt")
+    parser.add_argument("--out", default="la_plata_code/section_index.json", help="Output JSON path")
+    args = parser.parse_args()
+
+    index = SectionIndex.build_from_directory(args.code_dir)
+    index.save(args.out)
+    print(f"Indexed {len(index)} sections and {len(index.chapters)} chapters "
+          f"from {len(index.titles)} documents → {args.out} (version {index.version})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Semantic near-duplicate answer cache.
+
+The exact answer cache (answer_cache.py) misses paraphrases: "how do I
+subdivide my land" and "what's the process to subdivide property" deserve the
+same answer. This cache keeps the embeddings of previously answered questions
+in a small in-memory matrix and returns the stored answer when a new question's
+cosine similarity to one of them reaches a threshold.
+
+Entries are grouped by scope: a hash of everything except the question text
+(collection, parameters, provider, index versions). A question only matches
+entries of its own scope, so a rebuilt index or another model never serves a
+stale answer.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Histogram of best similarities per lookup, for threshold tuning
+_SIMILARITY_BINS = [0.0, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 1.0001]
+
+
+class SemanticAnswerCache:
+    """Bounded cosine-similarity cache over unit-normalized question embeddings."""
+
+    def __init__(self, max_entries: int = 1024, threshold: float = 0.95, ttl_sec: float = 3600):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_sec = ttl_sec
+        self._vectors: Optional[np.ndarray] = None  # (max_entries, dim), allocated on first insert
+        self._scopes: List[Optional[str]] = [None] * max_entries
+        self._payloads: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._questions: List[Optional[str]] = [None] * max_entries
+        self._stored_at = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._histogram = [0] * (len(_SIMILARITY_BINS) - 1)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def lookup(self, vector: List[float], scope: str, question: str = "") -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+        """Return (payload, similarity) of the closest question in `scope`.
+
+        Payload is None below the threshold; similarity is None when the scope
+        has no live entries.
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        now = time.time()
+        with self._lock:
+            best, similarity = None, None
+            if self._size and self._vectors is not None and self._vectors.shape[1] == query.shape[0]:
+                live = np.fromiter(
+                    (s == scope for s in self._scopes[:self._size]), dtype=bool, count=self._size
+                ) & (now - self._stored_at[:self._size] < self.ttl_sec)
+                if live.any():
+                    sims = self._vectors[:self._size] @ query
+                    sims[~live] = -np.inf
+                    best = int(np.argmax(sims))
+                    similarity = float(sims[best])
+
+            if similarity is not None:
+                self._histogram[int(np.searchsorted(_SIMILARITY_BINS, max(similarity, 0.0), side="right")) - 1] += 1
+            if similarity is not None and similarity >= self.threshold:
+                self.hits += 1
+                self._last_used[best] = now
+                payload = self._payloads[best]
+                logger.info(f"Semantic cache hit sim={similarity:.3f}: '{question}' ~ '{self._questions[best]}'")
+                return payload, similarity
+
+            self.misses += 1
+            if similarity is not None:
+                logger.info(f"Semantic cache miss best_sim={similarity:.3f}: '{question}'")
+            return None, similarity
+
+    def add(self, vector: List[float], scope: str, payload: Dict[str, Any], question: str = "") -> None:
+        """Store an answer, evicting the least recently used entry when full."""
+        vec = np.asarray(vector, dtype=np.float32)
+        now = time.time()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vec.shape[0]:
+                # First insert, or the embedding model changed: start over
+                self._vectors = np.zeros((self.max_entries, vec.shape[0]), dtype=np.float32)
+                self._size = 0
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = vec
+            self._scopes[slot] = scope
+            self._payloads[slot] = payload
+            self._questions[slot] = question
+            self._stored_at[slot] = now
+            self._last_used[slot] = now
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "similarity_histogram": {
+                    f"{lo:.3f}-{min(hi, 1.0):.3f}": n
+                    for lo, hi, n in zip(_SIMILARITY_BINS, _SIMILARITY_BINS[1:], self._histogram)
+                },
+            }
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.answer_cache import AnswerCache, make_key, normalize_query
+
+
+def test_key_ignores_case_whitespace_and_trailing_punctuation():
+    a = make_key(query=normalize_query("What are the requirements for minor subdivisions?"), index_version="v1")
+    b = make_key(query=normalize_query("  what are the requirements  for minor subdivisions "), index_version="v1")
+    c = make_key(query=normalize_query("What are the requirements for minor subdivisions?"), index_version="v2")
+    assert a == b
+    assert a != c
+
+
+def test_lru_eviction():
+    cache = AnswerCache(max_entries=2, ttl_sec=60)
+    cache.set("a", {"answer": "A"})
+    cache.set("b", {"answer": "B"})
+    assert cache.get("a") == {"answer": "A"}  # "b" is now least recently used
+    cache.set("c", {"answer": "C"})
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+
+def test_ttl_expiry():
+    cache = AnswerCache(max_entries=2, ttl_sec=0)
+    cache.set("a", {"answer": "A"})
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    AnswerCache(disk_dir=str(tmp_path)).set("k" * 64, {"answer": "A"})
+    cache = AnswerCache(disk_dir=str(tmp_path))
+    assert cache.get("k" * 64) == {"answer": "A"}
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_prunes_expired_then_oldest(tmp_path):
+    cache = AnswerCache(max_entries=1, ttl_sec=60, disk_dir=str(tmp_path), disk_max_entries=2)
+    keys = [c * 64 for c in "abcd"]
+    for i, key in enumerate(keys):
+        cache.set(key, {"answer": key[0]})
+        os.utime(cache._path(key), (1000 + i, 1000 + i))  # Written in key order, long ago
+    os.utime(cache._path(keys[3]), None)  # Only "d" is fresh
+
+    assert cache.prune_disk() == 3
+    assert AnswerCache(disk_dir=str(tmp_path)).get(keys[3]) == {"answer": "d"}
+
+    for i, key in enumerate(keys[:3]):
+        cache.set(key, {"answer": key[0]})
+        os.utime(cache._path(key), (time.time() - 10 + i,) * 2)
+    assert cache.prune_disk() == 2  # Over the limit: the two oldest go
+    assert not os.path.exists(cache._path(keys[0])) and not os.path.exists(cache._path(keys[1]))
+
+
+def test_semantic_cache_matches_paraphrase_within_scope():
+    import numpy as np
+    from services.rag.semantic_cache import SemanticAnswerCache
+
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.9)
+    stored = np.array([1.0, 0.0, 0.0])
+    paraphrase = np.array([0.95, 0.31, 0.0])
+    paraphrase /= np.linalg.norm(paraphrase)
+    cache.add(stored, "scope-v1", {"answer": "A"}, "how do i subdivide my land")
+
+    payload, similarity = cache.lookup(paraphrase, "scope-v1")
+    assert payload == {"answer": "A"} and similarity > 0.9
+    assert cache.lookup(paraphrase, "scope-v2") == (None, None)  # Index version changed
+    assert cache.lookup(np.array([0.0, 1.0, 0.0]), "scope-v1")[0] is None
+    assert cache.stats()["hits"] == 1
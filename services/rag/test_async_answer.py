@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+pytest.importorskip("starlette")
+pytest.importorskip("httpx")  # Starlette's TestClient
+
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from services.rag.backends.base import RetrievalBackend
+from services.rag.config import Config
+from services.rag.handlers.async_answer import rag_answer, rag_answer_stream
+from services.rag.inference.langchain_manager import LangChainInferenceManager
+from services.rag.providers.mock import MockProvider
+from services.rag.rag_engine import RAGEngine
+from services.rag.retrieval import (
+    CitationStreamParser,
+    auto_cite_answer,
+    build_prompt_with_sources,
+    extract_citations,
+    source_previews,
+)
+
+
+class _Backend(RetrievalBackend):
+    """Blocking search only; the async methods are the base class's worker-thread defaults"""
+
+    def __init__(self):
+        self.queries = []
+
+    def search(self, query, *, collection="la_plata_county_code", num_results=5):
+        self.queries.append(query)
+        return {"results": [
+            {"id": "67-4", "collection": collection, "text": "Setbacks shall be 25 feet from the right-of-way.",
+             "relevance": 0.9},
+            {"id": "67-5", "collection": collection, "text": "Fences may not exceed six feet in height.",
+             "relevance": 0.5},
+        ][:num_results]}
+
+
+def _client():
+    engine = RAGEngine()
+    engine.model_mgr = LangChainInferenceManager(provider=MockProvider(ttft_ms=0, token_delay_ms=0, output_tokens=30))
+    engine.retrieval_backend = _Backend()
+    engine.fetch_simple_search = engine.retrieval_backend.search
+    engine.normalize_legal_query = lambda q: q.lower()
+    engine.get_query_variations = lambda q: [q, q + " zoning"]
+    engine.expand_query_with_references = lambda q, results, **kwargs: results
+    engine.rerank_results = lambda q, results, top_k: results[:top_k]
+    engine.build_prompt_with_sources = build_prompt_with_sources
+    engine.source_previews = source_previews
+    engine.extract_citations = extract_citations
+    engine.citation_stream_parser = CitationStreamParser
+    engine.auto_cite_answer = auto_cite_answer
+
+    app = Starlette(routes=[
+        Route('/rag/answer', rag_answer, methods=['POST']),
+        Route('/rag/answer/stream', rag_answer_stream, methods=['POST', 'GET']),
+    ])
+    app.state.rag_engine = engine
+    return TestClient(app), engine
+
+
+def test_answer_retrieves_generates_and_cites():
+    client, engine = _client()
+    resp = client.post('/rag/answer', json={"query": "What are the setbacks?", "num_results": 2})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["answer"].startswith("According to 67-4, Setbacks shall be 25 feet")
+    assert [s["id"] for s in body["sources"]] == ["67-4", "67-5"]
+    assert body["citations"] and body["cached"] is False
+    assert body["retrieval"]["used_query"] == "what are the setbacks?"
+    assert engine.retrieval_backend.queries[0] == "what are the setbacks?"
+
+    assert client.post('/rag/answer', json=["not", "an", "object"]).status_code == 400
+    assert client.post('/rag/answer', json={"query": "x", "num_results": "many"}).status_code == 400
+
+
+def test_stream_sends_progress_tokens_and_citations():
+    client, _ = _client()
+    resp = client.post('/rag/answer/stream', json={"query": "What are the setbacks?", "num_results": 2})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in resp.text.split("\n") if line.startswith("data: ")]
+    names = [e["event"] for e in events]
+    assert names[:4] == ["start", "retrieval_started", "sources", "generation_started"]
+    assert "token" in names and "citation" in names
+    end = events[-1]
+    assert end["event"] == "end" and end["answer"] == "".join(e["text"] for e in events if e["event"] == "token").strip()
+    assert [s["id"] for s in end["sources"]] == ["67-4", "67-5"]
+    assert end["first_token_ms"] is not None
+
+    resp = client.get('/rag/answer/stream', params={"query": ""})
+    assert resp.status_code == 400
+
+
+def test_async_retrieval_selects_the_same_variation(monkeypatch):
+    _, engine = _client()
+    for accept_score, accepted_early in ((0.8, True), (0.0, False)):
+        monkeypatch.setattr(Config, "VARIATION_ACCEPT_SCORE", accept_score)
+        results, used_query, info = engine.enhanced_retrieval_with_normalization("Setbacks?", num_results=2)
+        aresults, aused_query, ainfo = asyncio.run(
+            engine.aenhanced_retrieval_with_normalization("Setbacks?", num_results=2)
+        )
+        assert (aresults, aused_query, ainfo) == (results, used_query, info)
+        assert info["accepted_early"] is accepted_early
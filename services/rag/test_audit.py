@@ -0,0 +1,41 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.audit import AuditWriter, iter_records, parse_rates, segment_paths
+
+
+def _record(i):
+    return {"query": f"Question {i}?", "answer": f"Answer {i} " + "x" * (i * 37 % 500), "sources": [f"s{i}"]}
+
+
+def test_segments_rotate_by_size_and_read_back_in_order(tmp_path):
+    writer = AuditWriter(str(tmp_path), max_bytes=2048, route_rates=parse_rates("answer=1,answer_batch=0"))
+    for i in range(300):
+        assert writer.submit("answer", _record(i))
+        if i % 50 == 49:
+            assert writer.flush()  # Several batches, so the size check runs between them
+    assert not writer.submit("answer_batch", _record(0))
+    assert writer.flush()
+
+    # The open segment is readable before it is closed
+    assert [r["query"] for r in iter_records(str(tmp_path), include_open=True)][-1] == "Question 299?"
+
+    writer.close()
+    paths = segment_paths(str(tmp_path))
+    assert len(paths) > 1
+    assert not any(name.endswith(".part") for name in os.listdir(tmp_path))
+    records = list(iter_records(str(tmp_path), route="answer"))
+    assert [r["query"] for r in records] == [f"Question {i}?" for i in range(300)]
+    assert writer.stats()["sampled_out"] == 1
+    assert list(iter_records(str(tmp_path), since=records[-1]["ts"] + 1)) == []
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    writer = AuditWriter(str(tmp_path), max_queue=2, start=False)  # Records stay queued
+    assert writer.submit("answer", _record(1))
+    assert writer.submit("answer", _record(2))
+    assert not writer.submit("answer", _record(3))
+    assert writer.stats()["dropped"] == 1
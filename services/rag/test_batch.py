@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.batch import BatchRunner, answered_ids, normalize_items, read_questions
+from services.rag.inference.scheduler import GenerationScheduler
+
+
+class _Manager:
+    is_available = True
+
+    def __init__(self):
+        self.scheduler = GenerationScheduler(4)
+        self.prompts = []
+
+    def generate(self, prompt, ticket=None, **kwargs):
+        assert ticket is not None and ticket.granted
+        self.prompts.append(prompt)
+        time.sleep(0.1)
+        return " Answer. "
+
+
+class _Engine:
+    """Engine without retrieval: prompts fall back to the bare question"""
+    fetch_simple_search = None
+    build_prompt_with_sources = None
+    answer_cache = None
+
+    def __init__(self):
+        self.model_mgr = _Manager()
+
+    def effective_max_tokens(self, requested):
+        return requested
+
+    def get_cached_answer(self, query, collection, num_results, **params):
+        return None, None
+
+    def extract_citations(self, answer, sources_meta):
+        return [], []
+
+
+def test_duplicates_share_one_generation_with_bounded_concurrency():
+    engine = _Engine()
+    items = normalize_items([f"Question {i % 8}" for i in range(16)] + ["  question 3 "])
+    start = time.perf_counter()
+    records = list(BatchRunner(engine, concurrency=4).run(items))
+    elapsed = time.perf_counter() - start
+
+    assert sorted(r["id"] for r in records) == sorted(item["id"] for item in items)
+    assert len(engine.model_mgr.prompts) == 8
+    assert all(r["answer"] == "Answer." for r in records)
+    assert sum(1 for r in records if r["shared_with"]) == 9
+    assert elapsed < 0.6  # 8 generations of 0.1s, 4 at a time
+
+
+def test_resume_skips_answered_ids(tmp_path):
+    questions = tmp_path / "questions.txt"
+    questions.write_text("First?\n\n{\"id\": \"q3\", \"query\": \"Third?\"}\nFourth?\n")
+    output = tmp_path / "answers.jsonl"
+    output.write_text(json.dumps({"id": "1", "answer": "a"}) + "\n"
+                      + json.dumps({"id": "q3", "error": "boom"}) + "\n" + '{"id": "4", "ans')
+
+    items = normalize_items(read_questions(str(questions)))
+    assert [item["id"] for item in items] == ["1", "q3", "4"]
+    assert answered_ids(str(output)) == {"1"}
@@ -0,0 +1,26 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.retrieval import CitationStreamParser, build_prompt_with_sources, extract_citations, source_previews
+
+
+def test_stream_parser_matches_buffered_citations():
+    sources = [{"index": 1, "id": "67-4", "collection": "code"}, {"index": 2, "id": "70-8", "collection": "code"}]
+    tokens = ["Setbacks are", " 25 feet [", "1", "]. Variances [2", "] need a hearing [1] [9]."]
+    parser = CitationStreamParser(sources)
+    emitted = [[c["marker"] for c in parser.feed(t)] for t in tokens]
+    # Each marker is reported once, on the token that completes it; [9] has no source
+    assert emitted == [[], [], [], [1], [2]]
+    citations, _ = extract_citations("".join(tokens), sources)
+    assert [c["marker"] for c in citations] == sorted(parser.seen)
+
+
+def test_source_previews_match_packed_numbering():
+    results = [{"collection": "code", "section": "67-4", "text": "Minor subdivisions."},
+               {"collection": "code", "id": "70-8", "text": "Setbacks."}]
+    _, sources_meta = build_prompt_with_sources("q", results, max_chunk_chars=100)
+    previews = source_previews(results)
+    assert [(p["index"], p["id"]) for p in previews] == [(s["index"], s["id"]) for s in sources_meta]
@@ -0,0 +1,90 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.context_packer import TokenCounter, allocate_budget, trim_to_tokens
+from services.rag.retrieval import build_prompt_with_sources
+
+
+def word_counter():
+    return TokenCounter(lambda text: len(text.split()), "words")
+
+
+def test_allocation_redistributes_unused_share():
+    # The short source needs 10 of its 50 share; the surplus goes to the long one
+    assert allocate_budget([10, 500], [1.0, 1.0], 100) == [10, 90]
+    assert allocate_budget([500, 500], [3.0, 1.0], 100) == [75, 25]
+
+
+def test_trim_cuts_at_sentence_boundary():
+    text = "One two three. Four five six. Seven eight nine."
+    trimmed, tokens = trim_to_tokens(text, 7, word_counter())
+    assert trimmed == "One two three. Four five six."
+    assert tokens == 6
+
+
+def test_prompt_fits_context_with_output_reserved():
+    counter = word_counter()
+    results = [
+        {"text": "Minor subdivisions create three lots or fewer. " * 200, "relevance": "0.9",
+         "collection": "la_plata_county_code", "section": "11"},
+        {"text": "Setbacks are measured from the property line. " * 200, "relevance": "0.5",
+         "collection": "la_plata_county_code", "section": "12"},
+    ]
+    prompt, sources_meta = build_prompt_with_sources(
+        "How many lots can a minor subdivision create?", results,
+        token_counter=counter, context_tokens=1500, reserve_tokens=500,
+    )
+    assert counter.count(prompt) <= 1000
+    assert [s["id"] for s in sources_meta] == ["11", "12"]
+    assert sources_meta[0]["tokens"] > sources_meta[1]["tokens"]
+    assert sources_meta[0]["truncated_chunk"].endswith(".")
+
+
+def test_prompt_shares_prefix_across_questions():
+    results = [{"collection": "la_plata_code", "id": "67-4", "text": "Setbacks are 25 feet."}]
+    first, _ = build_prompt_with_sources("What are the setbacks?", results, max_chunk_chars=500)
+    second, _ = build_prompt_with_sources("Who approves variances?", results, max_chunk_chars=500)
+    # Only the question block differs, and it comes last
+    assert (first.system, first.sources) == (second.system, second.sources)
+    assert first.endswith(first.question) and first.question.endswith("ANSWER:")
+    assert str(first).startswith(f"SYSTEM:\n{first.system}")
+
+
+def test_compression_keeps_relevant_spans_with_offsets():
+    from services.rag.compress import compress_results
+
+    text = (
+        "Sec. 67-4 Minor subdivisions\n"
+        "Minor subdivisions create three or fewer lots.\n"
+        + "Fences in residential zones may not exceed six feet in height.\n" * 20
+        + "A minor subdivision requires a final plat.\n"
+    )
+    result = {"text": text, "collection": "la_plata_county_code", "section": "11"}
+    [compressed] = compress_results("minor subdivision lots", [result], ratio=0.5, min_chars=100)
+
+    # The matching spans come first, even the last one; the rest fills up to the ratio
+    assert "final plat" in compressed["text"] and "three or fewer lots" in compressed["text"]
+    assert 0.4 <= compressed["compression"] <= 0.55
+    assert compressed["original_text"] == text
+    for start, end in compressed["spans"]:
+        assert text[start:end] in compressed["text"]
+
+    prompt, sources_meta = build_prompt_with_sources("q", [compressed], max_chunk_chars=10000)
+    assert sources_meta[0]["chunk"] == text
+    assert sources_meta[0]["spans"] == compressed["spans"]
+
+
+def test_compression_keeps_sources_without_matching_spans():
+    from services.rag.compress import compress_results
+
+    text = (
+        "Sec. 67-4 Accessory dwelling units.\n"
+        + "An accessory dwelling unit may be attached to or detached from the principal dwelling.\n" * 20
+    )
+    result = {"text": text, "collection": "la_plata_county_code", "section": "67-4"}
+    # A paraphrase sharing no terms with the text: nothing to rank spans by
+    [kept] = compress_results("Can I build a granny flat behind my house?", [result], ratio=0.5, min_chars=100)
+    assert kept is result
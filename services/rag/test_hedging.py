@@ -0,0 +1,151 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.inference.hedging import ProviderHedger
+from services.rag.providers.base import LLMProvider
+
+
+class _ScriptedProvider(LLMProvider):
+    """Stand-in provider: waits `ttft` seconds, then streams `tokens` (or raises `error`)."""
+
+    def __init__(self, name, ttft, tokens=("a", "b"), error=None):
+        self.name = name
+        self.ttft = ttft
+        self.tokens = tokens
+        self.error = error
+        self.closed = threading.Event()
+
+    def describe(self):
+        return f"scripted:{self.name}"
+
+    def is_available(self):
+        return True
+
+    def generate(self, messages, **kwargs):
+        return "".join(self.stream_generate(messages, **kwargs))
+
+    def stream_generate(self, messages, **kwargs):
+        try:
+            time.sleep(self.ttft)
+            if self.error:
+                raise self.error
+            for token in self.tokens:
+                yield token
+        finally:
+            self.closed.set()
+
+    async def astream_generate(self, messages, **kwargs):
+        await asyncio.sleep(self.ttft)
+        if self.error:
+            raise self.error
+        for token in self.tokens:
+            yield token
+
+
+def _hedger(*providers, sla=0.05):
+    return ProviderHedger(OrderedDict((p.name, p) for p in providers), ttft_sla=sla, recovery_sec=60)
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = _hedger(_ScriptedProvider("local", 0.0, ("x",)), _ScriptedProvider("staging", 0.0, ("y",)))
+    assert list(hedger.stream("q")) == ["x"]
+    assert hedger.hedged == 0
+
+
+def test_slow_primary_is_hedged_cancelled_and_demoted():
+    slow = _ScriptedProvider("local", 0.5, ("slow",))
+    fast = _ScriptedProvider("staging", 0.0, ("fast", "!"))
+    hedger = _hedger(slow, fast)
+    start = time.monotonic()
+    assert list(hedger.stream("q")) == ["fast", "!"]
+    assert time.monotonic() - start < 0.4
+    assert hedger.hedged == 1
+    assert slow.closed.wait(2)  # Loser's stream was closed
+    # Adaptive routing: the slow provider now goes second
+    assert hedger.order() == ["staging", "local"]
+
+
+def test_failover_before_first_token():
+    hedger = _hedger(_ScriptedProvider("local", 0.0, error=RuntimeError("down")),
+                     _ScriptedProvider("staging", 0.0, ("ok",)), sla=10)
+    assert list(hedger.stream("q")) == ["ok"]
+    assert hedger.failovers == 1
+
+    failing = _hedger(_ScriptedProvider("local", 0.0, error=RuntimeError("down")))
+    with pytest.raises(RuntimeError):
+        list(failing.stream("q"))
+
+
+def test_async_hedging():
+    async def collect(hedger):
+        return [chunk async for chunk in hedger.astream("q")]
+
+    hedger = _hedger(_ScriptedProvider("local", 0.5, ("slow",)), _ScriptedProvider("staging", 0.0, ("fast",)))
+    assert asyncio.run(collect(hedger)) == ["fast"]
+    assert hedger.stats()["providers"]["staging"]["wins"] == 1
+    assert hedger.stats()["providers"]["local"]["cancelled"] == 1
+
+
+class _GatedProvider(_ScriptedProvider):
+    """Async stand-in whose first token waits for a shared gate, so lanes finish in the same wait."""
+
+    def __init__(self, name, gate, tokens=("a", "b"), error=None):
+        super().__init__(name, 0.0, tokens, error)
+        self.gate = gate
+
+    async def astream_generate(self, messages, **kwargs):
+        await self.gate.wait()
+        if self.error:
+            raise self.error
+        for token in self.tokens:
+            yield token
+
+
+def _race_together(primary, secondary):
+    """Stream with both lanes started, then release them at once."""
+    async def run():
+        gate = asyncio.Event()
+        hedger = _hedger(*(cls(name, gate, **kwargs) for cls, name, kwargs in (primary, secondary)), sla=0.01)
+
+        async def release():
+            await asyncio.sleep(0.05)  # Past the SLA, so the hedge lane is racing too
+            gate.set()
+
+        releaser = asyncio.ensure_future(release())
+        chunks = [chunk async for chunk in hedger.astream("q")]
+        await releaser
+        return chunks, hedger
+
+    return asyncio.run(run())
+
+
+def test_async_lanes_finishing_together_do_not_splice():
+    chunks, hedger = _race_together((_GatedProvider, "local", {"tokens": ("L1", "L2")}),
+                                    (_GatedProvider, "staging", {"tokens": ("S1", "S2")}))
+    assert chunks == ["L1", "L2"]  # The preferred lane wins the tie
+    assert hedger.hedged == 1
+
+    chunks, _ = _race_together((_GatedProvider, "local", {"tokens": ("S1", "S2")}),
+                               (_GatedProvider, "staging", {"tokens": ()}))
+    assert chunks == ["S1", "S2"]  # The empty stream lost the tie and does not end the answer
+
+
+def test_async_winner_survives_a_lane_failing_in_the_same_wait():
+    chunks, hedger = _race_together((_GatedProvider, "local", {"tokens": ("S1", "S2")}),
+                                    (_GatedProvider, "staging", {"error": RuntimeError("down")}))
+    assert chunks == ["S1", "S2"]
+    assert hedger.failovers == 0
+
+    chunks, hedger = _race_together((_GatedProvider, "local", {"error": RuntimeError("down")}),
+                                    (_GatedProvider, "staging", {"tokens": ("S1", "S2")}))
+    assert chunks == ["S1", "S2"]
+    assert hedger.stats()["providers"]["local"]["errors"] == 1
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import sys
+
+import pytest
+import requests
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag import http_client
+from services.rag.config import Config
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _Session:
+    """Stand-in for the pooled session: replays `outcomes` (status codes or exceptions)"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls.append((method, timeout))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _Response(outcome)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    def install(*outcomes):
+        stub = _Session(*outcomes)
+        monkeypatch.setattr(http_client, "get_session", lambda: stub)
+        return stub
+
+    monkeypatch.setattr(http_client, "_backoff_delay", lambda attempt: 0.0)
+    monkeypatch.setattr(Config, "SEARCH_HTTP_RETRIES", 2)
+    return install
+
+
+def test_retries_only_gateway_statuses(session):
+    stub = session(503, 502, 200)
+    assert http_client.request("GET", "http://search/simple").status_code == 200
+    assert len(stub.calls) == 3
+
+    stub = session(500)
+    assert http_client.request("GET", "http://search/simple").status_code == 500
+    assert len(stub.calls) == 1
+
+    # Retries exhausted: the last response is returned for the caller to raise on
+    stub = session(503, 503, 503)
+    assert http_client.request("GET", "http://search/simple").status_code == 503
+    assert len(stub.calls) == 3
+
+
+def test_non_idempotent_requests_are_not_retried(session):
+    stub = session(503)
+    assert http_client.request("POST", "http://search/embed").status_code == 503
+    assert len(stub.calls) == 1
+
+    stub = session(requests.ConnectionError("refused"))
+    with pytest.raises(requests.ConnectionError):
+        http_client.request("POST", "http://search/embed")
+    assert len(stub.calls) == 1
+
+    # Read-only POSTs opt in
+    stub = session(requests.ConnectionError("refused"), 200)
+    assert http_client.request("POST", "http://search/simple/batch", idempotent=True).status_code == 200
+    assert len(stub.calls) == 2
+
+
+def test_total_deadline_bounds_attempts_and_backoff(session, monkeypatch):
+    stub = session(200)
+    http_client.request("GET", "http://search/simple", attempt_timeout=20, total_deadline=0.5)
+    assert stub.calls[0][1] <= 0.5  # Attempt timeout clamped to the time left
+
+    # A backoff that would end past the deadline gives up instead of sleeping
+    monkeypatch.setattr(http_client, "_backoff_delay", lambda attempt: 5.0)
+    stub = session(requests.Timeout("slow"), 200)
+    with pytest.raises(requests.Timeout, match="Deadline exceeded"):
+        http_client.request("GET", "http://search/simple", total_deadline=1.0)
+    assert len(stub.calls) == 1
+
+
+def test_backoff_is_full_jitter_under_the_cap(monkeypatch):
+    monkeypatch.setattr(Config, "SEARCH_HTTP_BACKOFF", 0.1)
+    monkeypatch.setattr(Config, "SEARCH_HTTP_BACKOFF_MAX", 1.0)
+    bounds = []
+    monkeypatch.setattr(http_client.random, "uniform", lambda low, high: bounds.append((low, high)) or high)
+    for attempt in range(6):
+        http_client._backoff_delay(attempt)
+    assert bounds == [(0, 0.1), (0, 0.2), (0, 0.4), (0, 0.8), (0, 1.0), (0, 1.0)]
+
+
+def test_async_requests_retry_and_clients_close(monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    monkeypatch.setattr(http_client, "_backoff_delay", lambda attempt: 0.0)
+    monkeypatch.setattr(Config, "SEARCH_HTTP_RETRIES", 2)
+    statuses = [503, 200]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0))
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        http_client._async_clients[asyncio.get_running_loop()] = client
+        assert http_client.get_async_client() is client  # One pooled client per loop
+        resp = await http_client.arequest("GET", "http://search/simple")
+        await http_client.aclose_async_clients()
+        after = http_client.get_async_client()
+        await http_client.aclose_async_clients()
+        return resp, client, after
+
+    resp, client, after = asyncio.run(run())
+    assert resp.status_code == 200 and not statuses
+    assert client.is_closed
+    assert after is not client
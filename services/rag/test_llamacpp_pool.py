@@ -0,0 +1,100 @@
+import os
+import sys
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.providers.llamacpp_pool import LlamaCppPool
+
+_URLS = ["http://a:8003/v1", "http://b:8003/v1", "http://c:8003/v1"]
+
+
+def _pool(**kwargs):
+    return LlamaCppPool(_URLS, lambda url: None, **kwargs)
+
+
+def test_least_outstanding_without_affinity():
+    pool = _pool()
+    with pool.lease() as first, pool.lease() as second, pool.lease() as third:
+        assert len({first.backend.base_url, second.backend.base_url, third.backend.base_url}) == 3
+    assert all(b.in_flight == 0 for b in pool.backends)
+
+
+def test_prefix_affinity_yields_to_load():
+    pool = _pool(affinity_slack=1)
+    key = pool.affinity_key("system\x00sources")
+    with pool.lease(key) as a, pool.lease(key) as b, pool.lease(key) as c:
+        assert a.backend is b.backend  # Same prefix, same server
+        assert c.backend is not a.backend  # Two in flight there vs. none elsewhere
+    assert pool.stats()["affinity_misses"] == 1
+
+
+def test_failing_backend_is_ejected_and_all_out_still_routes():
+    pool = _pool(eject_failures=2, eject_sec=60)
+    key = pool.affinity_key("prefix")
+    target = pool.choose(key)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with pool.lease(key):
+                raise RuntimeError("connection refused")
+    assert pool.choose(key) is not target
+    assert [b["ejected_for_sec"] is not None for b in pool.stats()["backends"]].count(True) == 1
+
+    assert not pool.probe(lambda backend: False)
+    assert pool.choose(key) in pool.backends  # Nothing healthy: still route somewhere
+
+
+def test_token_count_estimates_are_not_cached(monkeypatch):
+    from services.rag import http_client
+    from services.rag.context_packer import TokenCounter
+    from services.rag.providers.local_llamacpp import LocalLlamaCppProvider
+
+    calls = []
+
+    class _Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"tokens": [1, 2]}
+
+    def request(method, url, **kwargs):
+        calls.append(url)
+        if len(calls) == 1:
+            raise http_client.requests.ConnectionError("down")
+        return _Response()
+
+    monkeypatch.setattr(http_client, "request", request)
+    counter = TokenCounter(LocalLlamaCppProvider(base_url=_URLS[0]).count_tokens)
+    assert counter.count("seven characters") == 5  # Estimate while the server is down
+    assert counter.count("seven characters") == 2  # Asked again, now the tokenizer's count
+    assert counter.count("seven characters") == 2
+    assert calls == ["http://a:8003/tokenize"] * 2
+
+
+def test_tokenize_uses_a_usable_backend(monkeypatch):
+    from services.rag import http_client
+    from services.rag.providers.local_llamacpp import LocalLlamaCppProvider
+
+    calls = []
+
+    class _Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"tokens": [1, 2]}
+
+    def request(method, url, **kwargs):
+        calls.append(url)
+        return _Response()
+
+    monkeypatch.setattr(http_client, "request", request)
+    provider = LocalLlamaCppProvider(base_urls=_URLS)
+    provider.pool.probe(lambda backend: backend.base_url != _URLS[0])  # First server down
+    with provider.pool.lease() as busy:
+        assert busy.backend.base_url == _URLS[1]
+        assert provider.count_tokens("seven characters") == 2
+    assert calls == ["http://c:8003/tokenize"]  # Neither the down server nor the busy one
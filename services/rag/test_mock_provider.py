@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.providers.factory import LLMProviderFactory
+from services.rag.providers.mock import MockProvider
+from services.rag.retrieval import build_prompt_with_sources
+
+_RESULTS = [
+    {"id": "67-4", "collection": "la_plata_county_code", "text": "Setbacks shall be 25 feet from the right-of-way. Other rules apply."},
+    {"id": "67-5", "collection": "la_plata_county_code", "text": "Fences may not exceed six feet in height."},
+]
+
+
+def _messages(provider):
+    prompt, _ = build_prompt_with_sources("What are the setbacks?", _RESULTS, max_chunk_chars=500)
+    return provider.to_messages(prompt)
+
+
+def test_answer_is_deterministic_and_cites_the_prompt_sources():
+    provider = MockProvider(ttft_ms=0, token_delay_ms=0, output_tokens=18)
+    first = provider.generate(_messages(provider))
+    assert first == provider.generate(_messages(provider))
+    assert first.startswith("According to 67-4, Setbacks shall be 25 feet from the right-of-way [1]. "
+                            "According to 67-5, Fences")
+    assert provider.count_tokens(first) == 18
+    assert provider.count_tokens(provider.generate(_messages(provider), max_tokens=5)) == 5
+
+
+def test_injected_failures():
+    before = MockProvider(ttft_ms=0, token_delay_ms=0, failure_rate=1.0)
+    with pytest.raises(RuntimeError):
+        next(iter(before.stream_generate(_messages(before))))
+
+    midway = MockProvider(ttft_ms=0, token_delay_ms=0, output_tokens=10, stream_failure_rate=1.0)
+    received = []
+    with pytest.raises(RuntimeError):
+        for chunk in midway.stream_generate(_messages(midway)):
+            received.append(chunk)
+    assert 1 <= len(received) < 10
+
+
+def test_factory_selects_mock_only_explicitly():
+    assert isinstance(LLMProviderFactory.get_provider("mock"), MockProvider)
+    assert "mock" not in LLMProviderFactory._SUPPORTED_ENVIRONMENTS
+
+
+def test_mock_server_serves_local_llamacpp_provider():
+    pytest.importorskip("langchain_openai")
+    from werkzeug.serving import make_server
+    from services.rag.providers.local_llamacpp import LocalLlamaCppProvider
+    from services.rag.providers.mock_server import create_mock_server
+
+    server = make_server("127.0.0.1", 0, create_mock_server(MockProvider(ttft_ms=10, token_delay_ms=1, output_tokens=12)),
+                         threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        provider = LocalLlamaCppProvider(base_url=f"http://127.0.0.1:{server.server_port}/v1")
+        chunks = list(provider.stream_generate(_messages(provider)))
+        assert len(chunks) == 12
+        assert "".join(chunks).startswith("According to 67-4,")
+        assert provider.generate(_messages(provider)) == "".join(chunks)
+        assert provider.count_tokens("three word text") == 3  # Server /tokenize
+    finally:
+        server.shutdown()
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.providers.health import ProviderHealthMonitor
+
+
+class _FakeProvider:
+    def __init__(self, healthy=True):
+        self.healthy = healthy
+        self.probes = 0
+
+    def describe(self):
+        return "fake:model"
+
+    def is_available(self):
+        self.probes += 1
+        return self.healthy
+
+
+def test_availability_is_cached_between_probes():
+    monitor = ProviderHealthMonitor(interval=3600)
+    provider = _FakeProvider()
+    key = monitor.watch(provider, probe=True, env="local")
+    for _ in range(100):
+        assert monitor.is_available(key)
+    assert provider.probes == 1
+    assert monitor.environment_status("local")["available"]
+    assert monitor.environment_status("staging") is None
+    monitor.stop()
+
+
+def test_breaker_opens_and_recovers_after_reset():
+    monitor = ProviderHealthMonitor(interval=3600, failure_threshold=2, reset_timeout=0.05)
+    key = monitor.watch(_FakeProvider(), probe=True)
+    monitor.record_failure(key, RuntimeError("boom"))
+    assert monitor.is_available(key)
+    monitor.record_failure(key, RuntimeError("boom"))
+    assert not monitor.is_available(key)
+    assert monitor.status(key)["circuit"]["state"] == "open"
+
+    time.sleep(0.06)
+    assert monitor.status(key)["circuit"]["state"] == "half_open"
+    assert monitor.is_available(key)
+    monitor.record_failure(key, RuntimeError("still down"))  # One failure re-opens a half-open circuit
+    assert not monitor.is_available(key)
+
+    time.sleep(0.06)
+    monitor.record_success(key)
+    assert monitor.status(key)["circuit"]["state"] == "closed"
+    monitor.stop()
@@ -0,0 +1,57 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag import timing
+from services.rag.batch import normalize_items
+from services.rag.replay import compare_runs, replay_in_process
+from services.rag.retrieval import fallback_prompt
+
+
+def test_in_process_replay_times_every_stage(rag_engine):
+    item = normalize_items([{"id": "q1", "query": "Setbacks?", "num_results": 3}])[0]
+    record = replay_in_process(rag_engine, item)
+
+    assert record["error"] is None
+    totals = record["totals"]
+    for name in ("normalize", "expansion", "rerank", "prompt_build", "queue", "ttft", "generation"):
+        assert totals[name]["count"] == 1
+    assert totals["retrieval"]["count"] == 2  # One per variation, recorded from worker threads
+    assert record["ttft_ms"] >= 50
+    assert record["tokens_per_sec"] > 0
+    assert record["sources"] == ["setbacks?-0", "setbacks?-1", "setbacks?-2"]
+    assert timing.current() is None
+
+
+def test_replay_without_results_sends_the_fallback_prompt(rag_engine):
+    rag_engine.retrieval_backend.search = lambda query, collection=None, num_results=5: {"results": []}
+    prompts = []
+    stream_generate = rag_engine.model_mgr.stream_generate
+    rag_engine.model_mgr.stream_generate = lambda prompt, **kwargs: prompts.append(prompt) or stream_generate(prompt, **kwargs)
+
+    record = replay_in_process(rag_engine, normalize_items([{"id": "q1", "query": "Setbacks?"}])[0])
+
+    assert record["error"] is None
+    assert prompts == [fallback_prompt("Setbacks?")]
+    assert record["sources"] == []
+    assert "prompt_build" not in record["totals"]
+
+
+def test_compare_reports_stage_changes_and_source_overlap():
+    def run(retrieval_ms, sources):
+        return [{"id": str(i), "error": None, "total_ms": 100.0 + retrieval_ms, "sources": sources,
+                 "totals": {"retrieval": {"count": 2, "total_ms": retrieval_ms, "max_ms": retrieval_ms}}}
+                for i in range(5)] + [{"id": "failed", "error": "boom", "sources": []}]
+
+    report = compare_runs(run(40.0, ["a", "b"]), run(20.0, ["a", "c"]))
+
+    assert report["compared"] == 5
+    assert report["baseline_errors"] == 1
+    retrieval = report["metrics"]["retrieval_ms"]
+    assert retrieval["p50_delta"] == -20.0
+    assert retrieval["p50_change_pct"] == -50.0
+    assert report["metrics"]["retrieval_calls"]["p50_delta"] == 0
+    assert report["sources"]["mean_overlap"] == round(1 / 3, 3)
+    assert report["sources"]["same_top_source"] == 1.0
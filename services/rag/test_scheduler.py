@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.inference.scheduler import GenerationScheduler, QueueFullError
+
+
+def test_limit_queue_and_retry_after():
+    scheduler = GenerationScheduler(max_concurrency=1, max_queue=2, max_queue_per_client=2)
+    running = scheduler.enqueue("a")
+    assert running.granted
+    waiting = [scheduler.enqueue("b"), scheduler.enqueue("c")]
+    assert [t.position for t in waiting] == [1, 2]
+    with pytest.raises(QueueFullError) as e:
+        scheduler.enqueue("d")
+    assert e.value.retry_after >= 1
+
+    running.release()
+    assert waiting[0].granted and waiting[1].position == 1
+    assert scheduler.stats()["queue_depth"] == 1
+
+
+def test_round_robin_across_clients():
+    scheduler = GenerationScheduler(max_concurrency=1, max_queue=10, max_queue_per_client=5)
+    running = scheduler.enqueue("busy")
+    burst = [scheduler.enqueue("busy") for _ in range(3)]
+    other = scheduler.enqueue("other")
+    # The other client's single request goes second, not behind the whole burst
+    assert other.position == 2
+
+    order = []
+    for _ in range(4):
+        running.release()
+        running = next(t for t in burst + [other] if t.granted and not t.released)
+        order.append(running.client_id)
+    assert order == ["busy", "other", "busy", "busy"]
+
+
+def test_abandoned_ticket_leaves_queue():
+    scheduler = GenerationScheduler(max_concurrency=1, max_queue=4)
+    running = scheduler.enqueue("a")
+    gave_up = scheduler.enqueue("b")
+    assert not gave_up.wait(0.01)
+    gave_up.release()
+    later = scheduler.enqueue("c")
+    running.release()
+    assert later.granted and not gave_up.granted
+    assert scheduler.stats()["abandoned"] == 1
@@ -0,0 +1,80 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.section_index import SectionIndex, normalize_reference
+from services.rag.retrieval import expand_query_with_references
+from services.rag.xref_graph import XrefGraph, extract_citations
+
+DOCUMENTS = {
+    "10": "Chapter 67 Division of Land\nContents:\nSec. 67-1 Purpose\nSec. 67-4 Minor subdivisions\n",
+    "11": "Chapter 67 Division of Land\nSec. 67-4 Minor subdivisions\nA minor subdivision creates no more than three lots.",
+    "12": "Chapter 66 Permits\nSec. 66-11 Review\nApplications are reviewed pursuant to section 67-4.",
+}
+
+
+class FakeBackend:
+    def __init__(self):
+        self.fetched = []
+        self.searched = []
+
+    def get_documents(self, ids, *, collection):
+        self.fetched.append(list(ids))
+        return [{"text": DOCUMENTS[i], "relevance": "N/A", "collection": collection, "section": i} for i in ids]
+
+    def search(self, query, *, collection, num_results):
+        self.searched.append(query)
+        return {"results": []}
+
+
+def test_normalize_reference():
+    assert normalize_reference("Section 67.4") == "67-4"
+    assert normalize_reference(" Chapter 67 ") == "67"
+
+
+def test_section_with_body_ranks_before_listing():
+    index = SectionIndex.build(DOCUMENTS)
+    assert index.resolve("67-4", limit=2) == ["11", "10"]
+    assert index.resolve("66-11") == ["12"]
+    assert index.resolve("99-1") == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = SectionIndex.build(DOCUMENTS)
+    path = str(tmp_path / "section_index.json")
+    index.save(path)
+    loaded = SectionIndex.load(path)
+    assert loaded.version == index.version
+    assert loaded.resolve("67-4") == index.resolve("67-4")
+
+
+def test_expansion_fetches_resolved_sections_in_bulk():
+    index = SectionIndex.build(DOCUMENTS)
+    backend = FakeBackend()
+    initial = [{"text": DOCUMENTS["12"], "relevance": "0.700", "collection": "la_plata_county_code", "section": "12"}]
+
+    results = expand_query_with_references("review", initial, backend=backend, section_index=index)
+
+    assert [r["section"] for r in results] == ["12", "11"]
+    assert backend.fetched == [["11"]]
+    assert backend.searched == []
+
+
+def test_citations_skip_state_law_and_headings():
+    text = "Chapter 66\nSec. 66-11 Review\nPursuant to C.R.S. § 30-28-101 and § 18-31 et seq.; see section 70-8; ch. 22.\n"
+    assert extract_citations(text) == [("18-31", 2), ("70-8", 0), ("22", 3)]
+
+
+def test_graph_expansion_follows_citations():
+    index = SectionIndex.build(DOCUMENTS)
+    graph = XrefGraph.build(DOCUMENTS, index)
+    assert graph.neighbors("12") == [("11", "directive")]
+    assert graph.expand(["12"], "minor subdivisions") == ["11"]
+    assert graph.expand(["99"], "anything") == []
+
+    backend = FakeBackend()
+    initial = [{"text": DOCUMENTS["12"], "relevance": "0.700", "collection": "la_plata_county_code", "section": "12"}]
+    results = expand_query_with_references("review", initial, backend=backend, section_index=index, xref_graph=graph)
+    assert [r["section"] for r in results] == ["12", "11"]
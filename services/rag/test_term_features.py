@@ -0,0 +1,51 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag.retrieval import auto_cite_answer, rerank_results
+from services.rag.verify import verify_answer_support
+from services.search.term_features import TermFeatures
+
+_DOCS = {
+    "67-4": "Minor subdivisions require a sketch plan and a final plat.",
+    "67-5": "Minor subdivisions require a sketch plan and a final plat review.",
+    "66-11": "Fences over six feet require a building permit.",
+    "70-2": "Setbacks from county roads are thirty feet in the agricultural district.",
+    "70-3": "",
+}
+
+
+def _results(features=None):
+    results = [{"section": doc_id, "text": text, "relevance": "0.500", "collection": "code"}
+               for doc_id, text in _DOCS.items()]
+    if features is not None:
+        for r in results:
+            r["terms"] = features.payload(r["section"], r["text"])
+    return results
+
+
+def test_rerank_with_precomputed_features_matches_tokenizing(tmp_path):
+    built = TermFeatures.build("code", "v1", _DOCS.items())
+    built.save(str(tmp_path / "code-v1.npz"))
+    features = TermFeatures.load_or_build(None, "code", "v1", directory=str(tmp_path))  # Loaded, not rebuilt
+
+    query = "minor subdivision sketch plan"
+    ranked = [r["section"] for r in rerank_results(query, _results(features), top_k=3)]
+    assert ranked == [r["section"] for r in rerank_results(query, _results(), top_k=3)]
+    assert ranked[0] in ("67-4", "67-5") and not {"67-4", "67-5"} <= set(ranked)  # Near-duplicate dropped
+    assert rerank_results(query, [], top_k=3) == []
+
+
+def test_citation_matching_scores_each_line_against_every_source():
+    sources = [{"index": 1, "truncated_chunk": _DOCS["66-11"]}, {"index": 2, "truncated_chunk": _DOCS["70-2"]}]
+    answer = "Fences over six feet need a building permit.\nRoad setbacks are thirty feet [2]\n\nUnrelated text."
+
+    cited, citations, _ = auto_cite_answer(answer, sources)
+    assert cited.split("\n") == ["Fences over six feet need a building permit. [1]",
+                                 "Road setbacks are thirty feet [2]", "", "Unrelated text."]
+    assert [c["marker"] for c in citations] == [1, 2]
+
+    _, report = verify_answer_support(answer, sources)
+    assert [(d["best_marker"], d["supported"]) for d in report["details"]] == [(1, True), (None, True), (None, False)]
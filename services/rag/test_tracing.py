@@ -0,0 +1,53 @@
+import json
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rag import timing, tracing
+
+
+def test_untraced_request_records_nothing(rag_engine):
+    trace = tracing.Trace("rag.answer", sampled=False, requested=False)
+    with trace.active():
+        assert timing.current() is None
+        rag_engine.enhanced_retrieval_with_normalization("Setbacks?", num_results=3)
+    with trace.span("queue") as span:
+        span["granted"] = True
+    trace.finish()
+
+    assert trace.response_timings() == {}
+    assert trace.attributes == {}
+
+
+def test_requested_timings_cover_engine_and_handler_stages(rag_engine):
+    trace = tracing.Trace("rag.answer", sampled=False, requested=True, collection="code")
+    with trace.active():
+        results, _, _ = rag_engine.enhanced_retrieval_with_normalization("Setbacks?", num_results=3)
+        _, sources_meta = rag_engine.build_prompt("Setbacks?", results, 256)
+    trace.set_sources(sources_meta)
+    with trace.span("citations") as span:
+        span["citations"] = 2
+
+    block = trace.response_timings()["timings"]
+    assert len(block["trace_id"]) == 16
+    assert block["totals"]["retrieval"]["count"] == 2
+    for name in ("normalize", "expansion", "rerank", "prompt_build", "citations"):
+        assert block["totals"][name]["count"] == 1
+    assert trace.attributes["sources"] == ["setbacks?-0", "setbacks?-1", "setbacks?-2"]
+    assert timing.current() is None
+
+
+def test_exporter_drops_when_full_and_writes_jsonl(tmp_path):
+    path = tmp_path / "traces" / "traces.jsonl"
+    exporter = tracing.TraceExporter("file", str(path), max_queue=2, start=False)  # Traces stay queued
+    assert exporter.export({"trace_id": "a"})
+    assert exporter.export({"trace_id": "b"})
+    assert not exporter.export({"trace_id": "c"})
+    assert exporter.stats()["dropped"] == 1
+
+    exporter.start()
+    assert exporter.flush()
+    assert [json.loads(line)["trace_id"] for line in path.read_text().splitlines()] == ["a", "b"]
+    assert exporter.stats()["exported"] == 2
@@ -0,0 +1,136 @@
+"""Per-request stage timings for the RAG pipeline.
+
+RAGEngine marks its stages (normalize, each retrieval call, expansion,
+rerank, compress, prompt_build) with `stage()`. Nothing is recorded unless
+the caller opened a recording with `record()` (replay) or `activate()`
+(request tracing, see tracing.py), so for untraced requests each stage costs
+one context-variable lookup:
+
+    with timing.record() as timings:
+        results, used_query, info = rag_engine.enhanced_retrieval_with_normalization(query)
+    timings.as_dict()
+
+Recordings follow the request into asyncio tasks and `asyncio.to_thread`
+(both copy context variables). Work submitted to a ThreadPoolExecutor does
+not inherit context variables: wrap the callable with `bind()`.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_current: "contextvars.ContextVar[Optional[StageTimings]]" = contextvars.ContextVar("rag_stage_timings", default=None)
+
+
+class StageTimings:
+    """Stages recorded for one request, in completion order.
+
+    Stages may repeat (one "retrieval" per search call) and may finish in
+    worker threads.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, ms: float, start_ms: Optional[float] = None, **attrs) -> None:
+        """Record a stage that took `ms` milliseconds, starting `start_ms` into the request."""
+        entry = {"name": name, "ms": round(ms, 2)}
+        if start_ms is not None:
+            entry["start_ms"] = round(start_ms, 2)
+        entry.update(attrs)
+        with self._lock:
+            self.stages.append(entry)
+
+    @contextmanager
+    def stage(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """Time the block as stage `name`.
+
+        Yields the attribute dict, so the block can add attributes it only
+        knows at the end (result counts). A block that raises is recorded
+        with `error` set.
+        """
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            self.add(name, (end - start) * 1000, start_ms=(start - self.started_at) * 1000, **attrs)
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        """Stage name -> {"count", "total_ms", "max_ms"}"""
+        totals: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            stages = list(self.stages)
+        for entry in stages:
+            total = totals.setdefault(entry["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            total["count"] += 1
+            total["total_ms"] = round(total["total_ms"] + entry["ms"], 2)
+            total["max_ms"] = max(total["max_ms"], entry["ms"])
+        return totals
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = list(self.stages)
+        return {"stages": stages, "totals": self.totals()}
+
+
+@contextmanager
+def record() -> Iterator[StageTimings]:
+    """Record the stages run in this context (and tasks or bound callables it starts)."""
+    with activate(StageTimings()) as timings:
+        yield timings
+
+
+@contextmanager
+def activate(timings: Optional[StageTimings]) -> Iterator[Optional[StageTimings]]:
+    """Record onto an existing `timings` (None records nothing) for the block.
+
+    Used where one request's stages run in separate steps, such as a
+    streaming response. The block must not span a `yield` of a generator.
+    """
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[StageTimings]:
+    """The active recording, or None"""
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """Time the block on the active recording; a no-op without one."""
+    timings = _current.get()
+    if timings is None:
+        yield attrs
+        return
+    with timings.stage(name, **attrs) as attrs:
+        yield attrs
+
+
+def bind(fn: Callable) -> Callable:
+    """Wrap `fn` to record onto the caller's active recording when run in another thread."""
+    timings = _current.get()
+    if timings is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        token = _current.set(timings)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return bound
@@ -0,0 +1,221 @@
+"""Structured per-request tracing for the RAG endpoints.
+
+Each /rag/answer and /rag/answer/stream request gets a Trace. A trace has
+request attributes (collection, provider, cache outcome, source ids, prompt
+and output token counts) and one span per stage:
+
+- cache_lookup, queue, ttft, generation and citations, from the handlers
+- normalize, retrieval (one per search call), expansion, rerank, compress and
+  prompt_build, from RAGEngine through timing.py
+
+Only some requests are traced. TRACE_SAMPLE_RATE of them are exported. A
+client can also ask for its own request's trace by sending `"timings": true`
+(or `?timings=true`); the response then carries a `timings` block. Other
+requests record nothing.
+
+Exported traces go onto a bounded queue that a background thread writes out
+as JSON lines, to the "rag.trace" logger or to TRACE_FILE. Requests never
+wait on the exporter; when the queue is full, traces are dropped and counted.
+With TRACE_CAPTURE_PROMPTS on, TRACE_CAPTURE_SAMPLE_RATE of the exported
+traces also carry the full prompt and answer text.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import timing
+from .background_writer import BackgroundWriter, process_singleton
+from .config import Config
+
+_trace_logger = logging.getLogger("rag.trace")
+
+_EXPORT_BATCH = 100
+
+
+class Trace:
+    """One request's spans and attributes.
+
+    A trace that is neither sampled nor requested is disabled: every method
+    is a cheap no-op, and `active()` leaves RAGEngine stages unrecorded.
+    """
+
+    def __init__(self, name: str, sampled: bool, requested: bool, capture: bool = False, **attributes):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.sampled = sampled
+        self.requested = requested
+        self.enabled = sampled or requested
+        self.capture_text = capture and sampled
+        self.started = time.time()
+        self.attributes: Dict[str, Any] = dict(attributes) if self.enabled else {}
+        self.captured: Dict[str, str] = {}
+        self.timings = timing.StageTimings() if self.enabled else None
+        self._finished = False
+
+    @contextmanager
+    def active(self) -> Iterator[None]:
+        """Record RAGEngine stages run in the block onto this trace"""
+        with timing.activate(self.timings):
+            yield
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """Time the block as span `name`; yields its attribute dict"""
+        if self.timings is None:
+            yield attrs
+            return
+        with self.timings.stage(name, **attrs) as attrs:
+            yield attrs
+
+    def now_ms(self) -> Optional[float]:
+        """Milliseconds since the trace started (start offset for `add`)"""
+        if self.timings is None:
+            return None
+        return (time.perf_counter() - self.timings.started_at) * 1000
+
+    def add(self, name: str, ms: float, start_ms: Optional[float] = None, **attrs) -> None:
+        """Record a span timed by the caller (one that spans yields of a stream)"""
+        if self.timings is not None:
+            self.timings.add(name, ms, start_ms=start_ms, **attrs)
+
+    def set(self, **attributes) -> None:
+        if self.enabled:
+            self.attributes.update(attributes)
+
+    def set_sources(self, sources_meta: List[Dict[str, Any]]) -> None:
+        """Source ids and packed prompt tokens from `build_prompt`'s metadata"""
+        if not self.enabled:
+            return
+        self.attributes["sources"] = [s.get("id") for s in sources_meta]
+        tokens = [s["tokens"] for s in sources_meta if s.get("tokens") is not None]
+        if tokens:
+            self.attributes["source_tokens"] = sum(tokens)
+
+    def generation(self, started: float, first: Optional[float], ended: float, chunks: int) -> None:
+        """ttft and generation spans from perf_counter() stamps; chunks approximate output tokens"""
+        if self.timings is None:
+            return
+        start_ms = (started - self.timings.started_at) * 1000
+        if first is not None:
+            self.timings.add("ttft", (first - started) * 1000, start_ms=start_ms)
+        self.timings.add("generation", (ended - started) * 1000, start_ms=start_ms, chunks=chunks)
+        self.attributes["output_tokens"] = chunks
+
+    def capture(self, prompt=None, response: Optional[str] = None) -> None:
+        """Keep prompt and answer text, for traces selected for prompt capture only"""
+        if not self.capture_text:
+            return
+        if prompt is not None:
+            self.captured["prompt"] = (
+                f"{prompt.system}\n\n{prompt.sources}\n\n{prompt.question}" if hasattr(prompt, "system") else str(prompt)
+            )
+        if response is not None:
+            self.captured["response"] = response
+
+    def response_timings(self) -> Dict[str, Any]:
+        """`{"timings": {...}}` for the response when the client asked, else {}"""
+        if not self.requested:
+            return {}
+        return {"timings": {
+            "trace_id": self.trace_id,
+            "total_ms": round(self.now_ms(), 1),
+            **self.timings.as_dict(),
+        }}
+
+    def finish(self, error: Optional[str] = None) -> None:
+        """End the trace and export it if sampled; later calls do nothing"""
+        if self._finished or not self.enabled:
+            return
+        self._finished = True
+        if error:
+            self.attributes["error"] = error
+        if not self.sampled:
+            return
+        record = {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start": self.started,
+            "duration_ms": round(self.now_ms(), 1),
+            "attributes": self.attributes,
+            "spans": self.timings.as_dict()["stages"],
+        }
+        if self.captured:
+            record["capture"] = self.captured
+        get_exporter().export(record)
+
+
+def requested(value) -> bool:
+    """Whether a request parameter asks for the timings block"""
+    return str(value).lower() in ("true", "1")
+
+
+def start(name: str, timings: bool = False, **attributes) -> Trace:
+    """Begin a request's trace, sampled at TRACE_SAMPLE_RATE.
+
+    Args:
+        name: Endpoint, e.g. "rag.answer"
+        timings: The client asked for a `timings` block in the response
+        **attributes: Initial request attributes
+    """
+    sampled = Config.TRACE_SAMPLE_RATE > 0 and random.random() < Config.TRACE_SAMPLE_RATE
+    capture = (Config.TRACE_CAPTURE_PROMPTS and sampled
+               and random.random() < Config.TRACE_CAPTURE_SAMPLE_RATE)
+    return Trace(name, sampled=sampled, requested=timings, capture=capture, **attributes)
+
+
+class TraceExporter(BackgroundWriter):
+    """Write traces as JSON lines from a background thread.
+
+    Args:
+        kind: "log" (the "rag.trace" logger), "file" (append to `path`) or "none"
+        path: JSONL file for the "file" exporter
+        max_queue: Traces waiting to be written; more are dropped
+        start: Start the writer thread on the first trace (see BackgroundWriter)
+    """
+
+    def __init__(self, kind: str = "log", path: str = "", max_queue: int = 1000, start: bool = True):
+        super().__init__("trace-exporter", max_queue, _EXPORT_BATCH, start=start)
+        self.kind = kind
+        self.path = path
+
+    def export(self, record: Dict[str, Any]) -> bool:
+        """Queue a trace without blocking; False when it was dropped"""
+        if self.kind == "none":
+            return False
+        return self.put(record)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exporter": self.kind,
+            "sample_rate": Config.TRACE_SAMPLE_RATE,
+            "queued": self.queued(),
+            "exported": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        lines = [json.dumps(record, default=str) for record in records]
+        if self.kind == "file":
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        else:
+            for line in lines:
+                _trace_logger.info(line)
+
+
+@process_singleton
+def get_exporter() -> TraceExporter:
+    """Process-wide trace exporter configured from Config."""
+    return TraceExporter(Config.TRACE_EXPORTER, Config.TRACE_FILE, Config.TRACE_QUEUE_SIZE)
@@ -3,21 +3,10 @@ from __future__ import annotations
 from typing import Any, Dict, List, Tuple
 import re
 
+from .retrieval import _best_sources
 
-_TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
-
-
-def _tokenize(text: str) -> List[str]:
-    return [t.lower() for t in _TOKEN_RE.findall(text or "")] 
-
-
-def _jaccard(a_tokens: List[str], b_tokens: List[str]) -> float:
-    if not a_tokens or not b_tokens:
-        return 0.0
-    a_set, b_set = set(a_tokens), set(b_tokens)
-    inter = len(a_set & b_set)
-    union = len(a_set | b_set)
-    return (inter / union) if union else 0.0
+# Lines that are feedback UI text, not claims
+_FEEDBACK_PREFIXES = ("was this answer helpful", "yes,", "no,")
 
 
 def _split_sentences(text: str) -> List[str]:
@@ -56,14 +45,15 @@ def verify_answer_support(
             "details": [],
         }
 
-    # Pre-tokenize source chunks
-    src_tokens = {}
-    for s in sources_meta:
-        idx = s.get("index")
-        chunk = s.get("truncated_chunk") or s.get("chunk") or s.get("preview") or ""
-        src_tokens[idx] = _tokenize(chunk)
-
     sentences = _split_sentences(answer_text)
+    # Best source for every sentence that needs checking, scored together
+    pending = [
+        i for i, sent in enumerate(sentences)
+        if sent.strip()
+        and not sent.strip().lower().startswith(_FEEDBACK_PREFIXES)
+        and not re.search(r"\[\d+\]", sent.strip())
+    ]
+    best_matches = dict(zip(pending, _best_sources([sentences[i].strip() for i in pending], sources_meta)))
     new_sentences: List[str] = []
     details: List[Dict[str, Any]] = []
     supported = 0
@@ -75,7 +65,7 @@ def verify_answer_support(
             new_sentences.append(sent)
             continue
         # Skip if this line is purely feedback UI text (heuristic)
-        if stripped.lower().startswith(("was this answer helpful", "yes,", "no,")):
+        if stripped.lower().startswith(_FEEDBACK_PREFIXES):
             new_sentences.append(sent)
             continue
         # Skip if already contains a [n] marker; assume supported
@@ -85,12 +75,7 @@ def verify_answer_support(
             supported += 1
             continue
 
-        toks = _tokenize(stripped)
-        best_idx, best_score = None, 0.0
-        for idx, stoks in src_tokens.items():
-            score = _jaccard(toks, stoks)
-            if score > best_score:
-                best_idx, best_score = idx, score
+        best_idx, best_score = best_matches[i]
 
         if best_idx is not None and best_score >= min_support:
             # Attach a citation marker to show support
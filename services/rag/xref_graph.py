@@ -0,0 +1,310 @@
+"""
+Cross-reference graph of the La Plata County land use code.
+
+Offline step: extract every citation in the scraped code ("§ 18-31 et seq.",
+"ch. 22", "pursuant to section 67-4", ...) into a directed document → document
+graph with typed edges. Citation targets are resolved through the
+`SectionIndex`; state law citations ("C.R.S. § 30-28-101") are skipped.
+
+The graph is stored as compact CSR adjacency arrays: the out-edges of node `i`
+are `targets[offsets[i]:offsets[i + 1]]` with matching `types`, pre-sorted by
+edge strength and target in-degree.
+
+At query time, reference expansion walks the graph from the retrieved
+documents (depth- and fan-out-limited BFS, cached per seed) and ranks the
+reachable documents by edge type, query/title similarity and in-degree. No
+regex scanning happens per request.
+
+Build:
+    python -m services.rag.xref_graph --code-dir la_plata_code --out la_plata_code/xref_graph.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .retrieval import _jaccard, _tokenize
+from .section_index import SectionIndex, load_code_documents
+
+logger = logging.getLogger(__name__)
+
+GRAPH_FORMAT = 1
+
+# Edge types, strongest first
+EDGE_DIRECTIVE = 0  # "pursuant to section 70-4", "in accordance with § 66-5", "see section 70-8"
+EDGE_SECTION = 1    # "§ 1-9", "section 67-4"
+EDGE_ET_SEQ = 2     # "§ 18-31 et seq."
+EDGE_CHAPTER = 3    # "ch. 22", "chapter 68"
+EDGE_TYPE_NAMES = ["directive", "section", "et_seq", "chapter"]
+EDGE_WEIGHTS = [1.0, 0.8, 0.6, 0.4]
+
+# Section numbers are two-part ("67-4", "66-2.5"); the lookahead rejects
+# three-part state statute numbers ("30-28-101")
+_SECTION_CITE_RE = re.compile(
+    r"(?:§+|\bsec(?:tion)?s?\.?)\s*(\d+(?:\.\d+)?-\d+(?:\.\d+)?)(?![\d-])", re.IGNORECASE
+)
+_CHAPTER_CITE_RE = re.compile(r"\b(?:ch\.|chapters?)\s*(\d+)\b(?![-.]\d)", re.IGNORECASE)
+_ET_SEQ_RE = re.compile(r"^[^;\n]{0,12}?\bet\s+seq\b", re.IGNORECASE)
+_DIRECTIVE_RE = re.compile(
+    r"\b(?:pursuant\s+to|in\s+accordance\s+with|as\s+provided\s+in|as\s+set\s+forth\s+in|"
+    r"subject\s+to|under|see)\s+(?:the\s+)?$",
+    re.IGNORECASE,
+)
+_STATE_LAW_RE = re.compile(r"(?:c\.\s*r\.\s*s\.?|colorado\s+revised\s+statutes),?\s*$", re.IGNORECASE)
+
+
+def extract_citations(text: str) -> List[Tuple[str, int]]:
+    """Return [(reference, edge type)] for the local code citations in `text`.
+
+    Section and chapter headings at the start of a line ("Sec. 67-4 Minor
+    subdivisions", "Chapter 67 Division of Land") are structure, not citations.
+    """
+    citations: List[Tuple[str, int]] = []
+    for m in _SECTION_CITE_RE.finditer(text):
+        line_start = text.rfind("\n", 0, m.start()) + 1
+        if not text[line_start:m.start()].strip():
+            continue  # Heading or contents entry
+        before = text[max(0, m.start() - 40):m.start()]
+        if _STATE_LAW_RE.search(before):
+            continue
+        if _DIRECTIVE_RE.search(before):
+            edge_type = EDGE_DIRECTIVE
+        elif _ET_SEQ_RE.match(text[m.end():m.end() + 24]):
+            edge_type = EDGE_ET_SEQ
+        else:
+            edge_type = EDGE_SECTION
+        citations.append((m.group(1), edge_type))
+
+    for m in _CHAPTER_CITE_RE.finditer(text):
+        line_start = text.rfind("\n", 0, m.start()) + 1
+        if not text[line_start:m.start()].strip():
+            continue  # Chapter heading
+        before = text[max(0, m.start() - 40):m.start()]
+        if _STATE_LAW_RE.search(before):
+            continue
+        edge_type = EDGE_DIRECTIVE if _DIRECTIVE_RE.search(before) else EDGE_CHAPTER
+        citations.append((m.group(1), edge_type))
+    return citations
+
+
+class XrefGraph:
+    """Directed citation graph over code documents in CSR form."""
+
+    def __init__(self, nodes: List[str], offsets: List[int], targets: List[int], types: List[int],
+                 in_degree: List[int], titles: Dict[str, str], version: str,
+                 max_fanout: int = 8, neighborhood_cache_size: int = 2048):
+        self.nodes = nodes
+        self.offsets = offsets
+        self.targets = targets
+        self.types = types
+        self.in_degree = in_degree
+        self.titles = titles
+        self.version = version
+        self.max_fanout = max_fanout
+        self._node_index = {doc_id: i for i, doc_id in enumerate(nodes)}
+        self._log_max_in = math.log1p(max(in_degree) if in_degree else 0) or 1.0
+        self._title_tokens: Dict[int, List[str]] = {}
+        # Query-independent part of expansion, shared across requests
+        self._neighborhood = lru_cache(maxsize=neighborhood_cache_size)(self._compute_neighborhood)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.targets)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return str(doc_id) in self._node_index
+
+    def neighbors(self, doc_id: str) -> List[Tuple[str, str]]:
+        """Direct citations of a document as [(doc_id, edge type name)]."""
+        i = self._node_index.get(str(doc_id))
+        if i is None:
+            return []
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return [(self.nodes[t], EDGE_TYPE_NAMES[k]) for t, k in zip(self.targets[lo:hi], self.types[lo:hi])]
+
+    def _compute_neighborhood(self, node: int, max_depth: int) -> Tuple[Tuple[int, int, int], ...]:
+        """BFS from `node`: ((target, depth, edge type), ...) within `max_depth` hops.
+
+        Each node contributes at most `max_fanout` out-edges (the adjacency is
+        pre-sorted, so these are its strongest citations).
+        """
+        reached: Dict[int, Tuple[int, int]] = {node: (0, EDGE_DIRECTIVE)}
+        frontier = [node]
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for src in frontier:
+                lo = self.offsets[src]
+                hi = min(self.offsets[src + 1], lo + self.max_fanout)
+                for t, k in zip(self.targets[lo:hi], self.types[lo:hi]):
+                    if t not in reached:
+                        reached[t] = (depth, k)
+                        next_frontier.append(t)
+            frontier = next_frontier
+            if not frontier:
+                break
+        return tuple((t, d, k) for t, (d, k) in reached.items() if t != node)
+
+    def _title_similarity(self, node: int, query_tokens: List[str]) -> float:
+        tokens = self._title_tokens.get(node)
+        if tokens is None:
+            tokens = _tokenize(self.titles.get(self.nodes[node], ""))
+            self._title_tokens[node] = tokens
+        return _jaccard(query_tokens, tokens)
+
+    def expand(self, seed_ids: Iterable[str], query: str, *, max_depth: int = 2, budget: int = 8,
+               exclude: Optional[Iterable[str]] = None) -> List[str]:
+        """Documents cited (directly or transitively) by the seeds, best first.
+
+        Candidates are scored by edge type (discounted per hop), lexical
+        similarity between the query and the document title, and in-degree
+        (how widely the document is cited). At most `budget` ids are returned.
+
+        Returns an empty list when none of the seeds are in the graph.
+        """
+        seeds = [self._node_index[s] for s in (str(x) for x in seed_ids) if s in self._node_index]
+        if not seeds or budget <= 0:
+            return []
+        excluded = set(seeds) | {self._node_index[e] for e in (exclude or ()) if e in self._node_index}
+        query_tokens = _tokenize(query)
+
+        scores: Dict[int, float] = {}
+        for seed in seeds:
+            for node, depth, edge_type in self._neighborhood(seed, max_depth):
+                if node in excluded:
+                    continue
+                score = (
+                    EDGE_WEIGHTS[edge_type] / depth
+                    + 2.0 * self._title_similarity(node, query_tokens)
+                    + 0.5 * math.log1p(self.in_degree[node]) / self._log_max_in
+                )
+                # A document reached from several seeds gets a small boost
+                scores[node] = max(scores[node], score) + 0.1 if node in scores else score
+
+        ranked = sorted(scores, key=lambda n: (-scores[n], n))
+        return [self.nodes[n] for n in ranked[:budget]]
+
+    # -----------------------------
+    # Build / persistence
+    # -----------------------------
+
+    @classmethod
+    def build(cls, documents: Dict[str, str], section_index: SectionIndex, **kwargs) -> "XrefGraph":
+        """Build the graph from {doc_id: text}, resolving citations through `section_index`."""
+        nodes = sorted(documents, key=lambda d: (0, int(d)) if d.isdigit() else (1, d))
+        node_index = {doc_id: i for i, doc_id in enumerate(nodes)}
+
+        edges: List[Dict[int, int]] = []  # per source: {target: strongest edge type}
+        for doc_id in nodes:
+            out: Dict[int, int] = {}
+            for ref, edge_type in extract_citations(documents[doc_id] or ""):
+                for target_id in section_index.resolve(ref):
+                    t = node_index.get(target_id)
+                    if t is None or target_id == doc_id:
+                        continue
+                    out[t] = min(out.get(t, edge_type), edge_type)
+            edges.append(out)
+
+        in_degree = [0] * len(nodes)
+        for out in edges:
+            for t in out:
+                in_degree[t] += 1
+
+        offsets, targets, types = [0], [], []
+        for out in edges:
+            for t in sorted(out, key=lambda t: (out[t], -in_degree[t], t)):
+                targets.append(t)
+                types.append(out[t])
+            offsets.append(len(targets))
+
+        titles = {d: section_index.titles.get(d, "") for d in nodes}
+        return cls(nodes, offsets, targets, types, in_degree, titles, section_index.version, **kwargs)
+
+    def to_dict(self) -> dict:
+        return {
+            "format": GRAPH_FORMAT,
+            "version": self.version,
+            "edge_types": EDGE_TYPE_NAMES,
+            "nodes": self.nodes,
+            "offsets": self.offsets,
+            "targets": self.targets,
+            "types": self.types,
+            "in_degree": self.in_degree,
+            "titles": self.titles,
+        }
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "XrefGraph":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != GRAPH_FORMAT:
+            raise ValueError(f"Unsupported cross-reference graph format: {data.get('format')}")
+        return cls(data["nodes"], data["offsets"], data["targets"], data["types"],
+                   data["in_degree"], data.get("titles", {}), data["version"], **kwargs)
+
+    @classmethod
+    def load_or_build(cls, path: str, code_dir: str, section_index: Optional[SectionIndex],
+                      **kwargs) -> Optional["XrefGraph"]:
+        """Load the persisted graph, rebuilding it when missing or built from another index version.
+
+        Returns None without a section index or source documents.
+        """
+        if section_index is None:
+            return None
+        if os.path.exists(path):
+            try:
+                graph = cls.load(path, **kwargs)
+                if graph.version == section_index.version:
+                    return graph
+                logger.info(f"Cross-reference graph {path} is stale, rebuilding")
+            except Exception as e:
+                logger.warning(f"Could not load cross-reference graph {path}: {e}")
+        if not os.path.isdir(code_dir):
+            return None
+        graph = cls.build(load_code_documents(code_dir), section_index, **kwargs)
+        try:
+            graph.save(path)
+            logger.info(f"Built cross-reference graph {path}: {len(graph)} nodes, {graph.num_edges} edges")
+        except OSError as e:
+            logger.warning(f"Could not save cross-reference graph {path}: {e}")
+        return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the land use code cross-reference graph")
+    parser.add_argument("--code-dir", default="la_plata_code", help="Directory with full_code.json or section_*.txt")
+    parser.add_argument("--out", default="la_plata_code/xref_graph.json", help="Output JSON path")
+    parser.add_argument("--section-index", default="la_plata_code/section_index.json",
+                        help="Section index JSON (built from --code-dir when missing)")
+    args = parser.parse_args()
+
+    section_index = SectionIndex.load_or_build(args.section_index, args.code_dir)
+    if section_index is None:
+        parser.error(f"No code documents found in {args.code_dir}")
+    graph = XrefGraph.build(load_code_documents(args.code_dir), section_index)
+    graph.save(args.out)
+    counts = [0] * len(EDGE_TYPE_NAMES)
+    for k in graph.types:
+        counts[k] += 1
+    by_type = ", ".join(f"{name}={n}" for name, n in zip(EDGE_TYPE_NAMES, counts))
+    print(f"Graph with {len(graph)} nodes and {graph.num_edges} edges ({by_type}) → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
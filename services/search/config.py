@@ -30,10 +30,20 @@ class Config:
     # API settings
     DEFAULT_SEARCH_LIMIT = int(os.environ.get('DEFAULT_SEARCH_LIMIT', '10'))
     MAX_SEARCH_LIMIT = int(os.environ.get('MAX_SEARCH_LIMIT', '50'))
+    MAX_BATCH_QUERIES = int(os.environ.get('MAX_BATCH_QUERIES', '16'))
     
     # Collections
     AVAILABLE_COLLECTIONS = AVAILABLE_COLLECTIONS
     
+    # Pre-fork WSGI server settings (gunicorn, see gunicorn_conf.py)
+    SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:8000')
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', '2'))
+    TORCH_THREADS_PER_WORKER = int(os.environ.get('TORCH_THREADS_PER_WORKER', '0'))  # 0 = cpu_count // workers
+    WORKER_MAX_REQUESTS = int(os.environ.get('WORKER_MAX_REQUESTS', '0'))  # 0 = never recycle workers
+    WORKER_MAX_REQUESTS_JITTER = int(os.environ.get('WORKER_MAX_REQUESTS_JITTER', '0'))
+    WORKER_TIMEOUT = int(os.environ.get('WORKER_TIMEOUT', '60'))
+    WORKER_GRACEFUL_TIMEOUT = int(os.environ.get('WORKER_GRACEFUL_TIMEOUT', '30'))
+    
     @staticmethod
     def init_app(app):
         """Initialize app with config-specific settings"""
@@ -0,0 +1,67 @@
+"""
+Gunicorn configuration for the Search API (production entry point)
+
+Usage (from project root):
+    gunicorn -c services/search/gunicorn_conf.py services.search.search_api:app
+
+The app is preloaded in the master process so the e5 model is loaded once and
+shared with every worker through copy-on-write pages. Each worker re-opens its
+own ChromaDB handles after fork and limits torch intra-op threads so workers
+do not oversubscribe the CPU.
+
+Send SIGHUP to the master for a graceful worker reload. Because the app is
+preloaded, picking up new code or a new model requires a full restart.
+"""
+
+import gc
+import os
+import sys
+
+# Config files are loaded before gunicorn puts the working directory on sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.search.config import Config
+
+# The app module is imported after this file is read; default to production config
+os.environ.setdefault('FLASK_ENV', 'production')
+
+bind = Config.SERVER_BIND
+workers = Config.SERVER_WORKERS
+worker_class = 'sync'
+preload_app = True
+
+timeout = Config.WORKER_TIMEOUT
+graceful_timeout = Config.WORKER_GRACEFUL_TIMEOUT
+max_requests = Config.WORKER_MAX_REQUESTS
+max_requests_jitter = Config.WORKER_MAX_REQUESTS_JITTER
+
+accesslog = '-'
+errorlog = '-'
+
+
+def _torch_threads_per_worker():
+    if Config.TORCH_THREADS_PER_WORKER > 0:
+        return Config.TORCH_THREADS_PER_WORKER
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def when_ready(server):
+    # Move everything allocated while preloading (model weights, module state)
+    # into the permanent generation so the GC never touches those pages and
+    # forces the kernel to copy them into each worker.
+    gc.freeze()
+    server.log.info(f"Search API preloaded; frozen {gc.get_freeze_count()} objects before fork")
+
+
+def post_fork(server, worker):
+    try:
+        import torch
+        torch.set_num_threads(_torch_threads_per_worker())
+        server.log.info(f"Worker {worker.pid}: torch intra-op threads = {torch.get_num_threads()}")
+    except ImportError:
+        pass
+
+    from services.search.search_api import app
+    search_engine = app.config['SEARCH_ENGINE']
+    if not search_engine.reconnect():
+        server.log.error(f"Worker {worker.pid}: failed to reconnect to ChromaDB")
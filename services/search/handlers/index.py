@@ -15,7 +15,10 @@ def index():
             '/collections': 'Get available collections and their info',
             '/search?query=YOUR_QUERY&collection=COLLECTION': 'Full search (GET)',
             '/search': 'Full search (POST with JSON)',
-            '/search/simple?query=YOUR_QUERY&collection=COLLECTION': 'Simplified search results'
+            '/search/simple?query=YOUR_QUERY&collection=COLLECTION': 'Simplified search results',
+            '/search/simple/batch': 'Simplified search results for several queries (POST with JSON)',
+            '/search/documents?ids=ID1,ID2&collection=COLLECTION': 'Fetch documents by id',
+            '/embed': 'Embed texts with a collection model (POST with JSON)'
         },
         'collections': list(AVAILABLE_COLLECTIONS.keys()),
         'examples': {
@@ -67,35 +67,107 @@ def simple_search():
         if collection_name not in AVAILABLE_COLLECTIONS:
             return jsonify({'error': f'Invalid collection. Available: {list(AVAILABLE_COLLECTIONS.keys())}'}), 400
         
-        results = search_engine.search(query, collection_name, num_results)
+        return jsonify(search_engine.simple_search(query, collection_name, num_results))
+        
+    except Exception as e:
+        logger.error(f"Simple search error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@search_bp.route('/search/simple/batch', methods=['POST'])
+def simple_search_batch():
+    """Batched simple search: one encoder pass for several queries.
+
+    Body: {"queries": [...], "collection": "...", "num_results": 5}
+    Returns {"collection": ..., "batches": [<simple search payload>, ...]} in query order.
+    """
+    search_engine = current_app.config['SEARCH_ENGINE']
+    try:
+        data = request.get_json(silent=True) or {}
+        queries = data.get('queries')
+        # Payloads are matched to queries by position, so reject rather than drop bad entries
+        if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+            return jsonify({'error': 'queries must be a non-empty list of non-blank strings'}), 400
+        if len(queries) > current_app.config.get('MAX_BATCH_QUERIES', 16):
+            return jsonify({'error': f"At most {current_app.config.get('MAX_BATCH_QUERIES', 16)} queries per batch"}), 400
+        
+        num_results = int(data.get('num_results', 5))
+        num_results = max(1, min(10, num_results))
+        
+        collection_name = data.get('collection', 'la_plata_county_code')
+        
+        # Validate collection
+        if collection_name not in AVAILABLE_COLLECTIONS:
+            return jsonify({'error': f'Invalid collection. Available: {list(AVAILABLE_COLLECTIONS.keys())}'}), 400
         
-        # Simplify response - return full text without truncation
-        simple_results = []
-        for result in results:
-            if result['content']:
-                simple_result = {
-                    'text': result['content'],
-                    'relevance': f"{1 / (1 + result['distance']):.3f}" if result['distance'] else 'N/A',
-                    'collection': collection_name
-                }
-                
-                # Add collection-specific identifier
-                if collection_name == 'la_plata_county_code':
-                    simple_result['section'] = result.get('section_id', result['id'])
-                elif collection_name == 'la_plata_assessor':
-                    simple_result['account'] = result.get('account_number', result['id'])
-                else:
-                    simple_result['id'] = result['id']
-                
-                simple_results.append(simple_result)
+        logger.info(f"Batch searching '{collection_name}' for {len(queries)} queries")
         
         return jsonify({
-            'query': query,
             'collection': collection_name,
-            'collection_name': AVAILABLE_COLLECTIONS[collection_name]['name'],
-            'results': simple_results
+            'batches': search_engine.simple_search_batch(queries, collection_name, num_results)
         })
         
     except Exception as e:
-        logger.error(f"Simple search error: {e}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        logger.error(f"Batch search error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@search_bp.route('/search/documents', methods=['GET'])
+def get_documents():
+    """Fetch documents by id: /search/documents?ids=3159,1035&collection=...
+
+    Returns {"collection": ..., "results": [...]} in the `/search/simple` result format.
+    """
+    search_engine = current_app.config['SEARCH_ENGINE']
+    try:
+        ids = [i.strip() for i in request.args.get('ids', '').split(',') if i.strip()]
+        if not ids:
+            return jsonify({'error': 'ids parameter is required'}), 400
+        if len(ids) > current_app.config.get('MAX_SEARCH_LIMIT', 50):
+            return jsonify({'error': f"At most {current_app.config.get('MAX_SEARCH_LIMIT', 50)} ids per request"}), 400
+        
+        collection_name = request.args.get('collection', 'la_plata_county_code')
+        
+        # Validate collection
+        if collection_name not in AVAILABLE_COLLECTIONS:
+            return jsonify({'error': f'Invalid collection. Available: {list(AVAILABLE_COLLECTIONS.keys())}'}), 400
+        
+        return jsonify({
+            'collection': collection_name,
+            'results': search_engine.get_documents(ids, collection_name)
+        })
+        
+    except Exception as e:
+        logger.error(f"Document fetch error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@search_bp.route('/embed', methods=['POST'])
+def embed():
+    """Embed texts with a collection's model: {"texts": [...], "collection": "..."}
+
+    Returns {"collection": ..., "model": ..., "embeddings": [[...], ...]} (unit-normalized).
+    """
+    search_engine = current_app.config['SEARCH_ENGINE']
+    try:
+        data = request.get_json(silent=True) or {}
+        texts = [t for t in (data.get('texts') or []) if isinstance(t, str) and t.strip()]
+        if not texts:
+            return jsonify({'error': 'texts must be a non-empty list of strings'}), 400
+        if len(texts) > current_app.config.get('MAX_BATCH_QUERIES', 16):
+            return jsonify({'error': f"At most {current_app.config.get('MAX_BATCH_QUERIES', 16)} texts per request"}), 400
+        
+        collection_name = data.get('collection', 'la_plata_county_code')
+        
+        # Validate collection
+        if collection_name not in AVAILABLE_COLLECTIONS:
+            return jsonify({'error': f'Invalid collection. Available: {list(AVAILABLE_COLLECTIONS.keys())}'}), 400
+        
+        return jsonify({
+            'collection': collection_name,
+            'model': AVAILABLE_COLLECTIONS[collection_name]['model'],
+            'embeddings': search_engine.embed(texts, collection_name)
+        })
+        
+    except Exception as e:
+        logger.error(f"Embed error: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -1,7 +1,15 @@
 import chromadb
 from sentence_transformers import SentenceTransformer
+import hashlib
 import logging
+import os
+import threading
+import time
 from .config import AVAILABLE_COLLECTIONS
+from .term_features import TermFeatures
+
+# Seconds between index version checks for the term features
+TERM_FEATURES_RECHECK_SEC = 30
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +18,9 @@ class SearchEngine:
         self.models = {}
         self.collections = {}
         self.client = None
+        self._term_features = {}  # collection -> (TermFeatures, checked at)
+        self._term_features_lock = threading.Lock()
+        self._term_features_building = set()  # Collections with a rebuild in progress
 
     def initialize(self):
         """Initialize sentence transformer models and ChromaDB connections"""
@@ -38,6 +49,8 @@ class SearchEngine:
             
             if self.collections:
                 logger.info(f"Successfully initialized {len(self.collections)} collections")
+                for collection_name in self.collections:
+                    self.term_features(collection_name, wait=True)  # Load or build before serving
                 return True
             else:
                 logger.error("No collections could be initialized")
@@ -47,14 +60,47 @@ class SearchEngine:
             logger.error(f"Error initializing search system: {e}")
             return False
 
+    def reconnect(self):
+        """Re-open ChromaDB handles while keeping loaded models.
+
+        Used by pre-fork servers: models are loaded once in the master process
+        and shared with workers, but SQLite connections must not cross a fork.
+        """
+        try:
+            if self.client is not None:
+                # Chroma caches one System (with its SQLite connection) per path for the
+                # whole process; without this a worker gets the parent's back
+                self.client.clear_system_cache()
+            self.client = chromadb.PersistentClient(path="./chroma_db")
+            self.collections = {}
+            for collection_name in AVAILABLE_COLLECTIONS:
+                try:
+                    self.collections[collection_name] = self.client.get_collection(collection_name)
+                except Exception as e:
+                    logger.warning(f"Could not reconnect collection '{collection_name}': {e}")
+            return bool(self.collections)
+        except Exception as e:
+            logger.error(f"Error reconnecting to ChromaDB: {e}")
+            return False
+
     def search(self, query, collection_name='la_plata_county_code', num_results=5):
         """Perform semantic search on the specified collection"""
+        return self.search_batch([query], collection_name, num_results)[0]
+
+    def search_batch(self, queries, collection_name='la_plata_county_code', num_results=5):
+        """Perform semantic search for several queries with one encoder pass and one query.
+
+        Returns a list of formatted result lists, one per query, in input order.
+        """
         if not self.collections or collection_name not in self.collections:
             raise Exception(f"Collection '{collection_name}' not available")
         
         if collection_name not in AVAILABLE_COLLECTIONS:
             raise Exception(f"Unknown collection: {collection_name}")
         
+        if not queries:
+            return []
+        
         # Get the appropriate model and collection
         config = AVAILABLE_COLLECTIONS[collection_name]
         model_name = config['model']
@@ -65,30 +111,39 @@ class SearchEngine:
         model = self.models[model_name]
         collection = self.collections[collection_name]
         
-        # Generate embedding for query
-        query_embedding = model.encode([query]).tolist()[0]
+        # Generate embeddings for all queries in a single batch
+        query_embeddings = model.encode(list(queries)).tolist()
         
         # Search in ChromaDB
         results = collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=query_embeddings,
             n_results=num_results
         )
         
-        # Format results based on collection type
+        return [
+            self._format_results(results, q, collection_name, config)
+            for q in range(len(query_embeddings))
+        ]
+
+    def _format_results(self, results, q, collection_name, config):
+        """Format the results of query number `q` based on collection type"""
         formatted_results = []
-        if results['ids'][0] and len(results['ids'][0]) > 0:
-            for i, item_id in enumerate(results['ids'][0]):
+        ids = results['ids'][q]
+        distances = results['distances'][q] if results['distances'] else None
+        metadatas = results['metadatas'][q] if results['metadatas'] else None
+        if ids and len(ids) > 0:
+            for i, item_id in enumerate(ids):
                 result = {
                     'id': item_id,
-                    'distance': results['distances'][0][i] if results['distances'][0] else None,
+                    'distance': distances[i] if distances else None,
                     'content': None,
                     'collection': collection_name,
                     'collection_name': config['name']
                 }
                 
                 # Extract content from metadata
-                if results['metadatas'][0] and i < len(results['metadatas'][0]):
-                    metadata = results['metadatas'][0][i]
+                if metadatas and i < len(metadatas):
+                    metadata = metadatas[i]
                     if metadata and 'text' in metadata:
                         result['content'] = metadata['text']
                         
@@ -104,6 +159,144 @@ class SearchEngine:
         
         return formatted_results
 
+    def simple_search(self, query, collection_name='la_plata_county_code', num_results=5):
+        """Search and return the `/search/simple` payload (full text, relevance, identifier)"""
+        return self.simple_search_batch([query], collection_name, num_results)[0]
+
+    def simple_search_batch(self, queries, collection_name='la_plata_county_code', num_results=5):
+        """Batched variant of `simple_search`, one payload per query in input order"""
+        batches = self.search_batch(queries, collection_name, num_results)
+        return [
+            {
+                'query': query,
+                'collection': collection_name,
+                'collection_name': AVAILABLE_COLLECTIONS[collection_name]['name'],
+                'results': self._simplify_results(results, collection_name),
+            }
+            for query, results in zip(queries, batches)
+        ]
+
+    def term_features(self, collection_name, wait=False):
+        """Term features for the collection's current index version, or None.
+
+        The index version is re-checked every TERM_FEATURES_RECHECK_SEC. When
+        it changed, features are loaded or rebuilt in a background thread and
+        None is returned until they are ready, so searches never wait on a
+        rebuild. `wait=True` builds inline (startup and the CLI).
+        """
+        cached = self._term_features.get(collection_name)
+        if cached and time.monotonic() - cached[1] < TERM_FEATURES_RECHECK_SEC:
+            return cached[0]
+        features = cached[0] if cached else None
+        version = self.index_version(collection_name)
+        if version is not None and (features is None or features.index_version != version):
+            if wait:
+                return self._build_term_features(collection_name, version)
+            self._start_term_features_build(collection_name, version)
+            features = None  # Stale features may not match re-indexed texts
+        with self._term_features_lock:
+            if self._term_features.get(collection_name) is not cached:
+                return self._term_features[collection_name][0]  # A build finished meanwhile
+            self._term_features[collection_name] = (features, time.monotonic())
+        return features
+
+    def _start_term_features_build(self, collection_name, version):
+        with self._term_features_lock:
+            if collection_name in self._term_features_building:
+                return
+            self._term_features_building.add(collection_name)
+        threading.Thread(
+            target=self._build_term_features, args=(collection_name, version),
+            name=f"term-features-{collection_name}", daemon=True,
+        ).start()
+
+    def _build_term_features(self, collection_name, version):
+        try:
+            features = TermFeatures.load_or_build(self.collections[collection_name], collection_name, version)
+        except Exception as e:
+            logger.warning(f"Could not build term features for '{collection_name}': {e}")
+            features = None
+        with self._term_features_lock:
+            self._term_features[collection_name] = (features, time.monotonic())
+            self._term_features_building.discard(collection_name)
+        return features
+
+    def get_documents(self, ids, collection_name='la_plata_county_code'):
+        """Fetch documents by id in one bulk lookup, in the `/search/simple` result format.
+
+        Unknown ids are skipped; results follow the order of `ids`.
+        """
+        if not self.collections or collection_name not in self.collections:
+            raise Exception(f"Collection '{collection_name}' not available")
+        
+        ids = [str(i) for i in ids]
+        if not ids:
+            return []
+        
+        config = AVAILABLE_COLLECTIONS[collection_name]
+        fetched = self.collections[collection_name].get(ids=ids, include=['metadatas'])
+        by_id = dict(zip(fetched['ids'], fetched['metadatas'] or []))
+        
+        results = []
+        for item_id in ids:
+            if item_id not in by_id:
+                continue
+            # Shape it like a query result without a distance
+            one = {'ids': [[item_id]], 'distances': None, 'metadatas': [[by_id[item_id]]]}
+            results.extend(self._format_results(one, 0, collection_name, config))
+        return self._simplify_results(results, collection_name)
+
+    def _simplify_results(self, results, collection_name):
+        # Simplify response - return full text without truncation
+        features = self.term_features(collection_name)
+        simple_results = []
+        for result in results:
+            if result['content']:
+                simple_result = {
+                    'text': result['content'],
+                    'relevance': f"{1 / (1 + result['distance']):.3f}" if result['distance'] else 'N/A',
+                    'collection': collection_name
+                }
+                
+                # Add collection-specific identifier
+                if collection_name == 'la_plata_county_code':
+                    simple_result['section'] = result.get('section_id', result['id'])
+                elif collection_name == 'la_plata_assessor':
+                    simple_result['account'] = result.get('account_number', result['id'])
+                else:
+                    simple_result['id'] = result['id']
+                
+                if features is not None:
+                    simple_result['terms'] = features.payload(result['id'], result['content'])
+                
+                simple_results.append(simple_result)
+        return simple_results
+
+    def embed(self, texts, collection_name='la_plata_county_code'):
+        """Unit-normalized embeddings of `texts` with the collection's model, as lists"""
+        if collection_name not in AVAILABLE_COLLECTIONS:
+            raise Exception(f"Collection '{collection_name}' not available")
+        model_name = AVAILABLE_COLLECTIONS[collection_name]['model']
+        if model_name not in self.models:
+            raise Exception(f"Model '{model_name}' not loaded")
+        return self.models[model_name].encode(list(texts), normalize_embeddings=True).tolist()
+
+    def index_version(self, collection_name):
+        """Opaque version of a collection's index; changes when it is rebuilt or modified.
+
+        Derived from the embedding model, document count and the ChromaDB
+        file's modification time, so caches downstream can key on it.
+        """
+        if collection_name not in self.collections:
+            return None
+        try:
+            mtime = os.path.getmtime(os.path.join("./chroma_db", "chroma.sqlite3"))
+        except OSError:
+            mtime = 0
+        config = AVAILABLE_COLLECTIONS[collection_name]
+        raw = f"{collection_name}:{config['model']}:{self.collections[collection_name].count()}:{mtime}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
     def get_collection_info(self):
         """Get available collections and their info"""
         collection_info = {}
@@ -114,7 +307,8 @@ class SearchEngine:
                 'model': config['model'],
                 'dimensions': config['dimensions'],
                 'available': collection_name in self.collections,
-                'document_count': self.collections[collection_name].count() if collection_name in self.collections else 0
+                'document_count': self.collections[collection_name].count() if collection_name in self.collections else 0,
+                'index_version': self.index_version(collection_name)
             }
         
         return {
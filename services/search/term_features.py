@@ -0,0 +1,183 @@
+"""
+Precomputed term features for lexical scoring in the RAG service.
+
+The RAG service reranks candidates, drops near-duplicates and matches answer
+lines to sources by Jaccard overlap of their word tokens. Instead of
+tokenizing every candidate's text on each request, the search service
+tokenizes each document once per index version and returns its term ids with
+every `/search/simple`-format result:
+
+    "terms": {"ids": "<base64 of sorted little-endian uint32>", "max_chars": 3000}
+
+A term id is the CRC-32 of a lower-cased alphanumeric token, taken over the
+first `max_chars` characters of the text. Tokenization must stay the same as
+`_tokenize` in services/rag/retrieval.py, which hashes text without features
+the same way.
+
+Features are stored per collection and index version as
+`chroma_db/term_features/<collection>-<index_version>.npz`. The search engine
+loads them on startup and rebuilds them in the background when the index
+version changes; results carry no term ids until the rebuild finishes. Build
+them right after re-indexing to keep that window short:
+
+    python -m services.search.term_features --collection la_plata_county_code
+"""
+
+import argparse
+import base64
+import logging
+import os
+import re
+import tempfile
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 1
+MAX_CHARS = 3000  # rerank_results' default max_chunk_chars
+FEATURES_DIR = os.path.join("./chroma_db", "term_features")
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+
+
+def term_ids(text: str) -> np.ndarray:
+    """Sorted unique term ids of `text` (uint32)"""
+    tokens = {t.lower() for t in _TOKEN_RE.findall(text or "")}
+    ids = np.fromiter(map(zlib.crc32, map(str.encode, tokens)), dtype=np.uint32, count=len(tokens))
+    return np.unique(ids)
+
+
+def encode(ids: np.ndarray) -> str:
+    return base64.b64encode(ids.astype("<u4").tobytes()).decode("ascii")
+
+
+def decode(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype="<u4")
+
+
+class TermFeatures:
+    """Term ids of every document in one collection at one index version.
+
+    Stored as one concatenated uint32 array with per-document offsets.
+    """
+
+    def __init__(self, collection: str, index_version: str, ids: List[str], offsets: np.ndarray, terms: np.ndarray):
+        self.collection = collection
+        self.index_version = index_version
+        self.offsets = offsets
+        self.terms = terms
+        self._positions = {doc_id: i for i, doc_id in enumerate(ids)}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def get(self, doc_id: str) -> Optional[np.ndarray]:
+        i = self._positions.get(doc_id)
+        if i is None:
+            return None
+        return self.terms[self.offsets[i]:self.offsets[i + 1]]
+
+    def payload(self, doc_id: str, text: str) -> Dict[str, object]:
+        """The `terms` field of a result; documents added since the build are tokenized here"""
+        ids = self.get(doc_id)
+        if ids is None:
+            ids = term_ids(text[:MAX_CHARS])
+        return {"ids": encode(ids), "max_chars": MAX_CHARS}
+
+    @classmethod
+    def build(cls, collection: str, index_version: str, documents: Iterable[Tuple[str, str]]) -> "TermFeatures":
+        """Tokenize (id, text) pairs"""
+        ids: List[str] = []
+        arrays: List[np.ndarray] = []
+        for doc_id, text in documents:
+            ids.append(doc_id)
+            arrays.append(term_ids((text or "")[:MAX_CHARS]))
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        np.cumsum([len(a) for a in arrays], out=offsets[1:])
+        terms = np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.uint32)
+        return cls(collection, index_version, ids, offsets, terms)
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # Unique temp name: several workers may build the same version at once
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        ids = sorted(self._positions, key=self._positions.get)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, format=np.array(FORMAT), ids=np.array(ids, dtype=str),
+                         offsets=self.offsets, terms=self.terms)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: str, collection: str, index_version: str) -> "TermFeatures":
+        with np.load(path) as data:
+            if int(data["format"]) != FORMAT:
+                raise ValueError(f"Unsupported term feature format {int(data['format'])}")
+            return cls(collection, index_version, data["ids"].tolist(), data["offsets"], data["terms"])
+
+    @classmethod
+    def load_or_build(cls, chroma_collection, collection: str, index_version: str,
+                      directory: str = FEATURES_DIR) -> "TermFeatures":
+        """Features for `index_version`, built from the collection and saved when missing"""
+        path = os.path.join(directory, f"{collection}-{index_version}.npz")
+        if os.path.exists(path):
+            try:
+                return cls.load(path, collection, index_version)
+            except Exception as e:
+                logger.warning(f"Rebuilding unreadable term features {path}: {e}")
+        start = time.time()
+        features = cls.build(collection, index_version, iter_documents(chroma_collection))
+        try:
+            features.save(path)
+        except OSError as e:
+            logger.warning(f"Could not save term features to {path}: {e}")
+        logger.info(f"Built term features for '{collection}' ({len(features)} documents) in {time.time() - start:.1f}s")
+        return features
+
+
+def iter_documents(chroma_collection, page_size: int = 1000) -> Iterator[Tuple[str, str]]:
+    """(id, text) of every document in a Chroma collection, read in pages"""
+    offset = 0
+    while True:
+        page = chroma_collection.get(include=['metadatas'], limit=page_size, offset=offset)
+        ids = page['ids']
+        if not ids:
+            return
+        for doc_id, metadata in zip(ids, page['metadatas'] or [None] * len(ids)):
+            yield doc_id, (metadata or {}).get('text') or ""
+        offset += len(ids)
+
+
+def main():
+    from .config import AVAILABLE_COLLECTIONS
+    from .search_engine import SearchEngine
+
+    parser = argparse.ArgumentParser(description="Build term features for the current index version")
+    parser.add_argument("--collection", action="append", help="Collection to build (default: all)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    engine = SearchEngine()
+    if not engine.reconnect():  # ChromaDB only; no embedding models needed
+        raise SystemExit("Could not open ChromaDB")
+    for name in args.collection or list(AVAILABLE_COLLECTIONS):
+        if name not in engine.collections:
+            logger.warning(f"Skipping unavailable collection '{name}'")
+            continue
+        features = engine.term_features(name, wait=True)
+        if features is None:
+            logger.error(f"Could not build term features for '{name}'")
+            continue
+        print(f"{name}: {len(features)} documents, index version {features.index_version}")
+
+
+if __name__ == "__main__":
+    main()
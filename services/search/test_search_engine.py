@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+pytest.importorskip("chromadb")
+pytest.importorskip("sentence_transformers")
+
+from services.search import search_engine
+
+
+def test_reconnect_clears_the_chroma_client_cache(monkeypatch):
+    events = []
+
+    class _Client:
+        def __init__(self, path):
+            events.append("open")
+
+        def clear_system_cache(self):
+            events.append("clear")
+
+        def get_collection(self, name):
+            return name
+
+    monkeypatch.setattr(search_engine.chromadb, "PersistentClient", _Client)
+    engine = search_engine.SearchEngine()
+    engine.client = _Client("./chroma_db")  # Opened in the parent before fork
+    events.clear()
+
+    assert engine.reconnect()
+    assert events == ["clear", "open"]
+    assert set(engine.collections) == set(search_engine.AVAILABLE_COLLECTIONS)